@@ -1,3 +1,4 @@
+import threading
 from typing import TypedDict, Literal, List
 from langgraph.graph import StateGraph, END
 from langchain_core.prompts import ChatPromptTemplate
@@ -14,16 +15,6 @@ class AgentState(TypedDict):
     confidence: float
     reason: str
 
-# Helper Functions
-def build_context(recent, suspicious, new_text):
-    parts = []
-    if suspicious:
-        parts.append("[สัญญาณก่อนหน้า] " + " | ".join(suspicious))
-    if recent:
-        parts.append("[บทสนทนาล่าสุด] " + " ".join(recent))
-    parts.append(new_text)
-    return " ".join(parts)
-
 # Nodes
 def detector_node(state: AgentState):
     models = get_models()
@@ -31,10 +22,11 @@ def detector_node(state: AgentState):
     suspicious = state.get("suspicious_history", [])
     new_text = state["new_chunk"]
     
-    text_to_analyze = build_context(recent, suspicious, new_text)
+    # Token-budgeted input from cached token ids (app/context_builder.py)
+    context = models.scam_detector.build_context(new_text, suspicious, recent)
     
     # Run Classification
-    result = models.scam_classifier(text_to_analyze)[0]
+    result = models.scam_detector.classify(context)
     score = result['score']
     label = result['label']
     
@@ -44,7 +36,7 @@ def detector_node(state: AgentState):
     return {
         "status": final_status,
         "confidence": score,
-        "analysis_text": text_to_analyze,
+        "analysis_text": context.text,
         "new_chunk": new_text
     }
 
@@ -103,4 +95,20 @@ def build_agent():
     
     return workflow.compile()
 
-agent_app = build_agent()
+# Compiled on first use, so importing this module doesn't load any models
+_agent_app = None
+_agent_lock = threading.Lock()
+
+def get_agent_app():
+    global _agent_app
+    if _agent_app is None:
+        with _agent_lock:
+            if _agent_app is None:
+                _agent_app = build_agent()
+    return _agent_app
+
+def __getattr__(name):
+    # Keep `from app.agent_graph import agent_app` working
+    if name == "agent_app":
+        return get_agent_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
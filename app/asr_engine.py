@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import numpy as np
+from app.batching import MicroBatcher
+from app.config import SAMPLE_RATE, BATCHING_CONFIG
+
+# Same decoding behaviour as the single-segment path
+# (Thai forced_decoder_ids are set on the model config at load time)
+GENERATE_KWARGS = {
+    "max_new_tokens": 128,
+    "no_repeat_ngram_size": 3,
+    "condition_on_prev_tokens": False,
+    "temperature": 0.0
+}
+
+MIN_SAMPLES = int(SAMPLE_RATE * 0.3)
+# Whisper's input window; longer segments share one overflow bucket
+WINDOW_SECONDS = 30
+
+
+class ASREngine:
+    """
+    Batched Whisper ASR shared by all sessions.
+
+    Segments are grouped into length buckets (ASR_BUCKET_SECONDS) so a batch
+    holds segments of similar duration: their transcripts are of similar
+    length, so `generate` doesn't keep running for one long segment while
+    the rest of the batch is already finished. Segments of WINDOW_SECONDS
+    or more share the last bucket, so the number of batcher threads is bounded.
+    One generate call runs at a time; other buckets fill up meanwhile.
+    """
+    def __init__(self, asr_pipe, max_batch_size=None, max_wait_ms=None, bucket_seconds=None):
+        self.asr = asr_pipe
+        self.max_batch_size = max_batch_size or BATCHING_CONFIG["ASR_MAX_BATCH"]
+        self.max_wait_ms = BATCHING_CONFIG["ASR_MAX_WAIT_MS"] if max_wait_ms is None else max_wait_ms
+        self.bucket_seconds = bucket_seconds or BATCHING_CONFIG["ASR_BUCKET_SECONDS"]
+        self.max_bucket = int(WINDOW_SECONDS // self.bucket_seconds)
+        
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._model_lock = threading.Lock()
+    
+    def _bucket(self, num_samples):
+        key = min(int(num_samples / SAMPLE_RATE // self.bucket_seconds), self.max_bucket)
+        with self._buckets_lock:
+            batcher = self._buckets.get(key)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    self._generate,
+                    max_batch_size=self.max_batch_size,
+                    max_wait_ms=self.max_wait_ms,
+                    name=f"asr-bucket-{key}",
+                    model="asr",
+                )
+                self._buckets[key] = batcher
+            return batcher
+    
+    def _generate(self, chunks):
+        """One batched generate over a list of float32 chunks"""
+        # Convert to dict format supported by HuggingFace (avoid torchcodec)
+        inputs = [{"raw": chunk, "sampling_rate": SAMPLE_RATE} for chunk in chunks]
+        with self._model_lock:
+            results = self.asr(
+                inputs,
+                batch_size=len(inputs),
+                return_timestamps=False,
+                generate_kwargs=GENERATE_KWARGS,
+            )
+        return [self._clean(r["text"]) for r in results]
+    
+    @staticmethod
+    def _clean(text):
+        text = text.strip()
+        return text if len(text) > 2 else None
+    
+    def submit(self, audio_chunk):
+        """Queue one segment, return a Future (text or None)"""
+        chunk = np.asarray(audio_chunk, dtype=np.float32)
+        return self._bucket(len(chunk)).submit(chunk)
+    
+    def transcribe(self, audio_chunk):
+        """Blocking: transcribe one segment (batched with other sessions)"""
+        if len(audio_chunk) < MIN_SAMPLES:
+            return None
+        return self.submit(audio_chunk).result()
+    
+    def transcribe_many(self, audio_chunks):
+        """Blocking: transcribe all segments of a recording, results in input order"""
+        futures = [
+            self.submit(chunk) if len(chunk) >= MIN_SAMPLES else None
+            for chunk in audio_chunks
+        ]
+        return [f.result() if f is not None else None for f in futures]
+    
+    async def transcribe_async(self, audio_chunk):
+        """Await one segment without holding a worker thread"""
+        if len(audio_chunk) < MIN_SAMPLES:
+            return None
+        return await asyncio.wrap_future(self.submit(audio_chunk))
+    
+    async def transcribe_many_async(self, audio_chunks):
+        """Await all segments of a recording, results in input order"""
+        return await asyncio.gather(*[self.transcribe_async(chunk) for chunk in audio_chunks])
+    
+    def stats(self):
+        with self._buckets_lock:
+            return {f"bucket_{k}": b.stats() for k, b in sorted(self._buckets.items())}
@@ -0,0 +1,97 @@
+"""
+Decoded-audio store: each recording is decoded and resampled once.
+
+The mono SAMPLE_RATE float32 waveform is saved as <key>.npy and opened
+with np.load(mmap_mode="c"), so a session starts without decoding and
+every slice handed to diarization, VAD and ASR is a view of the mapping
+(no copy). Sessions in this process share one mapping, and other workers
+mapping the same file share its page cache. Copy-on-write: a consumer that
+writes to its slice gets private pages, and the file never changes.
+
+Key: sha256(content) + decoder version + sample rate. Files, the
+cross-worker compute lock and the LRU size limit are app/file_cache.py, as
+for the diarization cache; recordings mapped in this process are never
+replaced or evicted.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.config import SAMPLE_RATE
+from app.file_cache import FileCache
+
+
+def decode(audio_path):
+    """Decode + resample to mono SAMPLE_RATE float32"""
+    import librosa
+    y, _ = librosa.load(audio_path, sr=SAMPLE_RATE, mono=True)
+    return np.asarray(y, dtype=np.float32)
+
+
+class AudioStore:
+    def __init__(self, cache_dir, version, max_bytes, max_open=16):
+        self.files = FileCache(cache_dir, max_bytes)
+        self.version = version
+        # key -> mapped waveform, so sessions in this process share one mapping
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._open_lock = threading.Lock()
+        self.hits = 0
+        self.decodes = 0
+
+    def key(self, audio_path):
+        raw = f"{self.files.content_hash(audio_path)}|{self.version}|{SAMPLE_RATE}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def load(self, audio_path):
+        """Mono SAMPLE_RATE float32 waveform of a file (memory-mapped, decoded on first use)"""
+        key = self.key(audio_path)
+        with self._open_lock:
+            y = self._open.get(key)
+            if y is not None:
+                self._open.move_to_end(key)
+                self.hits += 1
+                return y
+
+        decoded = False
+        y = self._map(key)
+        if y is None:
+            # Only one worker decodes a given file; the others wait and map the result
+            with self.files.compute_lock(key):
+                y = self._map(key)
+                if y is None:
+                    audio = decode(audio_path)
+                    with self._open_lock:
+                        mapped = list(self._open)
+                    self.files.write(key, audio, keep=mapped)
+                    # Evicted right away when it alone exceeds the size limit: use it unmapped
+                    y = self._map(key)
+                    y = audio if y is None else y
+                    decoded = True
+        with self._open_lock:
+            if decoded:
+                self.decodes += 1
+            else:
+                self.hits += 1
+            self._open[key] = y
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return y
+
+    def _map(self, key):
+        """Mapped waveform or None"""
+        try:
+            y = np.load(self.files.path(key), mmap_mode="c")
+        except (FileNotFoundError, ValueError):
+            return None
+        self.files.touch(key)
+        return y
+
+    def stats(self):
+        with self._open_lock:
+            return {
+                "mapped_files": len(self._open),
+                "mapped_bytes": sum(y.nbytes for y in self._open.values()),
+                "hits": self.hits,
+                "decodes": self.decodes,
+            }
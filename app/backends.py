@@ -0,0 +1,159 @@
+"""
+Inference backends for the transformer models.
+
+  torch: Hugging Face PyTorch models on DEVICE (default)
+  onnx:  exported ONNX models run by ONNX Runtime on CPU, with dynamic int8
+         quantization (weights int8, activations quantized on the fly)
+
+Both return the same Hugging Face pipeline / (tokenizer, model) objects, so
+HybridPipeline and AIModels don't change.
+
+Pre-export all models:  python -m app.backends export
+"""
+import glob
+import os
+import re
+import shutil
+import sys
+import uuid
+from app.config import DEVICE, MODEL_PATHS, INFERENCE_CONFIG
+from app.file_cache import file_lock
+
+
+def _export_dir(model_id, kind):
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id.strip("/\\"))[-80:]
+    suffix = "int8" if INFERENCE_CONFIG["QUANTIZE"] else "fp32"
+    return os.path.join(INFERENCE_CONFIG["EXPORT_DIR"], f"{kind}-{name}-{suffix}")
+
+
+def _quantize_dir(model_dir):
+    """Dynamic int8 quantization of every .onnx file in place"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    for path in glob.glob(os.path.join(model_dir, "*.onnx")):
+        tmp_path = path + ".int8"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, path)
+        # External weight files (large models) are folded into the quantized file
+        for data_file in glob.glob(path + "_data"):
+            os.remove(data_file)
+
+
+def _session_options():
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if INFERENCE_CONFIG["NUM_THREADS"] > 0:
+        options.intra_op_num_threads = INFERENCE_CONFIG["NUM_THREADS"]
+    return options
+
+
+def _exported(out_dir):
+    return os.path.exists(os.path.join(out_dir, "config.json"))
+
+
+def _export(ort_class, model_id, kind, preprocessors):
+    """
+    Export (once) and return the directory of the ONNX model.
+    Worker processes loading the same model on a cold cache (bulk --workers)
+    export it once: the others wait on the lock and then use the result.
+    """
+    out_dir = _export_dir(model_id, kind)
+    if _exported(out_dir):
+        return out_dir
+    
+    os.makedirs(os.path.dirname(out_dir), exist_ok=True)
+    with file_lock(out_dir + ".lock"):
+        if _exported(out_dir):
+            return out_dir
+        # Left behind by crashed exports (no export is running while we hold the lock)
+        for stale in glob.glob(glob.escape(out_dir) + ".*.tmp"):
+            shutil.rmtree(stale, ignore_errors=True)
+        
+        print(f"   - Exporting {model_id} to ONNX ({out_dir})...")
+        tmp_dir = f"{out_dir}.{uuid.uuid4().hex}.tmp"
+        try:
+            model = ort_class.from_pretrained(model_id, export=True)
+            model.save_pretrained(tmp_dir)
+            for preprocessor in preprocessors:
+                preprocessor.save_pretrained(tmp_dir)
+            if INFERENCE_CONFIG["QUANTIZE"]:
+                _quantize_dir(tmp_dir)
+            if not _exported(out_dir):
+                # An incomplete out_dir can't be the result of a finished export
+                shutil.rmtree(out_dir, ignore_errors=True)
+                os.replace(tmp_dir, out_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return out_dir
+
+
+def load_sequence_classifier(model_path, use_fast=False):
+    """Return (tokenizer, model) for a sequence-classification checkpoint"""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=use_fast)
+    
+    if INFERENCE_CONFIG["BACKEND"] == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        onnx_dir = _export(ORTModelForSequenceClassification, model_path, "cls", [tokenizer])
+        model = ORTModelForSequenceClassification.from_pretrained(
+            onnx_dir, provider="CPUExecutionProvider", session_options=_session_options()
+        )
+        return tokenizer, model
+    
+    from transformers import AutoModelForSequenceClassification
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.to(DEVICE)
+    model.eval()
+    return tokenizer, model
+
+
+def load_text_classifier(model_path, use_fast=False):
+    """Hugging Face text-classification pipeline on the selected backend"""
+    from transformers import pipeline as hf_pipeline
+    
+    if INFERENCE_CONFIG["BACKEND"] == "onnx":
+        tokenizer, model = load_sequence_classifier(model_path, use_fast=use_fast)
+        return hf_pipeline("text-classification", model=model, tokenizer=tokenizer, device=-1)
+    
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=use_fast)
+    return hf_pipeline("text-classification", model=model_path, tokenizer=tokenizer, device=DEVICE)
+
+
+def load_asr(model_id=None):
+    """Hugging Face ASR pipeline (Whisper) on the selected backend"""
+    from transformers import pipeline as hf_pipeline
+    model_id = model_id or MODEL_PATHS["ASR"]
+    
+    if INFERENCE_CONFIG["BACKEND"] == "onnx":
+        from transformers import AutoProcessor
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        processor = AutoProcessor.from_pretrained(model_id)
+        onnx_dir = _export(ORTModelForSpeechSeq2Seq, model_id, "asr", [processor])
+        model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            onnx_dir, provider="CPUExecutionProvider", session_options=_session_options()
+        )
+        return hf_pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            device=-1
+        )
+    
+    return hf_pipeline(
+        "automatic-speech-recognition", 
+        model=model_id,
+        device=0 if DEVICE == "cuda" else -1
+    )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["export"]:
+        print("Usage: python -m app.backends export")
+        sys.exit(1)
+    INFERENCE_CONFIG["BACKEND"] = "onnx"
+    load_sequence_classifier(MODEL_PATHS["SCAM_DETECTOR"])
+    load_sequence_classifier(MODEL_PATHS["CALLER_IDENTIFIER"])
+    load_asr()
+    print(f"Exported to {INFERENCE_CONFIG['EXPORT_DIR']}")
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from app import metrics
+
+_batchers = weakref.WeakSet()
+
+@metrics.register_collector
+def _collect_queue_depths():
+    for batcher in list(_batchers):
+        metrics.QUEUE_DEPTH.labels(queue=batcher.name).set(batcher.pending())
+
+
+class MicroBatcher:
+    """
+    Collects requests from many callers (threads or sessions) for a few
+    milliseconds and runs them through `batch_fn` together.
+
+    batch_fn: list of items -> list of outputs (same order, same length)
+    Each caller gets a Future with its own output.
+    model: label for the /metrics model counters (several batchers may share one model);
+           None for batchers that don't run a model (no model metrics)
+    """
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="batcher", model=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.model = model
+        
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+        _batchers.add(self)
+    
+    def submit(self, item):
+        """Queue one item, return a Future for its output"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+    
+    def submit_many(self, items):
+        """Queue several items at once (they will be batched together)"""
+        return [self.submit(item) for item in items]
+    
+    def run(self, item, timeout=None):
+        """Blocking helper: submit and wait for the result"""
+        return self.submit(item).result(timeout=timeout)
+    
+    def pending(self):
+        """Number of items waiting for a batch"""
+        return self._queue.qsize()
+    
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "pending": self.pending(),
+            }
+    
+    def _collect(self):
+        """Block for the first item, then gather more until full or max_wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Still take whatever is already queued, just don't wait for more
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            # Drop requests whose caller gave up
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            items = [item for item, _ in batch]
+            start = time.perf_counter()
+            try:
+                outputs = self.batch_fn(items)
+                if len(outputs) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(outputs)} outputs for {len(items)} items"
+                    )
+            except Exception as e:
+                print(f"   Batch Error ({self.name}): {e}")
+                if self.model is not None:
+                    metrics.MODEL_ERRORS.labels(model=self.model).inc()
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            
+            for (_, fut), output in zip(batch, outputs):
+                fut.set_result(output)
+            
+            if self.model is not None:
+                metrics.MODEL_BATCH_SECONDS.labels(model=self.model).observe(time.perf_counter() - start)
+                metrics.MODEL_BATCHES.labels(model=self.model).inc()
+                metrics.MODEL_ITEMS.labels(model=self.model).inc(len(items))
+            
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(items)
+                self._largest_batch = max(self._largest_batch, len(items))
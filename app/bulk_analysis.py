@@ -0,0 +1,323 @@
+"""
+Offline bulk analysis of call-recording archives.
+
+    python -m app.bulk_analysis recordings/ -o results.jsonl
+    python -m app.bulk_analysis manifest.csv -o results.jsonl --parquet results.parquet --workers 2
+
+Input is a directory (searched recursively for audio files) or a manifest:
+.txt (one path per line), .csv (a "path" column) or .jsonl ({"path": ...}).
+
+A pool of decode threads loads and resamples recordings to mono 16 kHz
+ahead of time. The decoded audio goes to a pool of worker processes, and
+each worker holds one copy of the models (HybridPipeline). Every file is
+analysed without real-time pacing: one diarization pass, ASR batched over
+all its segments, then the caller-turn classifier.
+
+Output is JSONL: one "segment" record per speaker turn, then one "file"
+record per recording. All records of a file are written with a single
+write, so the output can be resumed after a crash. On restart, a torn tail
+is truncated and files that already have a "file" record are skipped.
+Files that failed are retried. --parquet also writes segments and files
+as Parquet tables when the run ends (needs pyarrow).
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from app.config import SAMPLE_RATE
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".amr"}
+
+
+def list_inputs(source):
+    """Directory or manifest -> sorted list of absolute audio paths"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    paths.append(os.path.join(root, name))
+        return sorted(os.path.abspath(p) for p in paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    ext = os.path.splitext(source)[1].lower()
+    with open(source, encoding="utf-8") as f:
+        if ext == ".csv":
+            paths = [row["path"] for row in csv.DictReader(f)]
+        elif ext in (".jsonl", ".ndjson"):
+            paths = [json.loads(line)["path"] for line in f if line.strip()]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    # De-duplicate, keep manifest order
+    return list(dict.fromkeys(os.path.abspath(os.path.join(base, p)) for p in paths))
+
+
+def resume_output(output_path):
+    """
+    Truncate any torn tail of an earlier run and return the set of files
+    already completed (a "file" record without an error)
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    keep = 0
+    with open(output_path, "rb") as f:
+        offset = 0
+        for line in f:
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record.get("type") == "file":
+                keep = offset
+                if not record.get("error"):
+                    done.add(record["file"])
+
+    if keep < os.path.getsize(output_path):
+        print(f"Resuming: dropping {os.path.getsize(output_path) - keep} bytes of incomplete output")
+        with open(output_path, "r+b") as f:
+            f.truncate(keep)
+    return done
+
+
+def decode(path):
+    """Decode + resample to mono SAMPLE_RATE float32 (decode pool)"""
+    import librosa
+    y, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+    return y
+
+
+# ---------- Worker process ----------
+
+def _init_worker(slm):
+    # Load and warm up what the offline path uses before the first file arrives
+    from app.config import DIARIZATION_CONFIG, CALLER_ID_CONFIG, VOICEPRINT_CONFIG
+    from app.model_registry import get_registry
+    from app.pipeline_hybrid import get_hybrid_pipeline
+
+    diarizer = "online_diarizer" if DIARIZATION_CONFIG["MODE"] == "online" else "diarization"
+    models = [diarizer, "vad", "asr_engine", "scam_detector"]
+    models += (["caller_detector"] if CALLER_ID_CONFIG["ENABLED"] else [])
+    models += (["voiceprints"] if VOICEPRINT_CONFIG["ENABLED"] else []) + (["explainer_slm"] if slm else [])
+    get_registry().load_all(models)
+    get_hybrid_pipeline()
+
+
+def analyze_file(path, audio, slm=False):
+    """Worker: full offline analysis of one recording -> list of records"""
+    from app.pipeline_hybrid import get_hybrid_pipeline
+
+    start = time.perf_counter()
+    pipeline = get_hybrid_pipeline()
+    session = pipeline.new_session(source="bulk")
+
+    records = []
+    warning = None
+    # Each archive file is seen once: keep it out of the served diarization cache
+    for event in pipeline.run_hybrid_streaming(
+        path, simulate_realtime=False, session=session, defer_slm=not slm, audio=audio,
+        cache_diarization=False,
+    ):
+        if event.get("type") != "result":
+            continue
+        if event.get("is_warning"):
+            warning = event["reason"]
+            continue
+        records.append({
+            "type": "segment",
+            "file": path,
+            "start": round(event["start"], 3),
+            "end": round(event["end"], 3),
+            "speaker": event["speaker"],
+            "role": event["role"],
+            "text": event["text"],
+            "status": event["status"],
+            "confidence": round(float(event["confidence"]), 4),
+            "matched_phrases": event.get("matched_phrases", []),
+        })
+
+    if session.scam_count >= 3:
+        verdict = "SCAM"
+    elif session.scam_count or session.suspicious_memory:
+        verdict = "SUSPICIOUS"
+    else:
+        verdict = "SAFE"
+
+    records.append({
+        "type": "file",
+        "file": path,
+        "duration_s": round(len(audio) / SAMPLE_RATE, 2),
+        "segments": len(records),
+        "scam_segments": session.scam_count,
+        "verdict": verdict,
+        "warning": warning,
+        "known_scammer": session.known_scammer["id"] if session.known_scammer else None,
+        "speech_s": round(session.speech_seconds, 2),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "error": None,
+    })
+    # Worker processes exit without running atexit hooks: write the history rows
+    # (and cached SLM explanations) now
+    if pipeline.history is not None:
+        pipeline.history.flush()
+    if slm:
+        from app.explanation_cache import get_explanation_cache
+        cache = get_explanation_cache()
+        if cache is not None:
+            cache.flush()
+    return records
+
+
+# ---------- Driver ----------
+
+class Progress:
+    """Files done, audio-hours per wall-hour and ETA"""
+    def __init__(self, total, every_s=5.0):
+        self.total = total
+        self.every_s = every_s
+        self.start = time.perf_counter()
+        self.last_print = 0.0
+        self.files = 0
+        self.errors = 0
+        self.audio_s = 0.0
+
+    def update(self, record):
+        self.files += 1
+        self.errors += bool(record.get("error"))
+        self.audio_s += record.get("duration_s") or 0.0
+        now = time.perf_counter()
+        if now - self.last_print >= self.every_s or self.files == self.total:
+            self.last_print = now
+            print(self.line(), flush=True)
+
+    def line(self):
+        wall_s = max(time.perf_counter() - self.start, 1e-9)
+        rate = self.audio_s / wall_s
+        eta = (self.total - self.files) * (wall_s / self.files) if self.files else float("nan")
+        return (f"[{self.files}/{self.total}] {self.audio_s / 3600:.2f} audio-h in {wall_s / 3600:.2f} wall-h "
+                f"= {rate:.1f} audio-h/wall-h, {self.errors} errors, ETA {eta / 60:.0f} min")
+
+
+def run(paths, output_path, workers=1, decode_workers=4, slm=False, max_pending=None):
+    """Analyse `paths`, appending to output_path (skips files already done)"""
+    done = resume_output(output_path)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} recordings, {len(done & set(paths))} already done, {len(todo)} to analyse")
+    if not todo:
+        return
+
+    # Decoded audio waiting for a worker is bounded, so memory stays flat
+    max_pending = max_pending or 2 * workers
+    progress = Progress(len(todo))
+
+    # spawn: CUDA and the models' threads don't survive fork
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode") as decoders, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=_init_worker, initargs=(slm,)) as analyzers:
+
+        def write(records):
+            out.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            out.flush()
+            os.fsync(out.fileno())
+            progress.update(records[-1])
+
+        def failed(path, stage, error):
+            return [{"type": "file", "file": path, "error": f"{stage}: {type(error).__name__}: {error}"}]
+
+        queue = iter(todo)
+        decoding = {}   # decode future -> path
+        analyzing = {}  # analysis future -> path
+
+        def fill():
+            while len(decoding) + len(analyzing) < max_pending + decode_workers:
+                path = next(queue, None)
+                if path is None:
+                    return
+                decoding[decoders.submit(decode, path)] = path
+
+        fill()
+        while decoding or analyzing:
+            finished, _ = wait(list(decoding) + list(analyzing), return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in decoding:
+                    path = decoding.pop(future)
+                    try:
+                        audio = future.result()
+                    except Exception as e:
+                        write(failed(path, "decode", e))
+                        continue
+                    analyzing[analyzers.submit(analyze_file, path, audio, slm)] = path
+                else:
+                    path = analyzing.pop(future)
+                    try:
+                        write(future.result())
+                    except Exception as e:
+                        write(failed(path, "analyze", e))
+            fill()
+
+    print(f"Done: {progress.line()}")
+
+
+def write_parquet(output_path, parquet_path):
+    """JSONL results -> <parquet_path> (segments) + <name>.files.parquet (one row per recording)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is not installed: pip install pyarrow")
+        return
+
+    segments, files = [], {}
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.pop("type") == "segment":
+                segments.append(record)
+            else:
+                # A retried file has an error record followed by the real one
+                files[record["file"]] = record
+    files = list(files.values())
+
+    def table(rows):
+        # Error records lack most fields: use the union of keys as columns
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        return pa.Table.from_pylist([{key: row.get(key) for key in columns} for row in rows])
+
+    pq.write_table(table(segments), parquet_path)
+    files_path = os.path.splitext(parquet_path)[0] + ".files.parquet"
+    pq.write_table(table(files), files_path)
+    print(f"Wrote {len(segments)} segments to {parquet_path}, {len(files)} files to {files_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of recordings or manifest (.txt / .csv / .jsonl)")
+    parser.add_argument("-o", "--output", default="bulk_results.jsonl", help="JSONL results (appended, resumable)")
+    parser.add_argument("--parquet", help="also write Parquet tables here at the end")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="analysis processes (each loads its own copy of the models)")
+    parser.add_argument("--decode-workers", type=int, default=4, help="audio decode threads")
+    parser.add_argument("--slm", action="store_true", help="generate SLM warning advice for SCAM calls (slow)")
+    args = parser.parse_args(argv)
+
+    paths = list_inputs(args.input)
+    if not paths:
+        print(f"No audio files found in {args.input}")
+        return 1
+
+    run(paths, args.output, workers=args.workers, decode_workers=args.decode_workers, slm=args.slm)
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Caller / receiver roles from the caller-identifier model.
+
+CallerIdentifier scores a transcribed turn with P(caller), micro-batched
+across sessions like the scam classifier. Each call has a RoleTracker that
+collects the scores of each speaker's early turns and locks the roles once
+it is confident (CALLER_ID_CONFIG). After that no more turns are scored.
+Until then the speaker with the highest mean score is the provisional
+caller (the first speaker heard when nothing is scored yet).
+"""
+from app.classifier import BatchedTextClassifier
+from app.config import CALLER_ID_CONFIG
+
+
+class CallerIdentifier(BatchedTextClassifier):
+    """Batched P(caller) for transcribed turns"""
+    def __init__(self, model, tokenizer, **kwargs):
+        kwargs.setdefault("name", "caller-identifier")
+        super().__init__(model, tokenizer, **kwargs)
+        self.caller_index = self._caller_index(self.id2label)
+
+    @staticmethod
+    def _caller_index(id2label):
+        label = CALLER_ID_CONFIG["LABEL"].upper()
+        for index, name in id2label.items():
+            if str(name).upper() == label:
+                return int(index)
+        print(f"   Caller label {label!r} not in {id2label}, using class 1")
+        return 1
+
+    def _forward(self, texts):
+        return self._probabilities(texts)[:, self.caller_index].tolist()
+
+    def score(self, text):
+        """Blocking: P(caller) of one turn"""
+        return self.batcher.run(text)
+
+    async def score_async(self, text):
+        return await self.classify_async(text)
+
+    def score_many(self, texts):
+        """Blocking: P(caller) per turn, submitted together (one batched pass)"""
+        return self.classify_many(texts)
+
+
+class RoleTracker:
+    """Per-call role assignment from caller scores"""
+    def __init__(self, enabled=None, threshold=None, min_turns=None, max_turns=None):
+        self.enabled = CALLER_ID_CONFIG["ENABLED"] if enabled is None else enabled
+        self.threshold = threshold or CALLER_ID_CONFIG["THRESHOLD"]
+        self.min_turns = min_turns or CALLER_ID_CONFIG["MIN_TURNS"]
+        self.max_turns = max_turns or CALLER_ID_CONFIG["MAX_TURNS"]
+        self.scores = {}     # speaker -> [P(caller)] in order heard
+        self._scored = set() # turn start times already scored
+        self.caller = None   # locked caller
+        self.confidence = None
+
+    @property
+    def locked(self):
+        return self.caller is not None
+
+    def observe(self, speaker):
+        self.scores.setdefault(speaker, [])
+
+    def needs_score(self, speaker, start):
+        self.observe(speaker)
+        return (self.enabled and not self.locked and start not in self._scored
+                and len(self.scores[speaker]) < self.max_turns)
+
+    def add(self, speaker, start, score):
+        self.observe(speaker)
+        self._scored.add(start)
+        self.scores[speaker].append(float(score))
+        self._update()
+
+    def early_turns(self, segments, texts):
+        """(speaker, start, text) of the turns to score up front: the first max_turns per speaker"""
+        turns, counts = [], {}
+        for seg, text in zip(segments, texts):
+            speaker = seg["speaker"]
+            self.observe(speaker)
+            if text and counts.get(speaker, 0) < self.max_turns and self.needs_score(speaker, seg["start"]):
+                counts[speaker] = counts.get(speaker, 0) + 1
+                turns.append((speaker, seg["start"], text))
+        return turns
+
+    def _mean(self, speaker):
+        scores = self.scores.get(speaker)
+        # Unscored speakers count as undecided
+        return sum(scores) / len(scores) if scores else 0.5
+
+    def lock(self, speaker, confidence):
+        """Fix the caller (also used when other evidence, e.g. a voiceprint, settles it)"""
+        self.caller = speaker
+        self.confidence = confidence
+
+    def _update(self):
+        decided = {s: self._mean(s) for s, scores in self.scores.items() if len(scores) >= self.min_turns}
+        for speaker, mean in decided.items():
+            if mean >= self.threshold:
+                return self.lock(speaker, mean)
+        others = list(self.scores)
+        for speaker, mean in decided.items():
+            if mean <= 1.0 - self.threshold and len(others) == 2:
+                other = others[1] if others[0] == speaker else others[0]
+                return self.lock(other, 1.0 - mean)
+        if len(others) >= 2 and all(len(scores) >= self.max_turns for scores in self.scores.values()):
+            caller = self.provisional_caller()
+            self.lock(caller, self._mean(caller))
+
+    def provisional_caller(self):
+        if not self.scores:
+            return None
+        # max() keeps the first speaker heard on ties
+        return max(self.scores, key=self._mean)
+
+    def role(self, speaker):
+        self.observe(speaker)
+        caller = self.caller if self.locked else self.provisional_caller()
+        return "CALLER" if speaker == caller else "RECEIVER"
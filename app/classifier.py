@@ -0,0 +1,103 @@
+import asyncio
+from app.batching import MicroBatcher
+from app.config import BATCHING_CONFIG
+
+
+class BatchedTextClassifier:
+    """
+    Text classifier shared by all sessions.
+    Requests are micro-batched (MicroBatcher) into one padded forward pass.
+    An item is a text or an EncodedContext (already tokenized, see build_context).
+    Output format matches the HF text-classification pipeline: {"label", "score"}
+    """
+    def __init__(self, model, tokenizer, max_batch_size=None, max_wait_ms=None, name="scam-classifier"):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.id2label = model.config.id2label
+        
+        # Never let the tokenizer produce more positions than the model has
+        self.max_length = min(
+            getattr(tokenizer, "model_max_length", 512) or 512,
+            getattr(model.config, "max_position_embeddings", 514) - 2,
+        )
+        self._context_builder = None
+        
+        self.batcher = MicroBatcher(
+            self._forward,
+            max_batch_size=max_batch_size or BATCHING_CONFIG["CLASSIFIER_MAX_BATCH"],
+            max_wait_ms=BATCHING_CONFIG["CLASSIFIER_MAX_WAIT_MS"] if max_wait_ms is None else max_wait_ms,
+            name=name,
+            model=name,
+        )
+    
+    @classmethod
+    def from_pipeline(cls, hf_pipe, **kwargs):
+        """Wrap the model/tokenizer of an already-loaded HF pipeline (no extra copy)"""
+        return cls(hf_pipe.model, hf_pipe.tokenizer, **kwargs)
+    
+    @property
+    def context_builder(self):
+        if self._context_builder is None:
+            from app.config import CONTEXT_CONFIG
+            from app.context_builder import ContextBuilder
+            self._context_builder = ContextBuilder(
+                self.tokenizer, max_tokens=min(CONTEXT_CONFIG["MAX_TOKENS"], self.max_length)
+            )
+        return self._context_builder
+    
+    def build_context(self, new_text, suspicious=(), recent=()):
+        """New turn + memory -> EncodedContext within the token budget (pass it to classify)"""
+        return self.context_builder.build(new_text, suspicious, recent)
+    
+    def _forward(self, items):
+        """One padded forward pass over a batch of texts / EncodedContexts"""
+        scores, label_ids = self._probabilities(items).max(dim=-1)
+        return [
+            {"label": self.id2label[int(label_id)], "score": float(score)}
+            for score, label_id in zip(scores.tolist(), label_ids.tolist())
+        ]
+    
+    def _probabilities(self, items):
+        """Class probabilities, one row per item"""
+        import torch
+        
+        texts = [item for item in items if isinstance(item, str)]
+        encoded_texts = iter(self.tokenizer(
+            texts, truncation=True, max_length=self.max_length
+        )["input_ids"] if texts else [])
+        ids = [next(encoded_texts) if isinstance(item, str) else item.ids for item in items]
+        
+        # Right-padded to the longest item of this batch
+        width = max(len(item_ids) for item_ids in ids)
+        input_ids = torch.full((len(ids), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(ids), width), dtype=torch.long)
+        for row, item_ids in enumerate(ids):
+            input_ids[row, :len(item_ids)] = torch.tensor(item_ids, dtype=torch.long)
+            attention_mask[row, :len(item_ids)] = 1
+        
+        with torch.inference_mode():
+            logits = self.model(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device),
+            ).logits
+        return logits.softmax(dim=-1)
+    
+    def classify(self, text):
+        """Blocking: classify one text or EncodedContext (batched with other callers)"""
+        return self.batcher.run(text)
+    
+    def classify_many(self, texts):
+        """Blocking: classify a list of texts, results in input order"""
+        futures = self.batcher.submit_many(texts)
+        return [f.result() for f in futures]
+    
+    async def classify_async(self, text):
+        """Await a result without holding a worker thread"""
+        return await asyncio.wrap_future(self.batcher.submit(text))
+    
+    def submit_many(self, texts):
+        """Non-blocking: one concurrent.futures.Future per text"""
+        return self.batcher.submit_many(texts)
+    
+    def stats(self):
+        return self.batcher.stats()
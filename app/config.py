@@ -15,6 +15,29 @@ HF_TOKEN = os.getenv("HF_TOKEN", "")
 MODEL_PATHS = {
     "CALLER_IDENTIFIER": os.getenv("CALLER_IDENTIFIER_PATH", r"D:\KBTG_cybersec\checkpoint-350"),
     "SCAM_DETECTOR": os.getenv("SCAM_DETECTOR_PATH", r"D:\KBTG_cybersec\model"),
+    "ASR": os.getenv("ASR_MODEL_PATH", "biodatlab/distill-whisper-th-small"),
+}
+
+# Inference backend for the classifiers and Whisper:
+# "torch" (PyTorch on DEVICE) or "onnx" (ONNX Runtime on CPU, int8 dynamic quantization)
+INFERENCE_CONFIG = {
+    "BACKEND": os.getenv("INFERENCE_BACKEND", "torch"),
+    "EXPORT_DIR": os.getenv("ONNX_EXPORT_DIR", os.path.join(".cache", "onnx")),
+    "QUANTIZE": os.getenv("ONNX_QUANTIZE", "true").lower() == "true",
+    # 0 = let ONNX Runtime decide
+    "NUM_THREADS": int(os.getenv("ONNX_NUM_THREADS", "0")),
+}
+
+# Shared model registry (app/model_registry.py)
+MODEL_CONFIG = {
+    # Load all models in parallel at startup (false = each model loads on first use)
+    "PRELOAD": os.getenv("MODEL_PRELOAD", "true").lower() == "true",
+    # One dummy inference per model after loading
+    "WARMUP": os.getenv("MODEL_WARMUP", "true").lower() == "true",
+    "LOAD_WORKERS": int(os.getenv("MODEL_LOAD_WORKERS", "4")),
+    # Threads for the blocking model calls of async sessions (VAD, diarization, decoding);
+    # batched models (ASR, classifier) are awaited without a thread
+    "EXECUTOR_WORKERS": int(os.getenv("MODEL_EXECUTOR_WORKERS", "8")),
 }
 
 AGENT_CONFIG = {
@@ -24,3 +47,141 @@ AGENT_CONFIG = {
     "OLLAMA_MODEL": "qwen3:1.7b",
     "OLLAMA_BASE_URL": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 }
+
+# Micro-batching: requests from all sessions are grouped for up to MAX_WAIT_MS
+BATCHING_CONFIG = {
+    "CLASSIFIER_MAX_BATCH": int(os.getenv("CLASSIFIER_MAX_BATCH", "16")),
+    "CLASSIFIER_MAX_WAIT_MS": float(os.getenv("CLASSIFIER_MAX_WAIT_MS", "5")),
+    "ASR_MAX_BATCH": int(os.getenv("ASR_MAX_BATCH", "8")),
+    "ASR_MAX_WAIT_MS": float(os.getenv("ASR_MAX_WAIT_MS", "20")),
+    # Segments are grouped by duration into buckets this many seconds wide
+    "ASR_BUCKET_SECONDS": float(os.getenv("ASR_BUCKET_SECONDS", "5")),
+}
+
+# Caller / receiver roles from the caller-identifier model (app/caller_id.py)
+CALLER_ID_CONFIG = {
+    # false = the first speaker heard is the caller
+    "ENABLED": os.getenv("CALLER_ID_ENABLED", "true").lower() == "true",
+    # Label of the caller class (LABEL_<n> checkpoints: set CALLER_LABEL=LABEL_<n>)
+    "LABEL": os.getenv("CALLER_LABEL", "CALLER"),
+    # Roles lock once a speaker's mean P(caller) over >= MIN_TURNS turns reaches THRESHOLD
+    # (or drops to 1 - THRESHOLD, making the other speaker the caller)
+    "THRESHOLD": float(os.getenv("CALLER_ID_THRESHOLD", "0.8")),
+    "MIN_TURNS": int(os.getenv("CALLER_ID_MIN_TURNS", "2")),
+    # Turns scored per speaker at most; then the more likely caller is locked in
+    "MAX_TURNS": int(os.getenv("CALLER_ID_MAX_TURNS", "4")),
+}
+
+# Scam-classifier input: new turn + memory, assembled from cached token ids (app/context_builder.py)
+CONTEXT_CONFIG = {
+    # Token budget per classifier input (capped at the model's maximum length)
+    "MAX_TOKENS": int(os.getenv("CLASSIFIER_CONTEXT_TOKENS", "256")),
+    # Remembered utterances whose token ids are kept
+    "TOKEN_CACHE_SIZE": int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", "10000")),
+}
+
+# Persistent diarization cache (shared by all workers, keyed by audio content)
+DIARIZATION_CONFIG = {
+    "MODEL": "pyannote/speaker-diarization-3.1",
+    "NUM_SPEAKERS": 2,
+    "CACHE_DIR": os.getenv("DIARIZATION_CACHE_DIR", os.path.join(".cache", "diarization")),
+    "CACHE_MAX_MB": float(os.getenv("DIARIZATION_CACHE_MAX_MB", "256")),
+    # "offline" = whole-file pyannote pass, "online" = incremental sliding window
+    "MODE": os.getenv("DIARIZATION_MODE", "offline"),
+    "ONLINE_WINDOW_S": float(os.getenv("ONLINE_WINDOW_S", "1.5")),
+    "ONLINE_STEP_S": float(os.getenv("ONLINE_STEP_S", "0.5")),
+    "ONLINE_STABLE_WINDOWS": int(os.getenv("ONLINE_STABLE_WINDOWS", "2")),
+    "ONLINE_THRESHOLD": float(os.getenv("ONLINE_THRESHOLD", "0.5")),
+    "ONLINE_MIN_RMS": 0.01,
+}
+
+# Decoded recordings, memory-mapped (app/audio_store.py)
+AUDIO_CACHE_CONFIG = {
+    "ENABLED": os.getenv("AUDIO_CACHE", "true").lower() == "true",
+    "DIR": os.getenv("AUDIO_CACHE_DIR", os.path.join(".cache", "audio")),
+    # 1 hour of audio is ~230 MB at 16 kHz float32
+    "MAX_MB": float(os.getenv("AUDIO_CACHE_MAX_MB", "2048")),
+}
+
+# Known-scammer voiceprint index (app/voiceprints.py)
+VOICEPRINT_CONFIG = {
+    # Checked only when an index has been built in DIR
+    "ENABLED": os.getenv("VOICEPRINT_ENABLED", "true").lower() == "true",
+    "DIR": os.getenv("VOICEPRINT_DIR", os.path.join(".cache", "voiceprints")),
+    # Cosine similarity at which a voice counts as a known scammer
+    "THRESHOLD": float(os.getenv("VOICEPRINT_THRESHOLD", "0.75")),
+    # Seconds of a speaker's first turn that are embedded
+    "CHECK_SECONDS": float(os.getenv("VOICEPRINT_CHECK_SECONDS", "3")),
+    # IVF lists searched per lookup (more = better recall, slower)
+    "N_PROBE": int(os.getenv("VOICEPRINT_N_PROBE", "16")),
+    # IVF lists built (0 = about sqrt(number of prints))
+    "N_LISTS": int(os.getenv("VOICEPRINT_N_LISTS", "0")),
+}
+
+# Live streaming mode (/ws/live): client pushes audio frames
+LIVE_CONFIG = {
+    # Ring buffer holds this much client audio (must exceed MAX_UTTERANCE_S)
+    "RING_SECONDS": int(os.getenv("LIVE_RING_SECONDS", "30")),
+    "MIN_SILENCE_MS": int(os.getenv("LIVE_MIN_SILENCE_MS", "500")),
+    "MAX_UTTERANCE_S": float(os.getenv("LIVE_MAX_UTTERANCE_S", "15")),
+    # Frame is speech when RMS > max(MIN_RMS, noise floor * SPEECH_RATIO)
+    "MIN_RMS": 0.01,
+    "SPEECH_RATIO": 3.0,
+    # Utterances waiting for ASR; beyond this they are dropped (server overloaded)
+    "MAX_PENDING_UTTERANCES": int(os.getenv("LIVE_MAX_PENDING", "8")),
+}
+
+# Voice activity gating before ASR (Silero VAD)
+VAD_CONFIG = {
+    "ENABLED": os.getenv("VAD_ENABLED", "true").lower() == "true",
+    "THRESHOLD": float(os.getenv("VAD_THRESHOLD", "0.5")),
+    "MIN_SILENCE_MS": 300,
+    "SPEECH_PAD_MS": 100,
+    # Silero models kept for concurrent sessions
+    "POOL_SIZE": int(os.getenv("VAD_POOL_SIZE", "4")),
+}
+
+# Keyword pre-filter before BERT (see app/prefilter.py)
+PREFILTER_CONFIG = {
+    # gate = skip BERT for clearly benign turns, shadow = only measure, off = disabled
+    "MODE": os.getenv("PREFILTER_MODE", "gate"),
+    # Matched phrases needed to escalate a turn without history
+    "MIN_MATCHES": int(os.getenv("PREFILTER_MIN_MATCHES", "1")),
+    # Always escalate when the call already has suspicious turns
+    "ESCALATE_WITH_HISTORY": True,
+}
+
+# Async SLM client (app/explainer.py)
+EXPLAINER_CONFIG = {
+    # Max generations in flight against Ollama (also the HTTP connection pool size)
+    "MAX_CONCURRENCY": int(os.getenv("SLM_MAX_CONCURRENCY", "4")),
+    "TIMEOUT_S": float(os.getenv("SLM_TIMEOUT_S", "60")),
+    "CONNECT_TIMEOUT_S": 5.0,
+}
+
+# Result history in SQLite (app/history_store.py)
+HISTORY_CONFIG = {
+    "ENABLED": os.getenv("HISTORY_ENABLED", "true").lower() == "true",
+    "PATH": os.getenv("HISTORY_DB", os.path.join(".cache", "history.sqlite3")),
+    # Rows per write transaction, and how long the writer waits to fill one
+    "BATCH_SIZE": int(os.getenv("HISTORY_BATCH_SIZE", "256")),
+    "FLUSH_MS": float(os.getenv("HISTORY_FLUSH_MS", "200")),
+    # Rows waiting for the writer; beyond this new rows are dropped (disk stalled)
+    "MAX_PENDING": int(os.getenv("HISTORY_MAX_PENDING", "10000")),
+    "PAGE_SIZE": 100,
+    "MAX_PAGE_SIZE": 1000,
+}
+
+# Explanation cache in front of the SLM (app/explanation_cache.py)
+EXPLANATION_CACHE_CONFIG = {
+    "ENABLED": os.getenv("EXPLANATION_CACHE", "true").lower() == "true",
+    "MAX_ENTRIES": int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "2048")),
+    "TTL_S": float(os.getenv("EXPLANATION_CACHE_TTL_S", "86400")),
+    # Estimated Jaccard similarity (character n-grams) to reuse an explanation
+    "SIMILARITY": float(os.getenv("EXPLANATION_CACHE_SIMILARITY", "0.8")),
+    # JSONL file for persistence ("" = memory only)
+    "PATH": os.getenv("EXPLANATION_CACHE_PATH", ""),
+    "NGRAM": 3,
+    "NUM_PERM": 64,
+    "BANDS": 16,
+}
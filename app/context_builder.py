@@ -0,0 +1,128 @@
+"""
+Scam-classifier input built within a token budget.
+
+The classifier sees the new turn plus the conversation memory:
+
+    [สัญญาณก่อนหน้า] <suspicious> | <suspicious> [บทสนทนาล่าสุด] <recent> <recent> <new turn>
+
+Every remembered utterance is tokenized once (fast tokenizer) and its ids
+are cached, so a turn costs one encode of the new text. The input is then
+assembled from cached ids within CONTEXT_CONFIG["MAX_TOKENS"]:
+  1. the new turn is always kept (if it alone is over budget, its end is kept)
+  2. suspicious history, newest first
+  3. recent turns, newest first
+Whatever doesn't fit is dropped whole, never cut off halfway, and the
+assembled order stays the same as above.
+"""
+import threading
+from collections import OrderedDict
+from app.config import CONTEXT_CONFIG
+
+SUSPICIOUS_MARKER = "[สัญญาณก่อนหน้า]"
+RECENT_MARKER = "[บทสนทนาล่าสุด]"
+SEPARATOR = "|"
+
+
+class EncodedContext:
+    """Classifier input: token ids (with special tokens) + the text they stand for"""
+    __slots__ = ("ids", "text")
+
+    def __init__(self, ids, text):
+        self.ids = ids
+        self.text = text
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ContextBuilder:
+    def __init__(self, tokenizer, max_tokens=None, cache_size=None):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens or CONTEXT_CONFIG["MAX_TOKENS"]
+        self.cache_size = cache_size or CONTEXT_CONFIG["TOKEN_CACHE_SIZE"]
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.budget = self.max_tokens - tokenizer.num_special_tokens_to_add()
+        self._suspicious_marker, self._recent_marker, self._separator = self.encode_many(
+            [SUSPICIOUS_MARKER, RECENT_MARKER, SEPARATOR]
+        )
+
+    def encode_many(self, texts):
+        """Token ids (no special tokens) per text; misses are encoded in one call"""
+        with self._lock:
+            ids = [self._cache.get(text) for text in texts]
+            for text, cached in zip(texts, ids):
+                if cached is not None:
+                    self._cache.move_to_end(text)
+        missing = list(dict.fromkeys(text for text, cached in zip(texts, ids) if cached is None))
+        if not missing:
+            with self._lock:
+                self.hits += len(texts)
+            return ids
+
+        encoded = dict(zip(missing, self.tokenizer(missing, add_special_tokens=False)["input_ids"]))
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            for text, text_ids in encoded.items():
+                self._cache[text] = text_ids
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [cached if cached is not None else encoded[text] for text, cached in zip(texts, ids)]
+
+    def build(self, new_text, suspicious=(), recent=()):
+        """New turn + memory -> EncodedContext within max_tokens"""
+        suspicious, recent = list(suspicious), list(recent)
+        all_ids = self.encode_many([new_text] + suspicious + recent)
+        new_ids = all_ids[0]
+        suspicious_ids = all_ids[1:1 + len(suspicious)]
+        recent_ids = all_ids[1 + len(suspicious):]
+
+        if len(new_ids) >= self.budget:
+            ids = new_ids[len(new_ids) - self.budget:]
+            return EncodedContext(self.tokenizer.build_inputs_with_special_tokens(ids), new_text)
+
+        remaining = self.budget - len(new_ids)
+        kept_suspicious, remaining = self._fit(suspicious, suspicious_ids, remaining,
+                                               self._suspicious_marker, self._separator)
+        kept_recent, remaining = self._fit(recent, recent_ids, remaining, self._recent_marker, [])
+
+        ids, parts = [], []
+        if kept_suspicious:
+            ids += self._suspicious_marker
+            for i, (text, text_ids) in enumerate(kept_suspicious):
+                ids += (self._separator if i else []) + text_ids
+            parts.append(SUSPICIOUS_MARKER + " " + f" {SEPARATOR} ".join(text for text, _ in kept_suspicious))
+        if kept_recent:
+            ids += self._recent_marker
+            for text, text_ids in kept_recent:
+                ids += text_ids
+            parts.append(RECENT_MARKER + " " + " ".join(text for text, _ in kept_recent))
+        ids += new_ids
+        parts.append(new_text)
+
+        return EncodedContext(self.tokenizer.build_inputs_with_special_tokens(ids), " ".join(parts))
+
+    @staticmethod
+    def _fit(texts, texts_ids, remaining, marker, separator):
+        """Newest-first greedy fill; returns ([(text, ids)] in original order, tokens left)"""
+        kept = []
+        for text, text_ids in zip(reversed(texts), reversed(texts_ids)):
+            cost = len(text_ids) + (len(marker) if not kept else len(separator))
+            if cost > remaining:
+                break
+            kept.append((text, text_ids))
+            remaining -= cost
+        return kept[::-1], remaining
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_tokens": self.max_tokens,
+                "cached_utterances": len(self._cache),
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,56 @@
+import hashlib
+import numpy as np
+from app.file_cache import FileCache
+
+# One row per diarized turn: 24 bytes, readable with np.load(mmap_mode="r")
+SEGMENT_DTYPE = np.dtype([("start", "<f4"), ("end", "<f4"), ("speaker", "S16")])
+
+
+class DiarizationCache:
+    """
+    Disk-backed diarization cache shared by all uvicorn workers.
+    
+    Key: sha256(audio content) + pipeline version + num_speakers
+    Value: <key>.npy, a SEGMENT_DTYPE array
+    Writes go to a temp file and are renamed into place, so readers in other
+    workers never see a partial file. Oldest entries (by last use) are
+    evicted once the directory grows past max_bytes (see app/file_cache.py).
+    """
+    def __init__(self, cache_dir, version, max_bytes):
+        self.files = FileCache(cache_dir, max_bytes)
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+    
+    def content_hash(self, audio_path):
+        return self.files.content_hash(audio_path)
+    
+    def key(self, audio_path, num_speakers):
+        raw = f"{self.content_hash(audio_path)}|{self.version}|{num_speakers}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    
+    def get(self, key):
+        """Return segments [{start, end, speaker}, ...] or None"""
+        try:
+            rows = np.load(self.files.path(key), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        
+        segments = [
+            {"start": float(r["start"]), "end": float(r["end"]), "speaker": r["speaker"].decode("utf-8")}
+            for r in rows
+        ]
+        del rows
+        self.files.touch(key)
+        return segments
+    
+    def put(self, key, segments):
+        rows = np.array(
+            [(s["start"], s["end"], s["speaker"].encode("utf-8")) for s in segments],
+            dtype=SEGMENT_DTYPE,
+        )
+        self.files.write(key, rows)
+    
+    def compute_lock(self, key, stale_after=60):
+        """Cross-worker lock so only one worker runs pyannote for a given key"""
+        return self.files.compute_lock(key, stale_after)
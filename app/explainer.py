@@ -0,0 +1,161 @@
+"""
+Async SLM explainer client (Ollama /api/chat).
+
+One pooled httpx client per process, per-request timeouts and a concurrency
+limit, so slow generations never block the event loop or pile up on Ollama.
+Tokens can be streamed as they are generated.
+"""
+import asyncio
+import json
+from app.config import AGENT_CONFIG, EXPLAINER_CONFIG
+from app.explanation_cache import get_explanation_cache
+from app.metrics import QUEUE_DEPTH, STAGE_SECONDS
+
+# Prompts (shared with the LangChain prompts in HybridPipeline)
+EXPLAIN_SYSTEM = "หน้าที่ของคุณคือระบบแจ้งเตือนความปลอดภัย"
+EXPLAIN_USER = """วิเคราะห์ข้อความต่อไปนี้ แล้วอธิบายสั้นๆ ว่า "ทำไมถึงเป็นมิจฉาชีพ?"
+            ตอบเป็นภาษาไทย ความยาวไม่เกิน 2 บรรทัด
+            ข้อความ: "{context}"
+            คำอธิบาย:"""
+
+WARNING_SYSTEM = """คุณคือผู้ช่วย AI ที่ช่วยปกป้องผู้ใช้จากมิจฉาชีพทางโทรศัพท์
+หน้าที่ของคุณคือเตือนผู้ใช้อย่างจริงจังและให้คำแนะนำที่ปฏิบัติได้จริง
+ตอบเป็นภาษาไทย ใช้ภาษาที่เข้าใจง่าย"""
+WARNING_USER = """⚠️ ตรวจพบพฤติกรรมหลอกลวงหลายครั้ง!
+
+ข้อความที่น่าสงสัย:
+{scam_messages}
+
+กรุณา:
+1. เตือนผู้ใช้ว่านี่คือสายมิจฉาชีพ (1-2 ประโยค)
+2. ระบุเทคนิคหลอกลวงที่ใช้ (bullet points สั้นๆ)
+3. ให้คำแนะนำว่าควรทำอย่างไร (3-4 ข้อ)
+
+ตอบ:"""
+
+
+def format_scam_messages(scam_messages):
+    return "\n".join([f"- {msg}" for msg in scam_messages])
+
+
+def explain_messages(context):
+    return [
+        {"role": "system", "content": EXPLAIN_SYSTEM},
+        {"role": "user", "content": EXPLAIN_USER.format(context=context)},
+    ]
+
+
+def warning_messages(scam_messages):
+    return [
+        {"role": "system", "content": WARNING_SYSTEM},
+        {"role": "user", "content": WARNING_USER.format(scam_messages=format_scam_messages(scam_messages))},
+    ]
+
+
+class AsyncExplainer:
+    def __init__(self, base_url=None, model=None):
+        self.base_url = (base_url or AGENT_CONFIG["OLLAMA_BASE_URL"]).rstrip("/")
+        self.model = model or AGENT_CONFIG["OLLAMA_MODEL"]
+        self._client = None
+        self._semaphore = None
+    
+    def _ensure_client(self):
+        # Created lazily inside the running event loop
+        if self._client is None:
+            import httpx
+            limit = EXPLAINER_CONFIG["MAX_CONCURRENCY"]
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                timeout=httpx.Timeout(
+                    EXPLAINER_CONFIG["TIMEOUT_S"],
+                    connect=EXPLAINER_CONFIG["CONNECT_TIMEOUT_S"],
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(limit)
+        return self._client
+    
+    async def stream(self, messages):
+        """Async generator of response tokens"""
+        client = self._ensure_client()
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": {"temperature": 0.3},
+        }
+        # Waiting for + running generations
+        with QUEUE_DEPTH.track(queue="slm"):
+            async for token in self._stream(client, payload):
+                yield token
+    
+    async def _stream(self, client, payload):
+        async with self._semaphore:
+            async with client.stream("POST", "/api/chat", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        break
+    
+    async def complete(self, messages):
+        tokens = [token async for token in self.stream(messages)]
+        return "".join(tokens).strip()
+    
+    async def _cached_stream(self, kind, cache_context, messages):
+        """Stream from the explanation cache if a (near-)duplicate is known, else from the SLM"""
+        with STAGE_SECONDS.labels(stage=f"slm_{kind}").time():
+            cache = get_explanation_cache()
+            cached = cache.get(kind, cache_context) if cache else None
+            if cached is not None:
+                yield cached
+                return
+            
+            tokens = []
+            async for token in self.stream(messages):
+                tokens.append(token)
+                yield token
+            reply = "".join(tokens).strip()
+            # Never cache an empty reply: it would be served for every near-duplicate
+            if cache and reply:
+                cache.put(kind, cache_context, reply)
+    
+    async def explain(self, context):
+        """Explain why it is a scam"""
+        tokens = [token async for token in self.stream_explain(context)]
+        return "".join(tokens).strip()
+    
+    def stream_explain(self, context):
+        return self._cached_stream("explain", context, explain_messages(context))
+    
+    async def warning_advice(self, scam_messages):
+        """Warning and advice when SCAM detected 3 times"""
+        tokens = [token async for token in self.stream_warning_advice(scam_messages)]
+        return "".join(tokens).strip()
+    
+    def stream_warning_advice(self, scam_messages):
+        return self._cached_stream(
+            "warning", format_scam_messages(scam_messages), warning_messages(scam_messages)
+        )
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Singleton instance
+_explainer_instance = None
+
+def get_explainer():
+    global _explainer_instance
+    if _explainer_instance is None:
+        _explainer_instance = AsyncExplainer()
+    return _explainer_instance
@@ -0,0 +1,251 @@
+"""
+Explanation cache in front of the SLM.
+
+Scam scripts repeat almost word for word, so besides exact lookups on the
+normalised context, a MinHash/LSH index over Thai character n-grams finds
+near-duplicate contexts and reuses their explanation.
+LRU + TTL eviction, optional JSONL persistence (appended by a background
+writer thread, so stores never wait on the disk), hit-rate statistics.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+import numpy as np
+from app.batching import MicroBatcher
+from app.config import EXPLANATION_CACHE_CONFIG
+from app.file_cache import file_lock
+
+_PRIME = (1 << 31) - 1
+_MARKERS = re.compile(r"\[(สัญญาณก่อนหน้า|บทสนทนาล่าสุด)\]")
+# Whitespace, ASCII punctuation, typographic quotes, zero-width chars
+# (not \W: it would also strip Thai vowel and tone marks)
+_NOISE = re.compile(r"[\s!-/:-@\[-`{-~“”‘’…\u200b\u200c\u200d\ufeff]+")
+
+
+def normalize(text):
+    """Drop context markers, whitespace, punctuation and case"""
+    return _NOISE.sub("", _MARKERS.sub("", text).lower())
+
+
+class MinHasher:
+    def __init__(self, num_perm, ngram, seed=1):
+        rng = np.random.default_rng(seed)
+        self.ngram = ngram
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    
+    def signature(self, text):
+        n = self.ngram
+        shingles = {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+        x = np.array([zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles], dtype=np.uint64)
+        # (a*x + b) mod p for every permutation and shingle; min over shingles
+        return ((np.outer(self.a, x) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+class _Entry:
+    __slots__ = ("kind", "text", "signature", "value", "created")
+    
+    def __init__(self, kind, text, signature, value, created):
+        self.kind = kind
+        self.text = text
+        self.signature = signature
+        self.value = value
+        self.created = created
+
+
+class ExplanationCache:
+    def __init__(self, max_entries=None, ttl_s=None, similarity=None, path=None):
+        cfg = EXPLANATION_CACHE_CONFIG
+        self.max_entries = max_entries or cfg["MAX_ENTRIES"]
+        self.ttl_s = cfg["TTL_S"] if ttl_s is None else ttl_s
+        self.similarity = cfg["SIMILARITY"] if similarity is None else similarity
+        self.path = cfg["PATH"] if path is None else path
+        self.bands = cfg["BANDS"]
+        self.hasher = MinHasher(cfg["NUM_PERM"], cfg["NGRAM"])
+        self.rows = cfg["NUM_PERM"] // self.bands
+        
+        self._entries = OrderedDict()  # key -> _Entry, oldest first
+        self._buckets = {}             # (kind, band, band hash) -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        
+        self._writer = None
+        self._last_write = None
+        if self.path:
+            self._load()
+            # Appends from every session go through one thread, a batch per open()
+            self._writer = MicroBatcher(self._write_lines, max_batch_size=256, max_wait_ms=200,
+                                        name="explanation-cache-writer", model=None)
+    
+    @staticmethod
+    def _key(kind, text):
+        return hashlib.sha1(f"{kind}|{text}".encode("utf-8")).hexdigest()
+    
+    def _band_keys(self, kind, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield (kind, band, chunk.tobytes())
+    
+    def _expired(self, entry, now):
+        return self.ttl_s > 0 and now - entry.created > self.ttl_s
+    
+    def get(self, kind, context):
+        """Cached value for this context (exact or near-duplicate), else None"""
+        text = normalize(context)
+        key = self._key(kind, text)
+        now = time.time()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+        
+        signature = self.hasher.signature(text)
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(kind, signature):
+                candidates |= self._buckets.get(band_key, set())
+            
+            best_key, best_sim = None, self.similarity
+            for cand in candidates:
+                entry = self._entries.get(cand)
+                if entry is None or self._expired(entry, now):
+                    continue
+                # Share of equal MinHash values estimates Jaccard similarity
+                sim = float(np.mean(entry.signature == signature))
+                if sim >= best_sim:
+                    best_key, best_sim = cand, sim
+            
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.near_hits += 1
+                return self._entries[best_key].value
+            
+            self.misses += 1
+            return None
+    
+    def put(self, kind, context, value, created=None, persist=True):
+        # An empty SLM reply would be served for this context and its near-duplicates
+        if not value or not value.strip():
+            return
+        text = normalize(context)
+        key = self._key(kind, text)
+        entry = _Entry(kind, text, self.hasher.signature(text), value, created or time.time())
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for band_key in self._band_keys(kind, entry.signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        
+        if persist and self.path:
+            self._append(entry)
+    
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(entry.kind, entry.signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+    
+    def _append(self, entry):
+        """Queue the entry for the JSONL file (never blocks)"""
+        line = json.dumps({
+            "kind": entry.kind, "text": entry.text, "value": entry.value, "created": entry.created
+        }, ensure_ascii=False)
+        self._last_write = self._writer.submit(line)
+    
+    def _write_lines(self, lines):
+        # Same lock as the compaction in _load (workers and bulk processes share the file)
+        with file_lock(self.path + ".lock"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+        return [None] * len(lines)
+    
+    def flush(self, timeout=10.0):
+        """Wait until every stored entry is in the JSONL file"""
+        last = self._last_write
+        if last is not None:
+            try:
+                last.result(timeout=timeout)
+            except Exception:
+                pass
+    
+    def _load(self):
+        """
+        Replay the JSONL file; compact it when it holds many stale lines.
+        Both run under the file's lock, so lines other processes append
+        meanwhile are neither lost nor half-read.
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            return
+        
+        with file_lock(self.path + ".lock"):
+            self._replay()
+        print(f"   Explanation cache: loaded {len(self._entries)} entries from {self.path}")
+    
+    def _replay(self):
+        lines = 0
+        now = time.time()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if self.ttl_s > 0 and now - row["created"] > self.ttl_s:
+                    continue
+                self.put(row["kind"], row["text"], row["value"], created=row["created"], persist=False)
+        
+        if lines > 2 * max(1, len(self._entries)):
+            tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for e in self._entries.values():
+                    f.write(json.dumps({
+                        "kind": e.kind, "text": e.text, "value": e.value, "created": e.created
+                    }, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.near_hits) / lookups) if lookups else 0.0,
+            }
+
+
+# Singleton instance
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_explanation_cache():
+    """Shared cache, or None when disabled"""
+    global _cache_instance
+    if not EXPLANATION_CACHE_CONFIG["ENABLED"]:
+        return None
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = ExplanationCache()
+    return _cache_instance
@@ -0,0 +1,148 @@
+"""
+Directory of <key>.npy entries shared by all uvicorn workers.
+
+Storage for the diarization cache and the decoded-audio store: atomic
+writes (temp file + rename), a cross-worker compute lock, least-recently-
+used eviction by total size and a memo of source-file content hashes.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash of the audio file content (not its name)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@contextmanager
+def file_lock(lock_path, stale_after=60):
+    """
+    Cross-process lock on `lock_path`: an O_EXCL lock file (portable, also
+    on Windows). The holder touches it every stale_after / 4 seconds, so a
+    lock is only taken over once that heartbeat stops (its process died),
+    however long the work under it runs.
+    """
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.2)
+
+    done = threading.Event()
+    def heartbeat():
+        while not done.wait(stale_after / 4):
+            try:
+                os.utime(lock_path)
+            except OSError:
+                return
+    beat = threading.Thread(target=heartbeat, name=f"lock-heartbeat-{os.path.basename(lock_path)[:8]}",
+                            daemon=True)
+    beat.start()
+    try:
+        yield
+    finally:
+        done.set()
+        beat.join()
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+class FileCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # (path, mtime, size) -> content hash, so repeat sessions don't re-read the file
+        self._hash_memo = {}
+        self._memo_lock = threading.Lock()
+
+    def content_hash(self, audio_path):
+        st = os.stat(audio_path)
+        memo_key = (os.path.abspath(audio_path), st.st_mtime_ns, st.st_size)
+        with self._memo_lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached is None:
+            cached = file_sha256(audio_path)
+            with self._memo_lock:
+                self._hash_memo[memo_key] = cached
+        return cached
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def touch(self, key):
+        """Mark an entry as recently used for eviction"""
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def write(self, key, array, keep=()):
+        """
+        Write `array` as the entry for `key`, then evict down to max_bytes
+        (never the keys in `keep`). Returns False when an existing entry could
+        not be replaced (on Windows, while another worker has it open); the
+        existing entry is as good, so the new one is dropped.
+        """
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        try:
+            os.replace(tmp_path, self.path(key))
+        except OSError:
+            os.remove(tmp_path)
+            return False
+        self.evict(keep=set(keep) | {key})
+        return True
+
+    def compute_lock(self, key, stale_after=60):
+        """Cross-worker lock so only one worker computes a given key (see file_lock)"""
+        return file_lock(os.path.join(self.cache_dir, f"{key}.lock"), stale_after)
+
+    def evict(self, keep=()):
+        """Remove the least recently used entries until the directory fits max_bytes"""
+        keep_paths = {self.path(key) for key in keep}
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # removed by another worker
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in keep_paths:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                total -= size  # removed by another worker
+            except OSError:
+                pass  # still mapped by another worker (Windows): evicted on a later write
@@ -0,0 +1,226 @@
+"""
+History of analysis results in SQLite (WAL mode).
+
+Segment results, warnings, voiceprint matches and text checks are queued
+by record() and written by one background thread in batched transactions
+(a MicroBatcher with a long wait), so the stream loop never touches the
+disk. WAL lets the query API read while the writer appends, and several
+workers (or bulk-analysis processes) can share one database file.
+
+Queries page newest first with a keyset cursor ("<created_at>:<id>"), so
+deep pages cost the same as the first one. Indexed filters: call id,
+status, time and matched phrase.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.batching import MicroBatcher
+from app.config import HISTORY_CONFIG
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    call_id TEXT,
+    start REAL,
+    "end" REAL,
+    speaker TEXT,
+    role TEXT,
+    status TEXT,
+    confidence REAL,
+    text TEXT,
+    reason TEXT,
+    matched_phrases TEXT
+);
+CREATE INDEX IF NOT EXISTS results_call ON results(call_id, created_at);
+CREATE INDEX IF NOT EXISTS results_status ON results(status, created_at);
+CREATE INDEX IF NOT EXISTS results_time ON results(created_at);
+CREATE TABLE IF NOT EXISTS result_phrases (
+    phrase TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    result_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS result_phrases_phrase ON result_phrases(phrase, created_at, result_id);
+"""
+
+_COLUMNS = ("id", "created_at", "source", "kind", "call_id", "start", "end", "speaker", "role",
+            "status", "confidence", "text", "reason", "matched_phrases")
+
+_INSERT = ('INSERT INTO results (created_at, source, kind, call_id, start, "end", speaker, role, '
+           'status, confidence, text, reason, matched_phrases) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+def _kind(event):
+    if event.get("type") == "voiceprint":
+        return "voiceprint"
+    return "warning" if event.get("is_warning") else "segment"
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    def __init__(self, path=None, batch_size=None, flush_ms=None, max_pending=None):
+        cfg = HISTORY_CONFIG
+        self.path = path or cfg["PATH"]
+        self.max_pending = max_pending or cfg["MAX_PENDING"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Only the writer thread uses this connection after the schema is created
+        self._conn = _connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self._readers = threading.local()
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self._last = None
+
+        self.writer = MicroBatcher(
+            self._write,
+            max_batch_size=batch_size or cfg["BATCH_SIZE"],
+            max_wait_ms=cfg["FLUSH_MS"] if flush_ms is None else flush_ms,
+            name="history-writer",
+            model=None,  # not a model: stays out of the scamguard_model_* metrics
+        )
+
+    # ---------- write side ----------
+
+    def record(self, source, call_id, event, kind=None):
+        """Queue one result (never blocks; dropped when the writer is too far behind)"""
+        if self.writer.pending() >= self.max_pending:
+            with self._stats_lock:
+                self.dropped += 1
+            return
+        # Copied: the caller may still add fields to the event it sends
+        self._last = self.writer.submit((time.time(), source, kind or _kind(event), call_id, dict(event)))
+
+    def flush(self, timeout=10.0):
+        """Wait until everything recorded so far is written"""
+        last = self._last
+        if last is not None:
+            try:
+                last.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def _write(self, rows):
+        with self._conn:
+            for created_at, source, kind, call_id, event in rows:
+                if kind == "voiceprint":
+                    # Case id of the matched scammer in `text`, similarity in `confidence`
+                    text, confidence, phrases = event.get("match_id"), event.get("similarity"), []
+                else:
+                    text, confidence = event.get("text"), event.get("confidence")
+                    phrases = event.get("matched_phrases") or []
+                cursor = self._conn.execute(_INSERT, (
+                    created_at, source, kind, call_id, event.get("start"), event.get("end"),
+                    event.get("speaker"), event.get("role"), event.get("status") or event.get("label"),
+                    None if confidence is None else float(confidence), text, event.get("reason") or None,
+                    json.dumps(phrases, ensure_ascii=False) if phrases else None,
+                ))
+                if phrases:
+                    self._conn.executemany(
+                        "INSERT INTO result_phrases (phrase, created_at, result_id) VALUES (?, ?, ?)",
+                        [(phrase, created_at, cursor.lastrowid) for phrase in dict.fromkeys(phrases)],
+                    )
+        with self._stats_lock:
+            self.written += len(rows)
+        return [None] * len(rows)
+
+    # ---------- read side ----------
+
+    def _reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = _connect(self.path)
+        return conn
+
+    def query(self, call_id=None, status=None, phrase=None, source=None, kind=None,
+              since=None, until=None, limit=None, cursor=None):
+        """
+        One page of results, newest first:
+            {"items": [...], "next_cursor": "<created_at>:<id>" or None}
+        since / until: unix times. Raises ValueError for a malformed cursor.
+        """
+        limit = max(1, min(int(limit or HISTORY_CONFIG["PAGE_SIZE"]), HISTORY_CONFIG["MAX_PAGE_SIZE"]))
+        # Time filters and the cursor apply to `t`: the phrase index (already in time order) or results
+        if phrase is not None:
+            source_sql = "result_phrases t JOIN results r ON r.id = t.result_id"
+            where, params = ["t.phrase = ?"], [phrase]
+        else:
+            source_sql = "results r"
+            where, params = [], []
+        time_col, id_col = ("t.created_at", "t.result_id") if phrase is not None else ("r.created_at", "r.id")
+
+        for column, value in (("call_id", call_id), ("status", status), ("source", source), ("kind", kind)):
+            if value is not None:
+                where.append(f"r.{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append(f"{time_col} >= ?")
+            params.append(float(since))
+        if until is not None:
+            where.append(f"{time_col} < ?")
+            params.append(float(until))
+        if cursor:
+            try:
+                created_at, row_id = cursor.split(":")
+                created_at, row_id = float(created_at), int(row_id)
+            except ValueError:
+                raise ValueError(f"bad cursor: {cursor!r}")
+            where.append(f"({time_col} < ? OR ({time_col} = ? AND {id_col} < ?))")
+            params += [created_at, created_at, row_id]
+
+        columns = ", ".join(f'r."{c}"' for c in _COLUMNS)
+        sql = (f"SELECT {columns} FROM {source_sql}" + (" WHERE " + " AND ".join(where) if where else "")
+               + f" ORDER BY {time_col} DESC, {id_col} DESC LIMIT ?")
+        rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(_COLUMNS, row))
+            item["matched_phrases"] = json.loads(item["matched_phrases"]) if item["matched_phrases"] else []
+            items.append(item)
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = f"{last['created_at']!r}:{last['id']}"
+        return {"items": items, "next_cursor": next_cursor}
+
+    def stats(self):
+        with self._stats_lock:
+            written, dropped = self.written, self.dropped
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {
+            "path": self.path,
+            "written": written,
+            "dropped": dropped,
+            "pending": self.writer.pending(),
+            "db_bytes": size,
+        }
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Shared store, or None when disabled"""
+    global _store_instance
+    if not HISTORY_CONFIG["ENABLED"]:
+        return None
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = HistoryStore()
+    return _store_instance
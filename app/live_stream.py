@@ -0,0 +1,200 @@
+import time
+import numpy as np
+from app.config import SAMPLE_RATE, LIVE_CONFIG
+
+
+ENCODINGS = ("pcm_s16le", "pcm_f32le", "opus")
+
+
+def _pcm(data, dtype):
+    # A trailing partial sample (malformed frame) is dropped
+    dtype = np.dtype(dtype)
+    return np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)
+
+
+def decode_frame(data, encoding, decoder=None, sample_rate=SAMPLE_RATE):
+    """Client audio frame (bytes) -> float32 mono samples; ValueError for a frame that can't be decoded"""
+    if encoding == "pcm_s16le":
+        return _pcm(data, "<i2").astype(np.float32) / 32768.0
+    if encoding == "pcm_f32le":
+        return _pcm(data, "<f4").astype(np.float32)
+    if encoding == "opus":
+        if decoder is None:
+            raise ValueError("Opus frames need a decoder (see LiveCall)")
+        # 120 ms is the largest Opus frame
+        try:
+            pcm = decoder.decode(bytes(data), int(sample_rate * 0.12))
+        except Exception as e:
+            raise ValueError(f"Bad Opus frame: {e}")
+        return _pcm(pcm, "<i2").astype(np.float32) / 32768.0
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class RingBuffer:
+    """
+    Fixed-size float32 audio buffer addressed by absolute sample position.
+    Memory stays constant however long the call runs.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=np.float32)
+        self.total = 0  # samples written since the call started
+    
+    def write(self, samples):
+        n = len(samples)
+        if n >= self.capacity:
+            samples = samples[-self.capacity:]
+            self.total += n - self.capacity
+            n = self.capacity
+        pos = self.total % self.capacity
+        first = min(n, self.capacity - pos)
+        self.buffer[pos:pos + first] = samples[:first]
+        self.buffer[:n - first] = samples[first:]
+        self.total += n
+    
+    def read(self, start, end):
+        """Copy of samples [start, end) (absolute positions); clamps to what is still held"""
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        idx = np.arange(start, end) % self.capacity
+        return self.buffer[idx]
+
+
+class UtteranceSegmenter:
+    """
+    Cuts utterances incrementally from a live stream using frame energy.
+    An utterance ends after MIN_SILENCE_MS of silence, or at MAX_UTTERANCE_S.
+    The noise floor adapts from non-speech frames.
+    """
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * 0.03)
+        self.min_silence = int(sample_rate * LIVE_CONFIG["MIN_SILENCE_MS"] / 1000)
+        self.max_utterance = int(sample_rate * LIVE_CONFIG["MAX_UTTERANCE_S"])
+        self.min_utterance = int(sample_rate * 0.3)
+        self.pre_roll = int(sample_rate * 0.2)
+        
+        self.noise_floor = LIVE_CONFIG["MIN_RMS"]
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._pos = 0  # absolute position of the first leftover sample
+        self._in_speech = False
+        self._start = 0
+        self._last_speech_end = 0
+        self._last_speech_arrival = 0.0
+        self._silence = 0
+    
+    def push(self, samples, arrival_time):
+        """Feed samples; return finished utterances [(start, end, arrival_time), ...]"""
+        data = np.concatenate([self._leftover, samples]) if len(self._leftover) else samples
+        utterances = []
+        n_frames = len(data) // self.frame_size
+        
+        for i in range(n_frames):
+            frame = data[i * self.frame_size:(i + 1) * self.frame_size]
+            frame_start = self._pos + i * self.frame_size
+            frame_end = frame_start + self.frame_size
+            rms = float(np.sqrt(np.mean(frame * frame)))
+            is_speech = rms > max(LIVE_CONFIG["MIN_RMS"], self.noise_floor * LIVE_CONFIG["SPEECH_RATIO"])
+            
+            if not is_speech:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+            
+            if self._in_speech:
+                if is_speech:
+                    self._silence = 0
+                    self._last_speech_end = frame_end
+                    self._last_speech_arrival = arrival_time
+                else:
+                    self._silence += self.frame_size
+                
+                too_long = frame_end - self._start >= self.max_utterance
+                if self._silence >= self.min_silence or too_long:
+                    end = frame_end if too_long else self._last_speech_end
+                    self._emit(utterances, end)
+            elif is_speech:
+                self._in_speech = True
+                self._start = max(0, frame_start - self.pre_roll)
+                self._last_speech_end = frame_end
+                self._last_speech_arrival = arrival_time
+                self._silence = 0
+        
+        consumed = n_frames * self.frame_size
+        self._leftover = data[consumed:].copy()
+        self._pos += consumed
+        return utterances
+    
+    def flush(self):
+        """End of stream: close the open utterance (if any)"""
+        utterances = []
+        if self._in_speech:
+            self._emit(utterances, self._last_speech_end)
+        return utterances
+    
+    def _emit(self, utterances, end):
+        if end - self._start >= self.min_utterance:
+            utterances.append((self._start, end, self._last_speech_arrival))
+        self._in_speech = False
+        self._silence = 0
+
+
+class Utterance:
+    def __init__(self, audio, start, end, arrival_time):
+        self.audio = audio          # float32 @ the client rate (LiveCall.resample -> SAMPLE_RATE)
+        self.start = start          # seconds since call start
+        self.end = end
+        self.arrival_time = arrival_time  # wall time the last speech frame arrived
+
+
+class LiveCall:
+    """
+    Server side of one live call: decodes client frames into a bounded ring
+    buffer and cuts utterances as they complete.
+    """
+    def __init__(self, session, sample_rate=SAMPLE_RATE, encoding="pcm_s16le"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        self.session = session
+        self.sample_rate = int(sample_rate)
+        self.encoding = encoding
+        self.ring = RingBuffer(self.sample_rate * LIVE_CONFIG["RING_SECONDS"])
+        self.segmenter = UtteranceSegmenter(self.sample_rate)
+        self.first_alert_ms = None
+        
+        self._decoder = None
+        if encoding == "opus":
+            import opuslib  # optional dependency, only for Opus clients
+            self._decoder = opuslib.Decoder(self.sample_rate, 1)
+    
+    def push(self, data):
+        """Client frame (bytes) -> list of finished Utterance"""
+        arrival = time.time()
+        samples = decode_frame(data, self.encoding, self._decoder, self.sample_rate)
+        self.ring.write(samples)
+        return [self._cut(*u) for u in self.segmenter.push(samples, arrival)]
+    
+    def flush(self):
+        return [self._cut(*u) for u in self.segmenter.flush()]
+    
+    def _cut(self, start, end, arrival_time):
+        return Utterance(self.ring.read(start, end), start / self.sample_rate, end / self.sample_rate, arrival_time)
+    
+    @property
+    def needs_resample(self):
+        return self.sample_rate != SAMPLE_RATE
+    
+    def resample(self, audio):
+        """Blocking (CPU-bound): client-rate samples -> SAMPLE_RATE; run it off the event loop"""
+        import librosa
+        return librosa.resample(audio, orig_sr=self.sample_rate, target_sr=SAMPLE_RATE)
+    
+    def annotate(self, result, utterance):
+        """Add latency (from audio arrival) to a result; track time-to-first-alert"""
+        latency_ms = (time.time() - utterance.arrival_time) * 1000.0
+        result["latency_ms"] = round(latency_ms, 1)
+        if result.get("status") == "SCAM" and self.first_alert_ms is None:
+            self.first_alert_ms = latency_ms
+            result["time_to_first_alert_ms"] = round(latency_ms, 1)
+            print(f"   - [{self.session.call_id[:8]}] First alert {latency_ms:.0f} ms after audio arrived")
+        return result
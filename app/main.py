@@ -1,11 +1,15 @@
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import List, Optional
+from app import metrics
 import asyncio
+import json
 import os
+import time
 
 app = FastAPI()
 
@@ -16,11 +20,16 @@ templates = Jinja2Templates(directory="templates")
 class TextCheckRequest(BaseModel):
     text: str
 
+class TextBatchRequest(BaseModel):
+    texts: List[str]
+    explain: bool = False
+    stream: bool = False
+
 # Startup: Pre-compute Diarization
 
 @app.on_event("startup")
 async def startup_event():
-    from app.config import PITCH_ONLY
+    from app.config import PITCH_ONLY, MODEL_CONFIG
     
     if PITCH_ONLY:
         print("🎬 PITCH ONLY MODE - Skipping AI model loading for fast startup")
@@ -28,6 +37,25 @@ async def startup_event():
         print("⚠️  Demo page will NOT work in this mode")
         return
     
+    # Nothing here blocks: the server accepts traffic right away and routes
+    # answer "warming up" until the models they need are loaded (/readyz)
+    if MODEL_CONFIG["PRELOAD"]:
+        # Load + warm up the models the endpoints use, in parallel (otherwise each loads on first use)
+        from app.model_registry import get_registry
+        get_registry().ensure_loading(serving_models())
+    
+    app.state.precompute_task = asyncio.create_task(precompute_demo_audio())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write out results still queued for the history store and explanation cache
+    from app.history_store import get_history_store
+    from app.explanation_cache import get_explanation_cache
+    for store in (get_history_store(), get_explanation_cache()):
+        if store is not None:
+            await run_in_threadpool(store.flush)
+
+async def precompute_demo_audio():
     try:
         from app.pipeline_hybrid import precompute_audio
         audio_path = "static/audio/scam_bank.wav"
@@ -35,6 +63,62 @@ async def startup_event():
     except Exception as e:
         print(f"Pre-computation failed: {e}")
 
+def optional_models():
+    """Caller-identifier front-end and voiceprint index, unless switched off"""
+    from app.config import CALLER_ID_CONFIG, VOICEPRINT_CONFIG
+    return (["caller_detector"] if CALLER_ID_CONFIG["ENABLED"] else []) + \
+        (["voiceprints"] if VOICEPRINT_CONFIG["ENABLED"] else [])
+
+def analyze_models():
+    """Models used by /ws/analyze"""
+    from app.config import DIARIZATION_CONFIG
+    diarizer = "online_diarizer" if DIARIZATION_CONFIG["MODE"] == "online" else "diarization"
+    return [diarizer, "vad", "asr_engine", "scam_detector"] + optional_models()
+
+LIVE_MODELS = ["online_diarizer", "vad", "asr_engine", "scam_detector"]
+TEXT_MODELS = ["scam_detector"]
+
+def serving_models():
+    """Everything the endpoints gate on in this configuration (preloaded, checked by /readyz)"""
+    return list(dict.fromkeys(analyze_models() + LIVE_MODELS + optional_models() + TEXT_MODELS))
+
+def warming_up(model_names):
+    """
+    None if all models are loaded, else a "warming up" payload.
+    Missing models start loading in the background (no request waits on a load).
+    """
+    from app.model_registry import get_registry
+    missing = get_registry().ensure_loading(model_names)
+    if not missing:
+        return None
+    return {
+        "status": "WARMING_UP",
+        "error": "AI models are warming up, please retry in a few seconds",
+        "models": missing,
+    }
+
+def warming_up_response(payload):
+    return JSONResponse(payload, status_code=503, headers={"Retry-After": "5"})
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once every model the endpoints use is loaded and warmed up, 503 before"""
+    from app.config import PITCH_ONLY
+    from app.model_registry import get_registry
+    
+    if PITCH_ONLY:
+        return {"ready": True, "pitch_only": True, "models": {}}
+    
+    registry = get_registry()
+    models = {name: registry.state(name) for name in serving_models()}
+    ready = all(state == "ready" for state in models.values())
+    return JSONResponse({"ready": ready, "models": models}, status_code=200 if ready else 503)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_pitch(request: Request):
     """Landing page for pitching and presentation"""
@@ -46,50 +130,234 @@ async def read_demo(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 # Text Check API (using pre-loaded pipeline)
+MAX_BATCH_TEXTS = 1000
+
+def text_status(result):
+    """Classifier output -> SCAM / SAFE / WAIT"""
+    pred_class = "SCAM" if result['label'] in ["SCAM", "LABEL_1"] else "SAFE"
+    return "WAIT" if result['score'] < 0.7 else pred_class
+
+async def explain_text(text):
+    """SLM explanation (async, doesn't block the event loop)"""
+    try:
+        from app.explainer import get_explainer
+        return await get_explainer().explain(text)
+    except Exception as e:
+        print(f"SLM Error: {e}")
+        return "ตรวจพบรูปแบบการหลอกลวง"
+
+def record_text(pipeline, response, source):
+    """Text checks are kept in the history store too (no call id)"""
+    if pipeline.history is not None:
+        pipeline.history.record(source, None, response, kind="text")
+
 @app.post("/api/check-text")
 async def check_text(request: TextCheckRequest):
     """Check if text is scam using pre-loaded BERT + SLM"""
+    not_ready = warming_up(TEXT_MODELS)
+    if not_ready:
+        return warming_up_response(not_ready)
+    
     try:
         from app.pipeline_hybrid import get_hybrid_pipeline
         
-        pipeline = get_hybrid_pipeline()
+        pipeline = await run_in_threadpool(get_hybrid_pipeline)
         
-        # Run BERT classification (use pre-loaded models)
-        result = pipeline.scam_classifier(request.text)[0]
-        score = result['score']
-        label = result['label']
+        # Texts always get a BERT verdict (the pre-filter gate is for call turns);
+        # keyword matches are only reported
+        matches = pipeline.prefilter.scan(request.text)
         
-        # Determine status
-        pred_class = "SCAM" if label in ["SCAM", "LABEL_1"] else "SAFE"
-        final_status = "WAIT" if score < 0.7 else pred_class
+        # Run BERT classification (use pre-loaded models, batched with other requests)
+        with metrics.stage("classifier"):
+            result = await pipeline.scam_detector.classify_async(request.text)
+        score = result['score']
+        final_status = text_status(result)
         
         # If SCAM, get explanation from SLM
         reason = None
         if final_status == "SCAM":
-            try:
-                chain = pipeline.explain_prompt | pipeline.explainer_slm
-                response = chain.invoke({"context": request.text})
-                reason = response.content.strip()
-            except Exception as e:
-                print(f"SLM Error: {e}")
-                reason = "ตรวจพบรูปแบบการหลอกลวง"
-        
-        return {
+            reason = await explain_text(request.text)
+        
+        response = {
             "text": request.text,
             "label": final_status,
             "confidence": score,
-            "reason": reason
+            "reason": reason,
+            "matched_phrases": [m["phrase"] for m in matches]
         }
+        record_text(pipeline, response, "check_text")
+        return response
     except Exception as e:
         import traceback
         traceback.print_exc()
         return {"error": str(e)}
 
+@app.post("/api/check-text/batch")
+async def check_text_batch(request: TextBatchRequest):
+    """
+    Score many texts (e.g. SMS/LINE messages from a fraud queue).
+    All texts are submitted to the shared classifier at once, so they run as
+    CLASSIFIER_MAX_BATCH-sized forward passes on the batcher thread; the
+    event loop only awaits the results.
+    explain: add an SLM explanation for texts labelled SCAM (slower)
+    stream:  NDJSON, one line per text as soon as it is done (with "index"),
+             instead of one JSON body with results in input order
+    """
+    not_ready = warming_up(TEXT_MODELS)
+    if not_ready:
+        return warming_up_response(not_ready)
+    if len(request.texts) > MAX_BATCH_TEXTS:
+        return JSONResponse({"error": f"At most {MAX_BATCH_TEXTS} texts per request"}, status_code=413)
+    
+    from app.pipeline_hybrid import get_hybrid_pipeline
+    pipeline = await run_in_threadpool(get_hybrid_pipeline)
+    
+    # Every text is classified (no pre-filter gate); keyword matches are only reported
+    matches = [pipeline.prefilter.scan(text) for text in request.texts]
+    futures = pipeline.scam_detector.submit_many(request.texts)
+    
+    async def score(index, text):
+        try:
+            result = await asyncio.wrap_future(futures[index])
+            confidence, status = result['score'], text_status(result)
+            reason = await explain_text(text) if request.explain and status == "SCAM" else None
+            response = {
+                "index": index,
+                "text": text,
+                "label": status,
+                "confidence": confidence,
+                "reason": reason,
+                "matched_phrases": [m["phrase"] for m in matches[index]]
+            }
+            record_text(pipeline, response, "check_text_batch")
+            return response
+        except Exception as e:
+            return {"index": index, "text": text, "error": str(e)}
+    
+    tasks = [asyncio.create_task(score(i, text)) for i, text in enumerate(request.texts)]
+    
+    if request.stream:
+        async def ndjson():
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+            finally:
+                # Client went away: don't keep running SLM explanations
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    return {"results": await asyncio.gather(*tasks)}
+
+@app.get("/api/history")
+async def history(status: Optional[str] = None, call_id: Optional[str] = None, phrase: Optional[str] = None,
+                  source: Optional[str] = None, kind: Optional[str] = None, since: Optional[float] = None,
+                  until: Optional[float] = None, last_s: Optional[float] = None, limit: Optional[int] = None,
+                  cursor: Optional[str] = None):
+    """
+    Stored results, newest first, one page at a time (pass "next_cursor" back as cursor).
+    e.g. /api/history?status=SCAM&kind=segment&last_s=3600 = SCAM segments of the last hour
+    since / until: unix times; last_s: shorthand for since = now - last_s
+    """
+    from app.history_store import get_history_store
+    store = get_history_store()
+    if store is None:
+        return JSONResponse({"error": "History is disabled (HISTORY_ENABLED=false)"}, status_code=404)
+    if last_s is not None:
+        since = time.time() - last_s
+    try:
+        # Reads use their own WAL connection, so they don't wait for the writer
+        return await run_in_threadpool(store.query, call_id, status, phrase, source, kind, since, until,
+                                       limit, cursor)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/api/history/stats")
+async def history_stats():
+    """Rows written / dropped / waiting for the history writer"""
+    from app.history_store import get_history_store
+    store = get_history_store()
+    return store.stats() if store else {"enabled": False}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latencies, queue depths, sessions, model counters"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/models")
+async def model_stats():
+    """Per-model load time, warm-up time and resident memory"""
+    from app.model_registry import get_registry
+    return get_registry().stats()
+
+@app.get("/api/prefilter/stats")
+async def prefilter_stats():
+    """Keyword pre-filter skip rate (all sessions since startup)"""
+    from app.pipeline_hybrid import get_hybrid_pipeline
+    pipeline = await run_in_threadpool(get_hybrid_pipeline)
+    return pipeline.prefilter.stats()
+
+def make_sender(websocket: WebSocket, start_msg=None):
+    """
+    Serialised sender for the stream loop and background SLM tasks, in the
+    format / verbosity the client asked for in its "start" message (app/ws_protocol.py)
+    """
+    from app.ws_protocol import MessageWriter, negotiate
+    return MessageWriter(websocket, *negotiate(start_msg or {}))
+
+FALLBACK_WARNING = "⚠️ ตรวจพบพฤติกรรมหลอกลวงหลายครั้ง กรุณาวางสายและติดต่อหน่วยงานด้วยตนเองผ่านช่องทางทางการ"
+
+async def stream_warning(send, request, session):
+    """Run the warning SLM for an "slm_request", streaming tokens to the client"""
+    from app.explainer import get_explainer
+    from app.pipeline_hybrid import get_hybrid_pipeline
+    
+    tokens = []
+    try:
+        async for token in get_explainer().stream_warning_advice(request["scam_messages"]):
+            tokens.append(token)
+            await send({"type": "slm_token", "step": "SLM", "token": token})
+        advice = "".join(tokens).strip()
+        await send({"type": "log", "step": "SLM", "message": "Agent received advice.", "timestamp": time.time()})
+    except Exception as e:
+        print(f"   SLM Error (stream_warning): {e}")
+        await send({"type": "log", "step": "SLM", "message": f"❌ SLM error: {e}", "timestamp": time.time()})
+        advice = FALLBACK_WARNING
+    
+    pipeline = get_hybrid_pipeline()
+    warning = pipeline.warning_result(request["start"], request["end"], advice)
+    pipeline.record(session, warning)
+    await send(warning)
+
+@app.get("/api/explainer/stats")
+async def explainer_stats():
+    """Explanation cache hit rate (exact + near-duplicate)"""
+    from app.explanation_cache import get_explanation_cache
+    cache = get_explanation_cache()
+    return cache.stats() if cache else {"enabled": False}
+
 @app.websocket("/ws/analyze")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Demo: analysis of the demo recording, paced like a live call.
+    
+    Protocol:
+      server: {"status": "READY"}
+      client: {"action": "start", "format": "json" | "msgpack", "verbosity": "full" | "segment" | "results"}
+      server: log/result messages ..., then {"status": "FINISHED"}
+    """
     await websocket.accept()
+    slm_tasks = []
+    metrics.ACTIVE_SESSIONS.labels(endpoint="analyze").inc()
     
     try:
+        not_ready = warming_up(analyze_models())
+        if not_ready:
+            # 1013 = Try Again Later
+            await websocket.send_json(not_ready)
+            await websocket.close(code=1013)
+            return
+        
         # Hybrid: Pre-computed Diarization + Realtime AI
         from app.pipeline_hybrid import get_hybrid_pipeline
         
@@ -108,13 +376,22 @@ async def websocket_endpoint(websocket: WebSocket):
         
         print("Client pressed Play! Starting stream...")
         
+        # Per-connection state; models are shared by all connections
+        session = pipeline.new_session()
+        send = make_sender(websocket, start_msg)
+        
         # Stream segments (start after client presses play)
-        async for segment in iterate_in_threadpool(
-            pipeline.run_hybrid_streaming(audio_path, simulate_realtime=True)
+        # Paced on the event loop; SLM runs as a background task so the next segments keep flowing
+        async for segment in pipeline.run_hybrid_streaming_async(
+            audio_path, simulate_realtime=True, session=session, defer_slm=True
         ):
-            await websocket.send_json(segment)
+            if segment.get("type") == "slm_request":
+                slm_tasks.append(asyncio.create_task(stream_warning(send, segment, session)))
+                continue
+            await send(segment)
         
-        await websocket.send_json({"status": "FINISHED"})
+        await asyncio.gather(*slm_tasks)
+        await send({"status": "FINISHED", "vad": session.vad_stats()})
                 
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -131,7 +408,172 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
     finally:
+        metrics.ACTIVE_SESSIONS.labels(endpoint="analyze").dec()
+        for task in slm_tasks:
+            task.cancel()
+        try:
+            await websocket.close()
+        except:
+            pass
+
+# Utterance queues of open live calls (summed into /metrics)
+live_queues = set()
+
+@metrics.register_collector
+def collect_live_queue_depth():
+    metrics.QUEUE_DEPTH.labels(queue="live_utterances").set(sum(q.qsize() for q in list(live_queues)))
+
+@app.websocket("/ws/live")
+async def websocket_live(websocket: WebSocket):
+    """
+    Live mode: client pushes audio frames, server cuts utterances and runs
+    online diarization -> ASR -> BERT -> SLM on each one as it completes.
+    
+    Protocol:
+      server: {"status": "READY"}
+      client: {"action": "start", "sample_rate": 16000, "encoding": "pcm_s16le" | "pcm_f32le" | "opus",
+               "format": "json" | "msgpack", "verbosity": "full" | "segment" | "results"}
+      client: binary audio frames ...
+      client: {"action": "stop"}
+      server: log/result messages ..., then {"status": "FINISHED"}
+    While models are still loading the server sends {"status": "WARMING_UP"}
+    and closes with code 1013 instead of READY.
+    """
+    await websocket.accept()
+    worker = None
+    slm_tasks = []
+    pending = None
+    metrics.ACTIVE_SESSIONS.labels(endpoint="live").inc()
+    
+    try:
+        not_ready = warming_up(LIVE_MODELS + optional_models())
+        if not_ready:
+            await websocket.send_json(not_ready)
+            await websocket.close(code=1013)
+            return
+        
+        from app.pipeline_hybrid import get_hybrid_pipeline
+        from app.live_stream import LiveCall
+        from app.config import LIVE_CONFIG, SAMPLE_RATE
+        
+        pipeline = await run_in_threadpool(get_hybrid_pipeline)
+        await websocket.send_json({"status": "READY", "message": "AI Ready. Send audio frames..."})
+        
+        start_msg = await websocket.receive_json()
+        if start_msg.get("action") != "start":
+            print("Invalid start message")
+            return
+        
+        # Frame and silence lengths are derived from the rate: reject a nonsensical one up front
+        sample_rate = start_msg.get("sample_rate", SAMPLE_RATE)
+        if not isinstance(sample_rate, (int, float)) or int(sample_rate) <= 0:
+            await websocket.send_json({
+                "status": "ERROR",
+                "text": f"Invalid sample_rate: {sample_rate!r}",
+                "reason": "Bad start message"
+            })
+            return
+        
+        call = LiveCall(
+            pipeline.new_session(source="live"),
+            sample_rate=sample_rate,
+            encoding=start_msg.get("encoding", "pcm_s16le"),
+        )
+        print(f"Live call started [{call.session.call_id[:8]}]")
+        
+        # Bounded: if ASR falls behind, new utterances are dropped instead of piling up
+        pending = asyncio.Queue(maxsize=LIVE_CONFIG["MAX_PENDING_UTTERANCES"])
+        live_queues.add(pending)
+        send = make_sender(websocket, start_msg)
+        
+        async def process_utterances():
+            while True:
+                utterance = await pending.get()
+                if utterance is None:
+                    break
+                audio = utterance.audio
+                if call.needs_resample:
+                    audio = await pipeline.run_blocking(call.resample, audio)
+                async for event in pipeline.process_utterance_async(
+                    call.session, audio, utterance.start, defer_slm=True
+                ):
+                    if event.get("type") == "slm_request":
+                        slm_tasks.append(asyncio.create_task(stream_warning(send, event, call.session)))
+                        continue
+                    if event.get("type") == "result":
+                        first_alert = call.first_alert_ms
+                        call.annotate(event, utterance)
+                        if first_alert is None and call.first_alert_ms is not None:
+                            metrics.TIME_TO_FIRST_ALERT.observe(call.first_alert_ms / 1000.0)
+                    await send(event)
+        
+        worker = asyncio.create_task(process_utterances())
+        
+        def check_worker():
+            """Raise the worker's failure into the ERROR path (it only returns after the stop sentinel)"""
+            if worker.done():
+                worker.result()
+                raise RuntimeError("Utterance worker stopped")
+        
+        def enqueue(utterances):
+            for utterance in utterances:
+                try:
+                    pending.put_nowait(utterance)
+                except asyncio.QueueFull:
+                    print(f"   - [{call.session.call_id[:8]}] Overloaded, dropped utterance at {utterance.start:.1f}s")
+        
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect()
+            check_worker()
+            if message.get("bytes") is not None:
+                try:
+                    enqueue(call.push(message["bytes"]))
+                except ValueError as e:
+                    # One bad frame is skipped; the call goes on
+                    await send({"type": "frame_error", "error": str(e)})
+            elif message.get("text") is not None:
+                if json.loads(message["text"]).get("action") == "stop":
+                    break
+        
+        check_worker()
+        enqueue(call.flush())
+        # Not a bare put(): the worker may die while the queue is full
+        stop = asyncio.create_task(pending.put(None))
+        await asyncio.wait({stop, worker}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        await worker
+        await asyncio.gather(*slm_tasks)
+        
+        await send({
+            "status": "FINISHED",
+            "time_to_first_alert_ms": call.first_alert_ms,
+            "vad": call.session.vad_stats(),
+        })
+    
+    except WebSocketDisconnect:
+        print("Live client disconnected")
+    except Exception as e:
+        print(f"Live Pipeline Error: {e}")
+        import traceback
+        traceback.print_exc()
+        try:
+            await websocket.send_json({
+                "status": "ERROR", 
+                "text": f"System Error: {str(e)}", 
+                "reason": "AI Processing Failed"
+            })
+        except:
+            pass
+    finally:
+        metrics.ACTIVE_SESSIONS.labels(endpoint="live").dec()
+        live_queues.discard(pending)
+        if worker is not None and not worker.done():
+            worker.cancel()
+        for task in slm_tasks:
+            task.cancel()
         try:
             await websocket.close()
         except:
-            pass
\ No newline at end of file
+            pass
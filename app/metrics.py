@@ -0,0 +1,232 @@
+"""
+Process metrics in the Prometheus text format (GET /metrics).
+
+Small in-process implementation (no prometheus_client dependency):
+counters, gauges and cumulative histograms with labels. Gauges whose value
+lives elsewhere (queue depths) are read by callbacks at scrape time.
+
+    with STAGE_SECONDS.labels(stage="asr").time():
+        text = transcribe(audio)
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds: 5 ms (batched classifier) ... 60 s (SLM warning on a busy node)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = []
+_collectors = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        _metrics.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        # Unlabelled metric: the single child
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    @contextmanager
+    def track(self, **labels):
+        """+1 while the block runs (e.g. active sessions)"""
+        child = self.labels(**labels)
+        child.inc()
+        try:
+            yield
+        finally:
+            child.dec()
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {count}"
+
+
+def register_collector(fn):
+    """fn() is called before every scrape (to refresh gauges read from elsewhere)"""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            print(f"   Metrics collector error: {e}")
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Metrics of this app ----------
+
+STAGE_SECONDS = Histogram(
+    "scamguard_stage_seconds",
+    "Latency of one pipeline stage call, including time queued for a shared batch",
+    ["stage"],
+)
+MODEL_BATCH_SECONDS = Histogram(
+    "scamguard_model_batch_seconds",
+    "Duration of one batched model call",
+    ["model"],
+)
+MODEL_BATCHES = Counter("scamguard_model_batches_total", "Batched model calls", ["model"])
+MODEL_ITEMS = Counter("scamguard_model_items_total", "Items processed by batched model calls", ["model"])
+MODEL_ERRORS = Counter("scamguard_model_errors_total", "Batched model calls that raised", ["model"])
+QUEUE_DEPTH = Gauge("scamguard_queue_depth", "Items waiting in a queue", ["queue"])
+ACTIVE_SESSIONS = Gauge("scamguard_active_sessions", "Open analysis sessions", ["endpoint"])
+SEGMENTS = Counter("scamguard_segments_total", "Analysed speaker turns by result", ["status"])
+TIME_TO_FIRST_ALERT = Histogram(
+    "scamguard_time_to_first_alert_seconds",
+    "Live calls: from arrival of the audio of the first SCAM turn to its result being sent",
+)
+
+
+def stage(name):
+    """Timer for one pipeline stage: `with stage("asr"): ...`"""
+    return STAGE_SECONDS.labels(stage=name).time()
+
+
+def timed_iter(name, iterable):
+    """Time each next() of a generator stage (e.g. online diarization)"""
+    iterator = iter(iterable)
+    child = STAGE_SECONDS.labels(stage=name)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        child.observe(time.perf_counter() - start)
+        yield item
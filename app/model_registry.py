@@ -0,0 +1,323 @@
+"""
+One registry for every model in the process.
+
+HybridPipeline (WebSocket demo) and AIModels (LangGraph agent) both read
+their models from here, so each set of weights is loaded once. A model
+loads on first use (concurrent first users wait for the same load) or
+up front with `load_all`, which loads independent models in parallel.
+After loading, each model runs one warm-up inference on dummy input so
+the first real request doesn't pay for lazy CUDA/ORT initialisation.
+
+Load time, warm-up time and the resident memory added by each model are
+kept for `stats()`. Memory is the process RSS delta around the load, so
+with parallel loading the numbers are approximate.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import SAMPLE_RATE, DEVICE, HF_TOKEN, MODEL_PATHS, AGENT_CONFIG, \
+    DIARIZATION_CONFIG, VAD_CONFIG, MODEL_CONFIG, VOICEPRINT_CONFIG
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # No procfs (macOS): peak RSS is the best we have
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Slot:
+    def __init__(self, name, loader, warmup=None, requires=()):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.requires = tuple(requires)
+        self.lock = threading.Lock()
+        self.loading = False
+        self.loaded = False
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.rss_delta = None
+
+
+class ModelRegistry:
+    def __init__(self, warmup=None):
+        self.warmup = MODEL_CONFIG["WARMUP"] if warmup is None else warmup
+        self._slots = {}
+        self._background_lock = threading.Lock()
+
+    def register(self, name, loader, warmup=None, requires=()):
+        """
+        loader: () -> model
+        warmup: (model) -> None, one dummy inference (errors are only logged)
+        requires: models the loader gets from this registry (loaded first)
+        """
+        self._slots[name] = _Slot(name, loader, warmup, requires)
+
+    def names(self):
+        return list(self._slots)
+
+    def is_loaded(self, name):
+        return self._slots[name].loaded
+
+    def state(self, name):
+        """One of: ready, loading, failed, not_loaded"""
+        slot = self._slots[name]
+        if slot.loaded:
+            return "ready"
+        if slot.loading:
+            return "loading"
+        return "failed" if slot.error else "not_loaded"
+
+    def ensure_loading(self, names=None):
+        """
+        Non-blocking: start loading any of `names` that aren't ready in a
+        background thread. Returns {name: state} of the models still missing.
+        """
+        names = list(names or self._slots)
+        with self._background_lock:
+            missing = {name: self.state(name) for name in names if not self._slots[name].loaded}
+            to_load = [name for name, state in missing.items() if state != "loading"]
+            for name in to_load:
+                # Marked now so repeated calls don't start a second thread
+                self._slots[name].loading = True
+        if to_load:
+            threading.Thread(
+                target=self.load_all, args=(to_load,), name="model-preload", daemon=True
+            ).start()
+        return {name: self.state(name) for name in missing}
+
+    def get(self, name):
+        """Return the model, loading it on first use"""
+        slot = self._slots[name]
+        if slot.loaded:
+            return slot.value
+
+        with slot.lock:
+            if slot.loaded:
+                return slot.value
+            slot.loading = True
+            try:
+                return self._load(slot)
+            finally:
+                slot.loading = False
+
+    def _load(self, slot):
+        name = slot.name
+        for dependency in slot.requires:
+            try:
+                self.get(dependency)
+            except Exception as e:
+                slot.error = f"requires {dependency}: {e}"
+                raise
+
+        print(f"   - Loading {name}...")
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            value = slot.loader()
+        except Exception as e:
+            slot.error = f"{type(e).__name__}: {e}"
+            print(f"   Failed to load {name}: {slot.error}")
+            raise
+        slot.load_seconds = time.perf_counter() - start
+
+        if self.warmup and slot.warmup is not None and value is not None:
+            start = time.perf_counter()
+            try:
+                slot.warmup(value)
+            except Exception as e:
+                print(f"   Warm-up of {name} failed: {e}")
+            slot.warmup_seconds = time.perf_counter() - start
+
+        slot.rss_delta = rss_bytes() - rss_before
+        slot.value = value
+        slot.error = None
+        slot.loaded = True
+        print(f"   {name} ready in {slot.load_seconds:.1f}s (+{slot.rss_delta / 2**20:.0f} MB)")
+        return value
+
+    def load_all(self, names=None, max_workers=None):
+        """Load (and warm up) models in parallel; returns {name: error or None}"""
+        names = list(names or self._slots)
+        max_workers = max_workers or MODEL_CONFIG["LOAD_WORKERS"]
+
+        def load(name):
+            try:
+                self.get(name)
+                return None
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-load") as pool:
+            return dict(zip(names, pool.map(load, names)))
+
+    def stats(self):
+        def mb(value):
+            return None if value is None else round(value / 2**20, 1)
+
+        def seconds(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "rss_mb": mb(rss_bytes()),
+            "models": {
+                name: {
+                    "state": self.state(name),
+                    "load_seconds": seconds(slot.load_seconds),
+                    "warmup_seconds": seconds(slot.warmup_seconds),
+                    "rss_delta_mb": mb(slot.rss_delta),
+                    "error": slot.error,
+                }
+                for name, slot in self._slots.items()
+            },
+        }
+
+
+# Loaders (heavy imports stay inside, so importing this module is cheap)
+
+def _load_diarization():
+    import torch
+    from pyannote.audio import Pipeline
+    return Pipeline.from_pretrained(
+        DIARIZATION_CONFIG["MODEL"],
+        token=HF_TOKEN
+    ).to(torch.device(DEVICE))
+
+
+def _warmup_diarization(pipeline):
+    import torch
+    waveform = torch.from_numpy(_warmup_audio(3.0))[None, :]
+    pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+
+
+def _load_online_diarizer():
+    # Shares the speaker-embedding model inside the pyannote pipeline
+    from app.online_diarization import OnlineDiarizer, make_embed_fn
+    return OnlineDiarizer(make_embed_fn(_registry.get("diarization")))
+
+
+def _load_voiceprints():
+    if not VOICEPRINT_CONFIG["ENABLED"]:
+        return None
+    from app.voiceprints import VoiceprintIndex, VoiceprintMatcher
+    index = VoiceprintIndex.load()
+    if index is None:
+        print(f"   No voiceprint index in {VOICEPRINT_CONFIG['DIR']}, voiceprint checks off")
+        return None
+    # Not in `requires`: pyannote is only loaded when there is an index to search
+    from app.online_diarization import make_embed_fn
+    return VoiceprintMatcher(make_embed_fn(_registry.get("diarization")), index)
+
+
+def _load_vad():
+    if not VAD_CONFIG["ENABLED"]:
+        return None
+    from app.vad import SpeechGate
+    return SpeechGate()
+
+
+def _load_asr():
+    from app.backends import load_asr
+    asr = load_asr()
+    # Thai config
+    asr.model.config.forced_decoder_ids = asr.tokenizer.get_decoder_prompt_ids(
+        language="th", task="transcribe"
+    )
+    return asr
+
+
+def _load_asr_engine():
+    from app.asr_engine import ASREngine
+    return ASREngine(_registry.get("asr"))
+
+
+def _load_caller_identifier():
+    from app.backends import load_sequence_classifier
+    return load_sequence_classifier(MODEL_PATHS["CALLER_IDENTIFIER"], use_fast=True)
+
+
+def _warmup_caller_identifier(tokenizer_and_model):
+    import torch
+    tokenizer, model = tokenizer_and_model
+    encoded = tokenizer(_WARMUP_TEXT, return_tensors="pt").to(model.device)
+    with torch.inference_mode():
+        model(**encoded)
+
+
+def _load_caller_detector():
+    # Batched front-end over the caller-identifier weights (no second copy)
+    from app.caller_id import CallerIdentifier
+    tokenizer, model = _registry.get("caller_identifier")
+    return CallerIdentifier(model, tokenizer)
+
+
+def _load_scam_classifier():
+    from app.backends import load_text_classifier
+    # Fast (Rust) tokenizer: the context builder encodes every turn with it
+    return load_text_classifier(MODEL_PATHS["SCAM_DETECTOR"], use_fast=True)
+
+
+def _load_scam_detector():
+    # Shared batching front-end (all sessions go through this)
+    from app.classifier import BatchedTextClassifier
+    return BatchedTextClassifier.from_pipeline(_registry.get("scam_classifier"))
+
+
+def _load_explainer_slm():
+    # Only an HTTP client: Ollama owns the weights
+    from langchain_ollama import ChatOllama
+    return ChatOllama(
+        model=AGENT_CONFIG["OLLAMA_MODEL"],
+        temperature=0.3,
+        base_url=AGENT_CONFIG["OLLAMA_BASE_URL"],
+    )
+
+
+_WARMUP_TEXT = "สวัสดีครับ ติดต่อจากธนาคารครับ"
+
+
+def _warmup_audio(seconds):
+    # Low-level noise rather than digital silence, so VAD/ASR take the normal path
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(SAMPLE_RATE * seconds)) * 0.01).astype(np.float32)
+
+
+def _build_registry():
+    registry = ModelRegistry()
+    registry.register("diarization", _load_diarization, _warmup_diarization)
+    registry.register("online_diarizer", _load_online_diarizer, requires=["diarization"])
+    registry.register("voiceprints", _load_voiceprints, lambda matcher: matcher.match(_warmup_audio(3.0)))
+    registry.register("vad", _load_vad, lambda vad: vad.trim(_warmup_audio(1.0)))
+    registry.register("asr", _load_asr)
+    registry.register("asr_engine", _load_asr_engine,
+                      lambda engine: engine.transcribe(_warmup_audio(1.0)), requires=["asr"])
+    registry.register("caller_identifier", _load_caller_identifier, _warmup_caller_identifier)
+    registry.register("caller_detector", _load_caller_detector,
+                      lambda detector: detector.score(_WARMUP_TEXT), requires=["caller_identifier"])
+    registry.register("scam_classifier", _load_scam_classifier)
+    registry.register("scam_detector", _load_scam_detector,
+                      lambda detector: detector.classify(_WARMUP_TEXT), requires=["scam_classifier"])
+    registry.register("explainer_slm", _load_explainer_slm)
+    return registry
+
+
+_registry = _build_registry()
+
+
+def get_registry():
+    return _registry
+
+
+def get_model(name):
+    return _registry.get(name)
@@ -1,69 +1,51 @@
-import torch
-import librosa
-import numpy as np
-from transformers import pipeline as hf_pipeline
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from pyannote.audio import Pipeline
-from langchain_ollama import ChatOllama
-from app.config import HF_TOKEN, DEVICE, MODEL_PATHS, AGENT_CONFIG
+from app.model_registry import get_registry
 
 class AIModels:
+    """
+    Models used by the LangGraph agent.
+    Views onto the shared model registry: same weights as HybridPipeline,
+    each model loaded on first use.
+    """
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(AIModels, cls).__new__(cls)
-            cls._instance.init_models()
+            cls._instance.registry = get_registry()
         return cls._instance
 
-    def init_models(self):
-        print("Loading AI Models... (This may take a while)")
-        
-        # 1. Diarization
-        print("   - Loading Pyannote...")
-        self.diarization = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-3.1", 
-            token=HF_TOKEN
-        ).to(torch.device(DEVICE))
-
-        # 2. ASR (Whisper)
-        print("   - Loading Whisper TH...")
-        self.asr = hf_pipeline(
-            "automatic-speech-recognition", 
-            model="biodatlab/distill-whisper-th-small",
-            device=0 if DEVICE == "cuda" else -1
-        )
-        # Thai config
-        self.asr.model.config.forced_decoder_ids = self.asr.tokenizer.get_decoder_prompt_ids(
-            language="th", task="transcribe"
-        )
-
-        # 3. Caller Identifier (WangchanBERTa)
-        print("   - Loading Caller ID Model...")
-        self.caller_tokenizer = AutoTokenizer.from_pretrained(MODEL_PATHS["CALLER_IDENTIFIER"])
-        self.caller_model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATHS["CALLER_IDENTIFIER"])
-        self.caller_model.to(DEVICE)
-        self.caller_model.eval()
-
-        # 4. Scam Detector
-        print("   - Loading Scam Detector...")
-        sd_tokenizer = AutoTokenizer.from_pretrained(MODEL_PATHS["SCAM_DETECTOR"], use_fast=False)
-        self.scam_classifier = hf_pipeline(
-            "text-classification",
-            model=MODEL_PATHS["SCAM_DETECTOR"],
-            tokenizer=sd_tokenizer,
-            device=DEVICE
-        )
-
-        # 5. Explainer (Ollama)
-        print("   - Connecting to Ollama...")
-        self.explainer_slm = ChatOllama(
-            model=AGENT_CONFIG["OLLAMA_MODEL"],
-            temperature=0.3,
-            base_url=AGENT_CONFIG["OLLAMA_BASE_URL"]
-        )
-        
-        print("All Models Loaded!")
+    # 1. Diarization
+    @property
+    def diarization(self):
+        return self.registry.get("diarization")
+
+    # 2. ASR (Whisper)
+    @property
+    def asr(self):
+        return self.registry.get("asr")
+
+    # 3. Caller Identifier (WangchanBERTa)
+    @property
+    def caller_tokenizer(self):
+        return self.registry.get("caller_identifier")[0]
+
+    @property
+    def caller_model(self):
+        return self.registry.get("caller_identifier")[1]
+
+    # 4. Scam Detector
+    @property
+    def scam_classifier(self):
+        return self.registry.get("scam_classifier")
+
+    @property
+    def scam_detector(self):
+        return self.registry.get("scam_detector")
+
+    # 5. Explainer (Ollama)
+    @property
+    def explainer_slm(self):
+        return self.registry.get("explainer_slm")
 
 # Helper function to get instance
 def get_models():
@@ -0,0 +1,191 @@
+import numpy as np
+from app.config import SAMPLE_RATE, DIARIZATION_CONFIG
+
+
+def make_embed_fn(diarization_pipeline):
+    """
+    Speaker embedding function (float32 audio -> vector).
+    Reuses the embedding model already inside the pyannote diarization
+    pipeline, so no second copy of the weights is loaded.
+    """
+    import torch
+    
+    embedding = getattr(diarization_pipeline, "_embedding", None)
+    if embedding is None:
+        from pyannote.audio import Model, Inference
+        from app.config import HF_TOKEN
+        model = Model.from_pretrained("pyannote/wespeaker-voxceleb-resnet34-LM", token=HF_TOKEN)
+        inference = Inference(model, window="whole")
+        
+        def embed(audio):
+            wav = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))[None, :]
+            return np.asarray(inference({"waveform": wav, "sample_rate": SAMPLE_RATE})).reshape(-1)
+        return embed
+    
+    def embed(audio):
+        wav = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))[None, None, :]
+        return np.asarray(embedding(wav))[0]
+    return embed
+
+
+class SpeakerCentroids:
+    """
+    Per-call speaker memory: one running-mean unit embedding per speaker.
+    A window joins the closest speaker when cosine similarity >= threshold
+    (or when max_speakers is reached), otherwise it starts a new speaker.
+    """
+    def __init__(self, max_speakers=None, threshold=None):
+        self.max_speakers = max_speakers or DIARIZATION_CONFIG["NUM_SPEAKERS"]
+        self.threshold = DIARIZATION_CONFIG["ONLINE_THRESHOLD"] if threshold is None else threshold
+        self.centroids = []
+        self.counts = []
+    
+    def assign(self, embedding):
+        emb = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(emb)
+        if not np.isfinite(norm) or norm == 0:
+            return None
+        emb = emb / norm
+        
+        if self.centroids:
+            sims = np.stack(self.centroids) @ emb
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold or len(self.centroids) >= self.max_speakers:
+                n = self.counts[best]
+                centroid = self.centroids[best] * n + emb
+                self.centroids[best] = centroid / np.linalg.norm(centroid)
+                self.counts[best] = n + 1
+                return f"SPEAKER_{best:02d}"
+        
+        self.centroids.append(emb)
+        self.counts.append(1)
+        return f"SPEAKER_{len(self.centroids) - 1:02d}"
+
+
+class SlidingWindowDiarizer:
+    """
+    Incremental diarization of one audio stream.
+
+    Every ONLINE_STEP_S a window of the last ONLINE_WINDOW_S is embedded and
+    labelled (silent windows are labelled None). A speaker change is only
+    accepted after ONLINE_STABLE_WINDOWS consecutive windows agree, which
+    absorbs short blips. A segment is emitted as soon as the change is
+    confirmed, so its end is known at most
+        ONLINE_WINDOW_S + ONLINE_STABLE_WINDOWS * ONLINE_STEP_S
+    seconds of audio later (plus embedding time).
+    Memory: one window of audio.
+    """
+    def __init__(self, embed_fn, speakers, offset=0.0):
+        self.embed_fn = embed_fn
+        self.speakers = speakers
+        self.offset = offset
+        self.window = int(SAMPLE_RATE * DIARIZATION_CONFIG["ONLINE_WINDOW_S"])
+        self.step = int(SAMPLE_RATE * DIARIZATION_CONFIG["ONLINE_STEP_S"])
+        self.stable = DIARIZATION_CONFIG["ONLINE_STABLE_WINDOWS"]
+        self.min_rms = DIARIZATION_CONFIG["ONLINE_MIN_RMS"]
+        
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buf_start = 0          # absolute sample index of _buffer[0]
+        self._next_end = self.window  # absolute end of the next window
+        self._region_start = 0
+        self._current = None          # open segment
+        self._candidate = None        # [label, start, windows seen]
+    
+    def _seconds(self, samples):
+        return self.offset + samples / SAMPLE_RATE
+    
+    def _label(self, audio):
+        # Silence is judged on the newest step only (the window lags by design);
+        # the speaker is judged on the whole window
+        newest = audio[-self.step:]
+        if len(newest) == 0 or float(np.sqrt(np.mean(newest * newest))) < self.min_rms:
+            return None
+        return self.speakers.assign(self.embed_fn(audio))
+    
+    def push(self, samples):
+        """Feed audio; return segments that became stable"""
+        out = []
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        
+        while self._buf_start + len(self._buffer) >= self._next_end:
+            lo = max(0, self._next_end - self.window - self._buf_start)
+            hi = self._next_end - self._buf_start
+            label = self._label(self._buffer[lo:hi])
+            self._update(label, self._seconds(self._region_start), self._seconds(self._next_end), out)
+            self._region_start = self._next_end
+            self._next_end += self.step
+        
+        # Keep only what the next window needs
+        keep_from = max(0, self._next_end - self.window - self._buf_start)
+        if keep_from:
+            self._buffer = self._buffer[keep_from:]
+            self._buf_start += keep_from
+        return out
+    
+    def flush(self):
+        """End of stream: label the tail and close the open segment"""
+        out = []
+        end = self._buf_start + len(self._buffer)
+        if end > self._region_start:
+            lo = max(0, end - self.window - self._buf_start)
+            label = self._label(self._buffer[lo:])
+            self._update(label, self._seconds(self._region_start), self._seconds(end), out)
+            self._region_start = end
+        if self._current is not None:
+            self._current["available_at"] = self._seconds(end)
+            out.append(self._current)
+            self._current = None
+        return out
+    
+    def _update(self, label, start, end, out):
+        cur = self._current
+        if cur is None:
+            if label is not None:
+                self._current = {"start": start, "end": end, "speaker": label}
+            return
+        if label == cur["speaker"]:
+            cur["end"] = end
+            self._candidate = None
+            return
+        
+        # Possible change (other speaker or silence): wait until it is stable
+        if self._candidate is not None and self._candidate[0] == label:
+            self._candidate[2] += 1
+        else:
+            self._candidate = [label, start, 1]
+        
+        if self._candidate[2] >= self.stable:
+            cur["available_at"] = end
+            out.append(cur)
+            new_label, new_start, _ = self._candidate
+            self._current = (
+                {"start": new_start, "end": end, "speaker": new_label} if new_label is not None else None
+            )
+            self._candidate = None
+
+
+class OnlineDiarizer:
+    """Shared by all calls (holds the embedding function only)"""
+    def __init__(self, embed_fn):
+        self.embed_fn = embed_fn
+    
+    def new_speakers(self):
+        """Per-call speaker centroids"""
+        return SpeakerCentroids()
+    
+    def stream(self, y, speakers=None, block_seconds=None):
+        """
+        Generator over a whole waveform, fed block by block as if it were live.
+        Yields {start, end, speaker, available_at} segments as they stabilise.
+        """
+        speakers = speakers or self.new_speakers()
+        diarizer = SlidingWindowDiarizer(self.embed_fn, speakers)
+        block = int(SAMPLE_RATE * (block_seconds or DIARIZATION_CONFIG["ONLINE_STEP_S"]))
+        for i in range(0, len(y), block):
+            yield from diarizer.push(y[i:i + block])
+        yield from diarizer.flush()
+    
+    def segment_utterance(self, audio, offset, speakers):
+        """Split one live utterance into speaker segments (offset = utterance start, seconds)"""
+        diarizer = SlidingWindowDiarizer(self.embed_fn, speakers, offset=offset)
+        return diarizer.push(audio) + diarizer.flush()
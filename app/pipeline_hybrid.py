@@ -1,194 +1,350 @@
-import torch
-import librosa
 import numpy as np
 import time
 import os
-from app.config import SAMPLE_RATE, DEVICE, HF_TOKEN
+import asyncio
+import itertools
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.config import SAMPLE_RATE, DIARIZATION_CONFIG, MODEL_CONFIG, AUDIO_CACHE_CONFIG
+from app.caller_id import RoleTracker
+from app.explainer import format_scam_messages
+from app.explanation_cache import get_explanation_cache
+from app.history_store import get_history_store
+from app.metrics import stage, timed_iter, SEGMENTS
+
+
+class CallSession:
+    """
+    Per-call state (memory, alert counters).
+    Lightweight: models live on the shared HybridPipeline, so many sessions
+    can run against one loaded copy of the weights.
+    """
+    def __init__(self, call_id=None, source="analyze"):
+        self.call_id = call_id or uuid.uuid4().hex
+        # Where the call came from, kept with its results in the history store
+        self.source = source
+        self.recent_memory = []
+        self.suspicious_memory = []
+        self.segment_count = 0
+        self.scam_count = 0
+        self.scam_messages = []
+        self.warning_sent = False
+        # Online diarization: per-call speaker centroids
+        self.speakers = None
+        # Caller / receiver from the caller-identifier scores of early turns
+        self.roles = RoleTracker()
+        # Voiceprint check: speakers already looked up, and the match (if any)
+        self.voiceprint_checked = set()
+        self.known_scammer = None
+        # VAD: seconds of audio reaching the gate vs. seconds sent to ASR
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+
+    def vad_stats(self):
+        return {
+            "audio_seconds": round(self.audio_seconds, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "asr_seconds_saved": round(self.audio_seconds - self.speech_seconds, 2),
+        }
+
+    def update_memory(self, text, status, confidence):
+        """Update memory"""
+        self.recent_memory.append(text)
+        if len(self.recent_memory) > 5:
+            self.recent_memory.pop(0)
+        
+        if status in ["WAIT", "SCAM"] and confidence > 0.5:
+            if text not in self.suspicious_memory:
+                self.suspicious_memory.append(text)
+                if len(self.suspicious_memory) > 5:
+                    self.suspicious_memory.pop(0)
+        
+        if status == "SAFE" and confidence > 0.8:
+            self.suspicious_memory = []
+
+
+class ModelCall:
+    """
+    Yielded by HybridPipeline._segment_steps: a model call for the driver to run.
+    The sync driver calls the method inline; the async driver awaits its
+    `<method>_async` variant or runs it on the pipeline executor.
+    """
+    __slots__ = ("method", "args")
+    
+    def __init__(self, method, *args):
+        self.method = method
+        self.args = args
+
 
 class HybridPipeline:
+    """
+    Models come from the shared registry (app/model_registry.py): loaded once
+    per process, on first use or by the startup preload.
+    """
     def __init__(self):
-        self._load_diarization()
-        self._load_asr()
-        self._load_scam_detector()
-        self._load_explainer()
-        self.reset_state()
+        from app.model_registry import get_registry
+        self.registry = get_registry()
         
-        # Cache for pre-computed diarization
+        # Cache for pre-computed diarization: this process (dict) + disk (all workers)
         self.diarization_cache = {}
+        self.diarization_disk_cache = None
+        self._diarization_lock = threading.Lock()
+
+        self._init_diarization_cache()
+        self.audio_store = self._init_audio_store()
+        self._explainer_prompts = None
+        
+        # Results of every call, for the history API (None when HISTORY_ENABLED=false)
+        self.history = get_history_store()
+        
+        # Blocking model calls of async sessions (see run_blocking)
+        self.executor = ThreadPoolExecutor(
+            max_workers=MODEL_CONFIG["EXECUTOR_WORKERS"], thread_name_prefix="pipeline"
+        )
+        
+        # Cheap keyword stage in front of BERT
+        from app.prefilter import KeywordPrefilter
+        self.prefilter = KeywordPrefilter()
         
         print("Hybrid Pipeline Ready!")
     
-    def _load_diarization(self):
-        print("   - Loading Pyannote Diarization...")
-        from pyannote.audio import Pipeline
-        self.diarization = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-3.1", 
-            token=HF_TOKEN
-        ).to(torch.device(DEVICE))
-    
-    def _load_asr(self):
-        print("   - Loading Whisper TH...")
-        from transformers import pipeline as hf_pipeline
-        self.asr = hf_pipeline(
-            "automatic-speech-recognition", 
-            model="biodatlab/distill-whisper-th-small",
-            device=0 if DEVICE == "cuda" else -1
-        )
-        self.asr.model.config.forced_decoder_ids = self.asr.tokenizer.get_decoder_prompt_ids(
-            language="th", task="transcribe"
-        )
+    @property
+    def diarization(self):
+        return self.registry.get("diarization")
+    
+    @property
+    def online_diarizer(self):
+        # Incremental diarization (live calls / DIARIZATION_MODE=online)
+        return self.registry.get("online_diarizer")
+    
+    @property
+    def voiceprints(self):
+        # None when there is no voiceprint index (or VOICEPRINT_ENABLED=false)
+        return self.registry.get("voiceprints")
+    
+    @property
+    def vad(self):
+        # None when VAD_ENABLED=false
+        return self.registry.get("vad")
+    
+    @property
+    def asr(self):
+        return self.registry.get("asr")
+    
+    @property
+    def asr_engine(self):
+        return self.registry.get("asr_engine")
+    
+    @property
+    def caller_detector(self):
+        return self.registry.get("caller_detector")
+    
+    @property
+    def scam_classifier(self):
+        return self.registry.get("scam_classifier")
+    
+    @property
+    def scam_detector(self):
+        return self.registry.get("scam_detector")
     
-    def _load_scam_detector(self):
-        from transformers import pipeline as hf_pipeline, AutoTokenizer
-        from app.config import MODEL_PATHS
+    @property
+    def explainer_slm(self):
+        return self.registry.get("explainer_slm")
+    
+    @staticmethod
+    def _init_audio_store():
+        """Decoded recordings, memory-mapped (None when AUDIO_CACHE=false)"""
+        if not AUDIO_CACHE_CONFIG["ENABLED"]:
+            return None
+        from importlib.metadata import version, PackageNotFoundError
+        from app.audio_store import AudioStore
         
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATHS["SCAM_DETECTOR"], use_fast=False)
-        self.scam_classifier = hf_pipeline(
-            "text-classification",
-            model=MODEL_PATHS["SCAM_DETECTOR"],
-            tokenizer=tokenizer,
-            device=DEVICE
+        # Resampling output depends on the librosa version
+        try:
+            librosa_version = version("librosa")
+        except PackageNotFoundError:
+            librosa_version = "none"
+        return AudioStore(
+            AUDIO_CACHE_CONFIG["DIR"],
+            version=f"librosa@{librosa_version}",
+            max_bytes=int(AUDIO_CACHE_CONFIG["MAX_MB"] * 1024 * 1024),
         )
     
-    def _load_explainer(self):
-
-        from langchain_ollama import ChatOllama
-        from langchain_core.prompts import ChatPromptTemplate
-        from app.config import AGENT_CONFIG
-        
-        self.explainer_slm = ChatOllama(
-            model=AGENT_CONFIG["OLLAMA_MODEL"],
-            temperature=0.3,
-            base_url="http://127.0.0.1:11434",
-        )
+    def _init_diarization_cache(self):
+        from importlib.metadata import version, PackageNotFoundError
+        from app.diarization_cache import DiarizationCache
         
-        self.explain_prompt = ChatPromptTemplate.from_messages([
-            ("system", "หน้าที่ของคุณคือระบบแจ้งเตือนความปลอดภัย"),
-            ("user", """วิเคราะห์ข้อความต่อไปนี้ แล้วอธิบายสั้นๆ ว่า "ทำไมถึงเป็นมิจฉาชีพ?"
-            ตอบเป็นภาษาไทย ความยาวไม่เกิน 2 บรรทัด
-            ข้อความ: "{context}"
-            คำอธิบาย:""")
-        ])
-        
-        # Prompt for warning and advice (when SCAM detected 3 times)
-        self.warning_prompt = ChatPromptTemplate.from_messages([
-            ("system", """คุณคือผู้ช่วย AI ที่ช่วยปกป้องผู้ใช้จากมิจฉาชีพทางโทรศัพท์
-หน้าที่ของคุณคือเตือนผู้ใช้อย่างจริงจังและให้คำแนะนำที่ปฏิบัติได้จริง
-ตอบเป็นภาษาไทย ใช้ภาษาที่เข้าใจง่าย"""),
-            ("user", """⚠️ ตรวจพบพฤติกรรมหลอกลวงหลายครั้ง!
-
-ข้อความที่น่าสงสัย:
-{scam_messages}
-
-กรุณา:
-1. เตือนผู้ใช้ว่านี่คือสายมิจฉาชีพ (1-2 ประโยค)
-2. ระบุเทคนิคหลอกลวงที่ใช้ (bullet points สั้นๆ)
-3. ให้คำแนะนำว่าควรทำอย่างไร (3-4 ข้อ)
-
-ตอบ:""")
-        ])
+        # Results depend on the model and pyannote version, so both go in the key
+        try:
+            pyannote_version = version("pyannote.audio")
+        except PackageNotFoundError:
+            pyannote_version = "none"
+        self.diarization_disk_cache = DiarizationCache(
+            DIARIZATION_CONFIG["CACHE_DIR"],
+            version=f"{DIARIZATION_CONFIG['MODEL']}@{pyannote_version}",
+            max_bytes=int(DIARIZATION_CONFIG["CACHE_MAX_MB"] * 1024 * 1024),
+        )
     
-    def reset_state(self):
-        """Reset state for new session"""
-        self.recent_memory = []
-        self.suspicious_memory = []
-        self.segment_count = 0
-        self.scam_count = 0
-        self.scam_messages = []
-        self.warning_sent = False
+    def _prompts(self):
+        """LangChain prompts for the blocking SLM path (langchain imported on first use)"""
+        if self._explainer_prompts is None:
+            from langchain_core.prompts import ChatPromptTemplate
+            from app.explainer import EXPLAIN_SYSTEM, EXPLAIN_USER, WARNING_SYSTEM, WARNING_USER
+            
+            explain_prompt = ChatPromptTemplate.from_messages([
+                ("system", EXPLAIN_SYSTEM),
+                ("user", EXPLAIN_USER)
+            ])
+            
+            # Prompt for warning and advice (when SCAM detected 3 times)
+            warning_prompt = ChatPromptTemplate.from_messages([
+                ("system", WARNING_SYSTEM),
+                ("user", WARNING_USER)
+            ])
+            self._explainer_prompts = (explain_prompt, warning_prompt)
+        return self._explainer_prompts
     
-    def precompute_diarization(self, audio_path):
+    @property
+    def explain_prompt(self):
+        return self._prompts()[0]
+    
+    @property
+    def warning_prompt(self):
+        return self._prompts()[1]
+    
+    def new_session(self, call_id=None, source="analyze"):
+        """Create per-call state for a new session"""
+        return CallSession(call_id, source)
+    
+    def record(self, session, event):
+        """Keep a result in the history store (queued; written off the stream loop)"""
+        if self.history is not None:
+            self.history.record(session.source, session.call_id, event)
+    
+    async def run_blocking(self, fn, *args):
+        """Run a blocking call on the pipeline executor (keeps the event loop free)"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+    
+    def precompute_diarization(self, audio_path, num_speakers=None, audio=None, use_cache=True):
         """
         Pre-compute Diarization for audio file (Run on startup)
         Return: list of segments [(start, end, speaker), ...]
+        Cached by audio content: memory -> disk -> pyannote
+        audio: the file already decoded to mono SAMPLE_RATE float32 (skips loading it again)
+        use_cache: False for one-off recordings (bulk archives): straight to pyannote,
+                   without hashing the file or adding entries that evict the served ones
         """
-        # Check cache first
-        cache_key = os.path.basename(audio_path)
+        num_speakers = num_speakers or DIARIZATION_CONFIG["NUM_SPEAKERS"]
+        if not use_cache:
+            with self._diarization_lock:
+                return self._run_diarization(audio_path, num_speakers, audio)
+        
+        name = os.path.basename(audio_path)
+        cache_key = self.diarization_disk_cache.key(audio_path, num_speakers)
+        
         if cache_key in self.diarization_cache:
-            print(f"   Using cached diarization for {cache_key}")
+            print(f"   Using cached diarization for {name}")
             return self.diarization_cache[cache_key]
         
-        print(f"   Pre-computing diarization for {cache_key}...")
+        segments = self.diarization_disk_cache.get(cache_key)
+        if segments is None:
+            # Pyannote is not safe to run concurrently, and sessions/workers asking
+            # for the same file should only compute it once
+            with self._diarization_lock, self.diarization_disk_cache.compute_lock(cache_key):
+                segments = self.diarization_disk_cache.get(cache_key)
+                if segments is None:
+                    segments = self._run_diarization(audio_path, num_speakers, audio)
+                    if segments:
+                        self.diarization_disk_cache.put(cache_key, segments)
+        else:
+            print(f"   Loaded diarization for {name} from disk cache")
+        
+        if segments:
+            if len(self.diarization_cache) >= 64:
+                self.diarization_cache.pop(next(iter(self.diarization_cache)))
+            self.diarization_cache[cache_key] = segments
+        return segments
+
+    def _run_diarization(self, audio_path, num_speakers, audio=None):
+        """Run pyannote over the whole file"""
+        print(f"   Pre-computing diarization for {os.path.basename(audio_path)}...")
         start_time = time.time()
         
-        # Load audio
-        y, sr = librosa.load(audio_path, sr=SAMPLE_RATE, mono=False)
-        if y.ndim == 1:
-            y = y[np.newaxis, :]
-        audio_input = {"waveform": torch.from_numpy(y).float(), "sample_rate": sr}
+        import torch
+        
+        # Same mono waveform the sessions stream (decoded once, see load_audio)
+        y = self.load_audio(audio_path) if audio is None else audio
+        # pyannote gets its own writable copy for the one whole-file pass
+        audio_input = {"waveform": torch.from_numpy(np.array(y, dtype=np.float32)[np.newaxis, :]),
+                       "sample_rate": SAMPLE_RATE}
         
         # Run Diarization
-        diarization_output = self.diarization(audio_input, num_speakers=2)
-        
-        # Extract annotation
-        annotation = None
-        if hasattr(diarization_output, "itertracks"):
-            annotation = diarization_output
-        elif hasattr(diarization_output, "annotation"):
-            annotation = diarization_output.annotation
-        else:
-            for attr in dir(diarization_output):
-                if attr.startswith("_"):
-                    continue
-                val = getattr(diarization_output, attr)
-                if hasattr(val, "itertracks"):
-                    annotation = val
-                    break
+        with stage("diarization"):
+            diarization_output = self.diarization(audio_input, num_speakers=num_speakers)
         
-        if not annotation:
+        segments = diarization_segments(diarization_output)
+        if segments is None:
             print("   Error: Could not find annotation")
             return []
         
-        # Create segments list
-        segments = []
-        for turn, _, speaker in annotation.itertracks(yield_label=True):
-            segments.append({
-                "start": turn.start,
-                "end": turn.end,
-                "speaker": speaker
-            })
-        
-        # Cache it
-        self.diarization_cache[cache_key] = segments
-        
         elapsed = time.time() - start_time
         print(f"   Diarization complete: {len(segments)} segments in {elapsed:.1f}s")
         
         return segments
     
+    def gate_speech(self, session, audio_chunk):
+        """VAD: trim non-speech before ASR (no-op when VAD is disabled)"""
+        if self.vad is None:
+            return audio_chunk
+        with stage("vad"):
+            speech, speech_seconds = self.vad.trim(audio_chunk)
+        session.audio_seconds += len(audio_chunk) / SAMPLE_RATE
+        session.speech_seconds += speech_seconds
+        return speech
+    
     def transcribe(self, audio_chunk):
         """Transcribe audio chunk (REALTIME) - use numpy array directly"""
-        if len(audio_chunk) < SAMPLE_RATE * 0.3:
-            return None
-        
-        # Convert to dict format supported by HuggingFace (avoid torchcodec)
-        audio_input = {
-            "raw": audio_chunk.astype(np.float32),
-            "sampling_rate": SAMPLE_RATE
-        }
-            
-        generate_kwargs = {
-            "max_new_tokens": 128,
-            "no_repeat_ngram_size": 3,
-            "condition_on_prev_tokens": False,
-            "temperature": 0.0
-        }
-        
-        result = self.asr(audio_input, return_timestamps=False, generate_kwargs=generate_kwargs)
-        text = result["text"].strip()
-        
-        return text if len(text) > 2 else None
+        # Batched with segments from other sessions (see ASREngine)
+        with stage("asr"):
+            return self.asr_engine.transcribe(audio_chunk)
+    
+    async def transcribe_async(self, audio_chunk):
+        with stage("asr"):
+            return await self.asr_engine.transcribe_async(audio_chunk)
+    
+    def transcribe_many(self, audio_chunks):
+        """Transcribe all segments of one recording in length-bucketed batches"""
+        with stage("asr_recording"):
+            return self.asr_engine.transcribe_many(audio_chunks)
     
-    def detect_scam(self, text):
+    def speech_chunks(self, session, y, segments):
+        """Audio of each diarization segment, VAD-gated (input of transcribe_many)"""
+        return [
+            self.gate_speech(session, y[int(seg["start"] * SAMPLE_RATE):int(seg["end"] * SAMPLE_RATE)])
+            for seg in segments
+        ]
+    
+    def scam_context(self, text, session):
+        """Classifier input: suspicious history + recent turns + the new turn, within the token budget"""
+        return self.scam_detector.build_context(text, session.suspicious_memory, session.recent_memory[-3:])
+    
+    def detect_scam(self, text, session):
         """Detect scam with context (REALTIME - BERT)"""
-        full_context = ""
-        if self.suspicious_memory:
-            full_context += "[สัญญาณก่อนหน้า] " + " | ".join(self.suspicious_memory) + " "
-        if self.recent_memory:
-            full_context += "[บทสนทนาล่าสุด] " + " ".join(self.recent_memory[-3:]) + " "
-        full_context += text
-        
-        result = self.scam_classifier(full_context)[0]
+        context = self.scam_context(text, session)
+        with stage("classifier"):
+            result = self.scam_detector.classify(context)
+        return self.scam_status(result) + (context.text,)
+    
+    async def detect_scam_async(self, text, session):
+        context = self.scam_context(text, session)
+        with stage("classifier"):
+            result = await self.scam_detector.classify_async(context)
+        return self.scam_status(result) + (context.text,)
+    
+    @staticmethod
+    def scam_status(result):
+        """Classifier output -> (status, score)"""
         score = result['score']
         label = result['label']
         
@@ -201,186 +357,334 @@ class HybridPipeline:
         else:
             status = pred_class
         
-        return status, score, full_context
+        return status, score
     
     def explain_scam(self, context):
         """Explain why it is a scam (REALTIME - SLM)"""
+        cache = get_explanation_cache()
+        cached = cache.get("explain", context) if cache else None
+        if cached is not None:
+            return cached
         try:
             chain = self.explain_prompt | self.explainer_slm
-            response = chain.invoke({"context": context})
-            return response.content.strip()
+            with stage("slm_explain"):
+                response = chain.invoke({"context": context})
+            explanation = response.content.strip()
         except Exception as e:
             print(f"   SLM Error (explain_scam): {e}")
             raise e
+        if cache:
+            cache.put("explain", context, explanation)
+        return explanation
     
-    def generate_warning_advice(self):
+    def generate_warning_advice(self, session):
         """Generate warning and advice from SLM when SCAM detected 3 times"""
+        scam_text = format_scam_messages(session.scam_messages)
+        cache = get_explanation_cache()
+        cached = cache.get("warning", scam_text) if cache else None
+        if cached is not None:
+            return cached
         try:
-            scam_text = "\n".join([f"- {msg}" for msg in self.scam_messages])
             chain = self.warning_prompt | self.explainer_slm
-            response = chain.invoke({"scam_messages": scam_text})
-            return response.content.strip()
+            with stage("slm_warning"):
+                response = chain.invoke({"scam_messages": scam_text})
+            advice = response.content.strip()
         except Exception as e:
             print(f"   SLM Error (generate_warning_advice): {e}")
             raise e
+        if cache:
+            cache.put("warning", scam_text, advice)
+        return advice
     
-    def update_memory(self, text, status, confidence):
-        """Update memory"""
-        self.recent_memory.append(text)
-        if len(self.recent_memory) > 5:
-            self.recent_memory.pop(0)
-        
-        if status in ["WAIT", "SCAM"] and confidence > 0.5:
-            if text not in self.suspicious_memory:
-                self.suspicious_memory.append(text)
-                if len(self.suspicious_memory) > 5:
-                    self.suspicious_memory.pop(0)
-        
-        if status == "SAFE" and confidence > 0.8:
-            self.suspicious_memory = []
+    async def generate_warning_advice_async(self, session):
+        # Async HTTP client: cached and timed (slm_warning) inside the explainer
+        from app.explainer import get_explainer
+        return await get_explainer().warning_advice(session.scam_messages)
     
-    def identify_caller(self, segments):
-        """Identify which speaker is CALLER (first speaker = CALLER)"""
-        if not segments:
-            return None
-        first_speaker = segments[0]["speaker"]
-        return first_speaker
+    def match_voiceprint(self, audio_chunk):
+        """Known-scammer lookup on the start of a speaker's first turn"""
+        with stage("voiceprint"):
+            return self.voiceprints.match(audio_chunk)
+    
+    def score_caller(self, text):
+        """P(caller) of one turn (batched with turns of other sessions)"""
+        with stage("caller_id"):
+            return self.caller_detector.score(text)
+    
+    async def score_caller_async(self, text):
+        with stage("caller_id"):
+            return await self.caller_detector.score_async(text)
     
-    def run_hybrid_streaming(self, audio_path: str, simulate_realtime=True):
+    def prime_roles(self, session, segments, transcripts):
+        """Whole recording transcribed up front: score the early turns of every speaker in one batch"""
+        turns = session.roles.early_turns(segments, transcripts)
+        if not turns:
+            return
+        with stage("caller_id"):
+            scores = self.caller_detector.score_many([text for _, _, text in turns])
+        self._add_caller_scores(session, turns, scores)
+    
+    async def prime_roles_async(self, session, segments, transcripts):
+        turns = session.roles.early_turns(segments, transcripts)
+        if not turns:
+            return
+        with stage("caller_id"):
+            scores = await asyncio.gather(*[self.caller_detector.score_async(text) for _, _, text in turns])
+        self._add_caller_scores(session, turns, scores)
+    
+    @staticmethod
+    def _add_caller_scores(session, turns, scores):
+        for (speaker, start, _), score in zip(turns, scores):
+            session.roles.add(speaker, start, score)
+        if session.roles.locked:
+            print(f"   - Caller: {session.roles.caller} ({session.roles.confidence:.0%})")
+    
+    @staticmethod
+    def warning_result(start, end, warning_advice):
+        """WARNING message sent after the 3rd SCAM segment"""
+        return {
+            "type": "result",
+            "start": start,
+            "end": end,
+            "speaker": "SYSTEM",
+            "text": "",
+            "status": "WARNING",
+            "role": "SYSTEM",
+            "reason": warning_advice,
+            "confidence": 1.0,
+            "is_warning": True
+        }
+    
+    @staticmethod
+    def voiceprint_result(start, end, speaker, match):
+        """Sent as soon as a speaker's voice matches a known scammer (before ASR)"""
+        return {
+            "type": "voiceprint",
+            "start": start,
+            "end": end,
+            "speaker": speaker,
+            "match_id": match["id"],
+            "similarity": round(match["similarity"], 4),
+        }
+    
+    def process_segment(self, session, speech_audio, start_time, end_time, speaker, role, text=None,
+                        defer_slm=False):
         """
-        Generator: Use Pre-computed Diarization + Realtime ASR/BERT/SLM
+        Generator: Realtime ASR/BERT/SLM for one segment of one session
+        Yields log messages, then the segment result (and WARNING if triggered)
+        text: transcript already computed by a batched ASR pass (skip Whisper)
+        defer_slm: yield an "slm_request" instead of blocking on the SLM
         """
-        self.reset_state()
-        print(f"Hybrid Streaming: {audio_path}")
-        
-        # 1. Load audio
-        y, sr = librosa.load(audio_path, sr=SAMPLE_RATE)
-        duration = librosa.get_duration(y=y, sr=sr)
-        print(f"   - Duration: {duration:.1f}s")
-        
-        # 2. Use Pre-computed Diarization (from cache)
-        diarization_result = self.diarization_cache.get(os.path.basename(audio_path)) # Use basename for cache key
-        if not diarization_result:
-            print(f"No cache found for {os.path.basename(audio_path)}. Computing now...")
-
-            diarization_result = self.precompute_diarization(audio_path)
-            if not diarization_result:
-                print("   Error: No diarization segments found!")
+        return self._run_steps(self._segment_steps(
+            session, speech_audio, start_time, end_time, speaker, role, text, defer_slm
+        ))
+    
+    def process_segment_async(self, session, speech_audio, start_time, end_time, speaker, role, text=None,
+                              defer_slm=False):
+        """Async generator version of process_segment (model calls don't block the event loop)"""
+        return self._arun_steps(self._segment_steps(
+            session, speech_audio, start_time, end_time, speaker, role, text, defer_slm
+        ))
+    
+    def _run_steps(self, steps):
+        """Drive _segment_steps, running model calls inline"""
+        value = None
+        while True:
+            try:
+                item = steps.send(value)
+            except StopIteration:
                 return
-        caller_speaker = self.identify_caller(diarization_result)
-        print(f"   - Caller: {caller_speaker}")
-
-        stream_start_time = time.time()
-        print(f"   Real-time streaming started...")
+            value = None
+            if isinstance(item, ModelCall):
+                value = getattr(self, item.method)(*item.args)
+            else:
+                yield item
+    
+    async def _arun_steps(self, steps):
+        """Drive _segment_steps, awaiting model calls (the steps between them are cheap)"""
+        value = None
+        while True:
+            try:
+                item = steps.send(value)
+            except StopIteration:
+                return
+            value = None
+            if isinstance(item, ModelCall):
+                method = getattr(self, f"{item.method}_async", None)
+                if method is not None:
+                    value = await method(*item.args)
+                else:
+                    value = await self.run_blocking(getattr(self, item.method), *item.args)
+            else:
+                yield item
+    
+    def _segment_steps(self, session, speech_audio, start_time, end_time, speaker, role, text, defer_slm):
+        """
+        Body of process_segment: yields messages, and ModelCall wherever a model
+        runs (the driver sends back the result)
+        """
+        # Send Log: Start Processing
+        yield {
+            "type": "log",
+            "step": "PROCESS",
+            "message": f"Processing segment {session.segment_count + 1} ({start_time:.1f}s - {end_time:.1f}s)...",
+            "timestamp": time.time()
+        }
         
-        # Iterate segments
-        for seg in diarization_result: # Iterate over the list of dicts
-            start_time = seg["start"]
-            end_time = seg["end"]
-            speaker = seg["speaker"]
-
-
-            if simulate_realtime:
-                elapsed = time.time() - stream_start_time
-                wait_time = end_time - elapsed  # Wait until END not START
-                if wait_time > 0:
-                    time.sleep(wait_time)
-            
-            # Send Log: Start Processing
+        if len(speech_audio) < SAMPLE_RATE * 0.3:
             yield {
-                "type": "log",
-                "step": "PROCESS",
-                "message": f"Processing segment {self.segment_count + 1} ({start_time:.1f}s - {end_time:.1f}s)...",
+                "type": "log", 
+                "step": "SKIP", 
+                "message": "Segment too short, skipping...",
                 "timestamp": time.time()
             }
-            
-            # Extract audio segment
-            start_sample = int(start_time * SAMPLE_RATE)
-            end_sample = int(end_time * SAMPLE_RATE)
-            speech_audio = y[start_sample:end_sample]
+            return
+        
+        # ========== VOICEPRINT (first turn of each speaker, before ASR) ==========
+        if speaker not in session.voiceprint_checked and self.voiceprints is not None:
+            session.voiceprint_checked.add(speaker)
+            match = yield ModelCall("match_voiceprint", speech_audio)
+            if match is not None:
+                session.known_scammer = dict(match, speaker=speaker)
+                if not session.roles.locked:
+                    session.roles.lock(speaker, match["similarity"])
+                print(f"   - [{session.call_id[:8]}] Known scammer voice: {speaker} = {match['id']} "
+                      f"({match['similarity']:.0%})")
+                yield {
+                    "type": "log",
+                    "step": "VOICE",
+                    "message": f"🚩 Known scammer voice: {match['id']} ({match['similarity']:.0%})",
+                    "timestamp": time.time()
+                }
+                voiceprint = self.voiceprint_result(start_time, end_time, speaker, match)
+                self.record(session, voiceprint)
+                yield voiceprint
+        
+        # ========== REALTIME: VAD ==========
+        if text is None and self.vad is not None:
+            segment_seconds = len(speech_audio) / SAMPLE_RATE
+            speech_audio = yield ModelCall("gate_speech", session, speech_audio)
+            speech_seconds = len(speech_audio) / SAMPLE_RATE
             
             if len(speech_audio) < SAMPLE_RATE * 0.3:
                 yield {
-                    "type": "log", 
-                    "step": "SKIP", 
-                    "message": "Segment too short, skipping...",
+                    "type": "log",
+                    "step": "VAD",
+                    "message": f"No speech in {segment_seconds:.1f}s, skipping ASR...",
                     "timestamp": time.time()
                 }
-                continue
+                return
             
-            # ========== REALTIME: ASR ==========
+            if speech_seconds < segment_seconds:
+                yield {
+                    "type": "log",
+                    "step": "VAD",
+                    "message": f"Speech {speech_seconds:.1f}s of {segment_seconds:.1f}s",
+                    "timestamp": time.time()
+                }
+        
+        # ========== REALTIME: ASR ==========
+        yield {
+            "type": "log",
+            "step": "ASR",
+            "message": "Running Whisper ASR...",
+            "timestamp": time.time()
+        }
+        
+        if text is None:
+            text = yield ModelCall("transcribe", speech_audio)
+        
+        if not text:
             yield {
                 "type": "log",
                 "step": "ASR",
-                "message": "Running Whisper ASR...",
+                "message": "ASR returned empty text.",
                 "timestamp": time.time()
             }
-            
-            text = self.transcribe(speech_audio)
-            
-            if not text:
+            return
+
+        yield {
+            "type": "log",
+            "step": "ASR",
+            "message": f"Transcribed: \"{text}\"",
+            "timestamp": time.time()
+        }
+        
+        # ========== CALLER ID (early turns only, until the roles lock) ==========
+        if role is None:
+            roles = session.roles
+            was_locked = roles.locked
+            if roles.needs_score(speaker, start_time):
+                score = yield ModelCall("score_caller", text)
+                roles.add(speaker, start_time, score)
+            role = roles.role(speaker)
+            if roles.locked and not was_locked:
+                print(f"   - [{session.call_id[:8]}] Caller: {roles.caller} ({roles.confidence:.0%})")
                 yield {
                     "type": "log",
-                    "step": "ASR",
-                    "message": "ASR returned empty text.",
+                    "step": "CALLER",
+                    "message": f"🎯 Caller: {roles.caller} ({roles.confidence:.0%})",
                     "timestamp": time.time()
                 }
-                continue
-
+        
+        session.segment_count += 1
+        
+        result = {
+            "type": "result", # Mark as normal result
+            "start": start_time,
+            "end": end_time,
+            "speaker": speaker,
+            "text": text,
+            "status": "SAFE",
+            "role": role,
+            "reason": "",
+            "confidence": 0,
+            "role_locked": session.roles.locked
+        }
+        
+        # ========== REALTIME: BERT (Scam Detection) ==========
+        pending_warning = None
+        
+        if role == "CALLER":
+            # Show input text being analyzed
+            short_text = text[:40] + "..." if len(text) > 40 else text
             yield {
                 "type": "log",
-                "step": "ASR",
-                "message": f"Transcribed: \"{text}\"",
+                "step": "BERT",
+                "message": f"📝 New: \"{short_text}\"",
                 "timestamp": time.time()
             }
             
-            self.segment_count += 1
-            
-            # Set role
-            role = "CALLER" if speaker == caller_speaker else "RECEIVER"
-            
-            result = {
-                "type": "result", # Mark as normal result
-                "start": start_time,
-                "end": end_time,
-                "speaker": speaker,
-                "text": text,
-                "status": "SAFE",
-                "role": role,
-                "reason": "",
-                "confidence": 0
-            }
-            
-            # ========== REALTIME: BERT (Scam Detection) ==========
-            pending_warning = None
-            
-            if role == "CALLER":
-                # Show input text being analyzed
-                short_text = text[:40] + "..." if len(text) > 40 else text
+            # Show context (memory)
+            if session.suspicious_memory:
                 yield {
                     "type": "log",
                     "step": "BERT",
-                    "message": f"📝 New: \"{short_text}\"",
+                    "message": f"⚠️ History: {len(session.suspicious_memory)} suspicious",
                     "timestamp": time.time()
                 }
-                
-                # Show context (memory)
-                if self.suspicious_memory:
-                    yield {
-                        "type": "log",
-                        "step": "BERT",
-                        "message": f"⚠️ History: {len(self.suspicious_memory)} suspicious",
-                        "timestamp": time.time()
-                    }
-                if self.recent_memory:
+            if session.recent_memory:
+                yield {
+                    "type": "log",
+                    "step": "BERT",
+                    "message": f"💬 Context: {len(session.recent_memory)} recent msgs",
+                    "timestamp": time.time()
+                }
+            
+            # Keyword pre-filter: clearly benign turns skip BERT
+            matches = self.prefilter.scan(text)
+            result["matched_phrases"] = [m["phrase"] for m in matches]
+            
+            if self.prefilter.should_escalate(matches, session):
+                if matches:
                     yield {
                         "type": "log",
                         "step": "BERT",
-                        "message": f"💬 Context: {len(self.recent_memory)} recent msgs",
+                        "message": f"🔎 Keywords: {', '.join(result['matched_phrases'][:3])}",
                         "timestamp": time.time()
                     }
                 
-                status, confidence, context = self.detect_scam(text)
+                status, confidence, context = yield ModelCall("detect_scam", text, session)
                 
                 # Show results
                 status_emoji = "🚨" if status == "SCAM" else ("⚠️" if status == "WAIT" else "✅")
@@ -390,38 +694,55 @@ class HybridPipeline:
                     "message": f"{status_emoji} {status} ({confidence:.0%})",
                     "timestamp": time.time()
                 }
+            else:
+                status, confidence = "SAFE", 0.0
+                yield {
+                    "type": "log",
+                    "step": "BERT",
+                    "message": "✅ No scam keywords, BERT skipped",
+                    "timestamp": time.time()
+                }
+            
+            result["status"] = status
+            result["confidence"] = confidence
+            
+            # If BERT detects SCAM
+            if status == "SCAM":
+                result["reason"] = "ตรวจพบพฤติกรรมน่าสงสัย"  # Default message
                 
-                result["status"] = status
-                result["confidence"] = confidence
+                session.scam_count += 1
+                session.scam_messages.append(text)
+                print(f"   - [{session.call_id[:8]}] SCAM #{session.scam_count}: {text[:50]}...")
+
+                yield {
+                    "type": "log",
+                    "step": "BERT",
+                    "message": f"🔴 SCAM #{session.scam_count}/3",
+                    "timestamp": time.time()
+                }
                 
-                # If BERT detects SCAM
-                if status == "SCAM":
-                    result["reason"] = "ตรวจพบพฤติกรรมน่าสงสัย"  # Default message
-                    
-                    self.scam_count += 1
-                    self.scam_messages.append(text)
-                    print(f"   - SCAM #{self.scam_count}: {text[:50]}...")
+                if session.scam_count >= 3 and not session.warning_sent:
+                    session.warning_sent = True
+                    print(f"   - [{session.call_id[:8]}] SCAM detected 3 times! Sending to SLM...")
 
                     yield {
                         "type": "log",
-                        "step": "BERT",
-                        "message": f"🔴 SCAM #{self.scam_count}/3",
+                        "step": "SLM",
+                        "message": " Sending context to Qwen SLM for advice...",
                         "timestamp": time.time()
                     }
                     
-                    if self.scam_count >= 3 and not self.warning_sent:
-                        self.warning_sent = True
-                        print("   - SCAM detected 3 times! Sending to SLM...")
-
-                        yield {
-                            "type": "log",
-                            "step": "SLM",
-                            "message": " Sending context to Qwen SLM for advice...",
-                            "timestamp": time.time()
+                    if defer_slm:
+                        # Caller runs the SLM asynchronously (and streams it); keep going
+                        pending_warning = {
+                            "type": "slm_request",
+                            "kind": "warning",
+                            "start": result["start"],
+                            "end": result["end"],
+                            "scam_messages": list(session.scam_messages)
                         }
-                        
-
-                        warning_advice = self.generate_warning_advice()
+                    else:
+                        warning_advice = yield ModelCall("generate_warning_advice", session)
                         
                         yield {
                             "type": "log",
@@ -430,40 +751,267 @@ class HybridPipeline:
                             "timestamp": time.time()
                         }
                         
-                        pending_warning = {
-                            "type": "result",
-                            "start": result["start"],
-                            "end": result["end"],
-                            "speaker": "SYSTEM",
-                            "text": "",
-                            "status": "WARNING",
-                            "role": "SYSTEM",
-                            "reason": warning_advice,
-                            "confidence": 1.0,
-                            "is_warning": True
-                        }
-                
-                self.update_memory(text, status, confidence)
+                        pending_warning = self.warning_result(result["start"], result["end"], warning_advice)
             
-            # Send segment first
-            yield result
+            session.update_memory(text, status, confidence)
+        
+        SEGMENTS.labels(status=result["status"]).inc()
+        
+        # Send segment first
+        self.record(session, result)
+        yield result
+        
+        # Send WARNING after segment (if exists; a deferred one is recorded once the SLM answers)
+        if pending_warning:
+            if pending_warning["type"] == "result":
+                self.record(session, pending_warning)
+            yield pending_warning
+    
+    def process_utterance(self, session, audio, start_time, defer_slm=False):
+        """
+        Generator: one live utterance -> online diarization -> process_segment per speaker turn
+        Roles come from the caller-identifier scores of each speaker's first turns
+        """
+        if session.speakers is None:
+            session.speakers = self.online_diarizer.new_speakers()
+        
+        with stage("diarization"):
+            segments = self.online_diarizer.segment_utterance(audio, start_time, session.speakers)
+        for seg in segments:
+            lo = int((seg["start"] - start_time) * SAMPLE_RATE)
+            hi = int((seg["end"] - start_time) * SAMPLE_RATE)
+            yield from self.process_segment(
+                session, audio[lo:hi], seg["start"], seg["end"], seg["speaker"], None,
+                defer_slm=defer_slm
+            )
+    
+    async def process_utterance_async(self, session, audio, start_time, defer_slm=False):
+        """Async generator version of process_utterance (diarization runs on the executor)"""
+        if session.speakers is None:
+            session.speakers = self.online_diarizer.new_speakers()
+        
+        with stage("diarization"):
+            segments = await self.run_blocking(
+                self.online_diarizer.segment_utterance, audio, start_time, session.speakers
+            )
+        for seg in segments:
+            lo = int((seg["start"] - start_time) * SAMPLE_RATE)
+            hi = int((seg["end"] - start_time) * SAMPLE_RATE)
+            async for event in self.process_segment_async(
+                session, audio[lo:hi], seg["start"], seg["end"], seg["speaker"], None,
+                defer_slm=defer_slm
+            ):
+                yield event
+    
+    def load_audio(self, audio_path):
+        """
+        Mono SAMPLE_RATE float32 waveform of a file. With the audio store it is
+        decoded once and memory-mapped: repeat sessions start without decoding,
+        and segment slices are views of the shared mapping.
+        """
+        with stage("audio_load"):
+            if self.audio_store is not None:
+                return self.audio_store.load(audio_path)
+            import librosa
+            y, _ = librosa.load(audio_path, sr=SAMPLE_RATE)
+        return y
+    
+    def run_hybrid_streaming(self, audio_path: str, simulate_realtime=True, session=None, defer_slm=False,
+                             audio=None, cache_diarization=True):
+        """
+        Generator: Use Pre-computed Diarization + Realtime ASR/BERT/SLM
+        (or online diarization when DIARIZATION_MODE=online: no whole-file pass first)
+        Each call gets its own CallSession, so concurrent calls don't share memory
+        audio: the file already decoded to mono SAMPLE_RATE float32 (e.g. by a decode pool)
+        cache_diarization: False skips the diarization cache (see precompute_diarization)
+        """
+        if session is None:
+            session = self.new_session()
+        print(f"Hybrid Streaming [{session.call_id[:8]}]: {audio_path}")
+        
+        # 1. Load audio
+        y = self.load_audio(audio_path) if audio is None else audio
+        
+        # 2. Diarization
+        diarization_result = self.diarize_call(session, audio_path, y, materialize=not simulate_realtime,
+                                               use_cache=cache_diarization)
+        if diarization_result is None:
+            return
+        
+        # Not paced by playback: transcribe every segment up front in batches
+        transcripts = itertools.repeat(None)
+        if not simulate_realtime:
+            # "" (not None) marks an empty transcript so it isn't re-run
+            transcripts = [t or "" for t in self.transcribe_many(
+                self.speech_chunks(session, y, diarization_result)
+            )]
+            # ...and settle the roles with one batched caller-identifier pass
+            self.prime_roles(session, diarization_result, transcripts)
+
+        stream_start_time = time.time()
+        print("   Real-time streaming started...")
+        
+        # Iterate segments
+        for seg, transcript in zip(diarization_result, transcripts): # Iterate over the list of dicts
+            if simulate_realtime:
+                wait_time = self._playback_wait(seg, time.time() - stream_start_time)
+                if wait_time > 0:
+                    time.sleep(wait_time)
             
-            # Send WARNING after segment (if exists)
-            if pending_warning:
-                yield pending_warning
+            yield from self.process_segment(
+                session, self._segment_audio(y, seg), seg["start"], seg["end"], seg["speaker"], None,
+                text=transcript, defer_slm=defer_slm
+            )
             
             # No delay needed after process because we waited before process
         
-        print("Hybrid Streaming Complete!")
+        self._log_summary(session)
+    
+    async def run_hybrid_streaming_async(self, audio_path: str, simulate_realtime=True, session=None,
+                                         defer_slm=False, audio=None, cache_diarization=True):
+        """
+        Async generator version of run_hybrid_streaming for the event loop.
+        Pacing uses asyncio timers and only model calls leave the loop: batched
+        models (ASR, classifier) are awaited as futures, VAD / diarization /
+        decoding run on the pipeline executor. A call waiting for playback
+        holds no thread, so concurrent calls are bounded by compute.
+        """
+        if session is None:
+            session = self.new_session()
+        print(f"Hybrid Streaming [{session.call_id[:8]}]: {audio_path}")
+        
+        # 1. Load audio
+        y = await self.run_blocking(self.load_audio, audio_path) if audio is None else audio
+        
+        # 2. Diarization (streamed online segments are pulled one at a time on the executor below)
+        diarization_result = await self.run_blocking(
+            self.diarize_call, session, audio_path, y, not simulate_realtime, cache_diarization
+        )
+        if diarization_result is None:
+            return
+        
+        transcripts = None
+        if not simulate_realtime:
+            chunks = await self.run_blocking(self.speech_chunks, session, y, diarization_result)
+            with stage("asr_recording"):
+                transcripts = [t or "" for t in await self.asr_engine.transcribe_many_async(chunks)]
+            await self.prime_roles_async(session, diarization_result, transcripts)
+        
+        loop = asyncio.get_running_loop()
+        stream_start_time = loop.time()
+        print("   Real-time streaming started...")
+        
+        index = 0
+        while True:
+            if isinstance(diarization_result, list):
+                if index >= len(diarization_result):
+                    break
+                seg = diarization_result[index]
+            else:
+                seg = await self.run_blocking(next, diarization_result, None)
+                if seg is None:
+                    break
+            transcript = transcripts[index] if transcripts is not None else None
+            index += 1
+            
+            if simulate_realtime:
+                wait_time = self._playback_wait(seg, loop.time() - stream_start_time)
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+            
+            async for event in self.process_segment_async(
+                session, self._segment_audio(y, seg), seg["start"], seg["end"], seg["speaker"], None,
+                text=transcript, defer_slm=defer_slm
+            ):
+                yield event
+        
+        self._log_summary(session)
+    
+    # ---------- shared by run_hybrid_streaming and run_hybrid_streaming_async ----------
+    
+    def diarize_call(self, session, audio_path, y, materialize, use_cache=True):
+        """
+        Blocking: the call's diarization segments, or None when there are none.
+        Online mode yields them while "listening" (a lazy iterator), unless
+        `materialize` (not paced by playback) asks for the full list.
+        """
+        print(f"   - Duration: {len(y) / SAMPLE_RATE:.1f}s")
+        if DIARIZATION_CONFIG["MODE"] == "online":
+            session.speakers = self.online_diarizer.new_speakers()
+            segments = timed_iter("diarization", self.online_diarizer.stream(y, session.speakers))
+            return list(segments) if materialize else segments
+        
+        # Use Pre-computed Diarization (from cache, computed now if missing)
+        segments = self.precompute_diarization(audio_path, audio=y, use_cache=use_cache)
+        if not segments:
+            print("   Error: No diarization segments found!")
+            return None
+        return segments
+    
+    @staticmethod
+    def _playback_wait(seg, elapsed):
+        """Seconds to wait before a segment is due: its END, not START (online: when the diarizer could emit it)"""
+        return max(seg["end"], seg.get("available_at", seg["end"])) - elapsed
+    
+    @staticmethod
+    def _segment_audio(y, seg):
+        return y[int(seg["start"] * SAMPLE_RATE):int(seg["end"] * SAMPLE_RATE)]
+    
+    def _log_summary(self, session):
+        if self.vad is not None:
+            stats = session.vad_stats()
+            print(f"   - VAD: ASR ran on {stats['speech_seconds']:.1f}s of {stats['audio_seconds']:.1f}s "
+                  f"(saved {stats['asr_seconds_saved']:.1f}s)")
+        if session.known_scammer:
+            print(f"   - Known scammer voice: {session.known_scammer['speaker']} = {session.known_scammer['id']}")
+        prefilter_stats = self.prefilter.stats()
+        print(f"   - Pre-filter: {prefilter_stats['skip_rate']:.0%} of caller turns skipped BERT "
+              f"({prefilter_stats['skipped']}/{prefilter_stats['scanned']}, all sessions)")
+        print(f"Hybrid Streaming Complete! [{session.call_id[:8]}]")
+
+
+def diarization_segments(diarization_output):
+    """Pyannote output -> [{start, end, speaker}, ...] (None if no annotation found)"""
+    # Extract annotation
+    annotation = None
+    if hasattr(diarization_output, "itertracks"):
+        annotation = diarization_output
+    elif hasattr(diarization_output, "annotation"):
+        annotation = diarization_output.annotation
+    else:
+        for attr in dir(diarization_output):
+            if attr.startswith("_"):
+                continue
+            val = getattr(diarization_output, attr)
+            if hasattr(val, "itertracks"):
+                annotation = val
+                break
+    
+    if not annotation:
+        return None
+    
+    # Create segments list
+    segments = []
+    for turn, _, speaker in annotation.itertracks(yield_label=True):
+        segments.append({
+            "start": turn.start,
+            "end": turn.end,
+            "speaker": speaker
+        })
+    return segments
 
 
 # Singleton instance
 _pipeline_instance = None
+_pipeline_lock = threading.Lock()
 
 def get_hybrid_pipeline():
     global _pipeline_instance
     if _pipeline_instance is None:
-        _pipeline_instance = HybridPipeline()
+        # Concurrent first connections must not load the models twice
+        with _pipeline_lock:
+            if _pipeline_instance is None:
+                _pipeline_instance = HybridPipeline()
     return _pipeline_instance
 
 def precompute_audio(audio_path):
@@ -0,0 +1,156 @@
+"""
+Keyword pre-filter in front of the BERT scam classifier.
+
+All lexicon phrases are matched in one pass over the transcript with an
+Aho-Corasick automaton (Thai has no word boundaries, so matching is done on
+characters after removing whitespace). Turns with no match and no suspicious
+history skip BERT; everything else is escalated with the matched phrases
+attached.
+"""
+import re
+import threading
+from collections import deque
+from app.config import PREFILTER_CONFIG
+
+# category -> phrases (matched after normalize())
+SCAM_LEXICON = {
+    "authority_impersonation": [
+        "ตำรวจ", "ตำรวจไซเบอร์", "สถานีตำรวจ", "ดีเอสไอ", "dsi", "กรมสอบสวนคดีพิเศษ",
+        "ปปง", "ป.ป.ง.", "หมายจับ", "หมายเรียก", "อัยการ", "ศาล", "สรรพากร", "กสทช",
+    ],
+    "money_transfer": [
+        "โอนเงิน", "โอนมา", "โอนเข้า", "บัญชีปลอดภัย", "บัญชีตรวจสอบ", "ตรวจสอบเงิน",
+        "ชำระเงิน", "ค่าธรรมเนียม", "ค่าปรับ", "พร้อมเพย์", "เลขบัญชี", "วางเงินประกัน",
+    ],
+    "account_freeze": [
+        "อายัด", "ระงับบัญชี", "บัญชีถูก", "ฟอกเงิน", "บัญชีม้า", "ถูกแฮก", "ถูกระงับ", "บัญชีของคุณ",
+    ],
+    "parcel_customs": [
+        "พัสดุ", "ศุลกากร", "ของผิดกฎหมาย", "ไปรษณีย์", "ยาเสพติด", "กล่องพัสดุ",
+    ],
+    "credentials": [
+        "otp", "รหัสผ่าน", "เลขบัตรประชาชน", "ติดตั้งแอป", "ลิงก์", "ลิ้งค์", "กดลิงก์", "สแกนใบหน้า",
+    ],
+    "urgency_secrecy": [
+        "ด่วน", "ภายในวันนี้", "ห้ามบอกใคร", "ห้ามวางสาย", "เป็นความลับ", "ถูกดำเนินคดี",
+    ],
+    "bank_impersonation": [
+        "เจ้าหน้าที่ธนาคาร", "ธนาคาร", "บัตรเครดิต", "สินเชื่อ", "คืนเงิน",
+    ],
+}
+
+_STRIP = re.compile(r"[\s\u200b\u200c\u200d\ufeff]+")
+
+
+def normalize(text):
+    """Lowercase and drop whitespace / zero-width chars (ASR spacing is unreliable in Thai)"""
+    return _STRIP.sub("", text.lower())
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every phrase"""
+    def __init__(self, patterns):
+        # patterns: {phrase: payload}
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        
+        for phrase, payload in patterns.items():
+            node = 0
+            for ch in phrase:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((phrase, payload))
+        
+        # Breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+    
+    def find(self, text):
+        """Yield (end_index, phrase, payload) for every occurrence"""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for phrase, payload in self.out[node]:
+                yield i, phrase, payload
+
+
+class KeywordPrefilter:
+    def __init__(self, lexicon=None):
+        lexicon = lexicon or SCAM_LEXICON
+        patterns = {}
+        for category, phrases in lexicon.items():
+            for phrase in phrases:
+                patterns[normalize(phrase)] = (category, phrase)
+        self.automaton = AhoCorasick(patterns)
+        
+        self._lock = threading.Lock()
+        self.scanned = 0
+        self.skipped = 0
+        self.escalated = 0
+        self.category_hits = {category: 0 for category in lexicon}
+    
+    def scan(self, text):
+        """Return matched phrases [{"phrase", "category"}, ...] (each phrase once)"""
+        seen = set()
+        matches = []
+        for _, _, (category, phrase) in self.automaton.find(normalize(text)):
+            if phrase not in seen:
+                seen.add(phrase)
+                matches.append({"phrase": phrase, "category": category})
+        return matches
+    
+    def should_escalate(self, matches, session=None):
+        """
+        Escalation policy (PREFILTER_CONFIG["MODE"]):
+          gate:   skip BERT only when nothing matched and the call has no suspicious history
+          shadow: always run BERT, but count what gate mode would have skipped
+          off:    always run BERT
+        """
+        mode = PREFILTER_CONFIG["MODE"]
+        escalate = (
+            len(matches) >= PREFILTER_CONFIG["MIN_MATCHES"]
+            or (
+                PREFILTER_CONFIG["ESCALATE_WITH_HISTORY"]
+                and session is not None
+                and (session.suspicious_memory or session.scam_count)
+            )
+        )
+        
+        with self._lock:
+            self.scanned += 1
+            if escalate:
+                self.escalated += 1
+            else:
+                self.skipped += 1
+            for m in matches:
+                self.category_hits[m["category"]] += 1
+        
+        return escalate or mode != "gate"
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": PREFILTER_CONFIG["MODE"],
+                "scanned": self.scanned,
+                "skipped": self.skipped,
+                "escalated": self.escalated,
+                "skip_rate": (self.skipped / self.scanned) if self.scanned else 0.0,
+                "category_hits": dict(self.category_hits),
+            }
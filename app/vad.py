@@ -0,0 +1,59 @@
+import queue
+import threading
+import numpy as np
+from app.config import SAMPLE_RATE, VAD_CONFIG
+
+
+class SpeechGate:
+    """
+    Silero VAD in front of ASR: trims silence, breathing and hold music from
+    a segment so Whisper only sees speech.
+    Silero keeps recurrent state, so each concurrent caller borrows its own
+    copy from a small pool (the model is ~2MB).
+    """
+    def __init__(self, pool_size=None):
+        from silero_vad import load_silero_vad, get_speech_timestamps
+        self._get_speech_timestamps = get_speech_timestamps
+        
+        self._pool = queue.Queue()
+        for _ in range(pool_size or VAD_CONFIG["POOL_SIZE"]):
+            self._pool.put(load_silero_vad())
+        
+        self._stats_lock = threading.Lock()
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+    
+    def trim(self, audio):
+        """Return (speech-only audio, seconds of speech)"""
+        import torch
+        
+        model = self._pool.get()
+        try:
+            timestamps = self._get_speech_timestamps(
+                torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)),
+                model,
+                sampling_rate=SAMPLE_RATE,
+                threshold=VAD_CONFIG["THRESHOLD"],
+                min_silence_duration_ms=VAD_CONFIG["MIN_SILENCE_MS"],
+                speech_pad_ms=VAD_CONFIG["SPEECH_PAD_MS"],
+            )
+        finally:
+            self._pool.put(model)
+        
+        if timestamps:
+            speech = np.concatenate([audio[t["start"]:t["end"]] for t in timestamps])
+        else:
+            speech = audio[:0]
+        
+        with self._stats_lock:
+            self.audio_seconds += len(audio) / SAMPLE_RATE
+            self.speech_seconds += len(speech) / SAMPLE_RATE
+        return speech, len(speech) / SAMPLE_RATE
+    
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "audio_seconds": self.audio_seconds,
+                "speech_seconds": self.speech_seconds,
+                "asr_seconds_saved": self.audio_seconds - self.speech_seconds,
+            }
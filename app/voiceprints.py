@@ -0,0 +1,254 @@
+"""
+Known-scammer voiceprint index.
+
+Speaker embeddings of confirmed scam callers, searched with an inverted-file
+(IVF) index built in NumPy. An index is a directory:
+
+    centroids.npy  (n_lists, dim)    spherical k-means centroids
+    offsets.npy    (n_lists + 1,)    list i is rows offsets[i]:offsets[i + 1]
+    vectors.npy    (n, dim) float32  unit-norm prints, grouped by list
+    ids.npy        (n,)              case id of each print (UTF-8, as wide as the longest)
+
+vectors.npy and ids.npy are opened with np.load(mmap_mode="r"): workers
+share the page cache, and a lookup only reads the N_PROBE lists whose
+centroids are closest to the query (contiguous slices, no copy).
+
+    # Build from embeddings (one row per print) and case ids (one per line)
+    python -m app.voiceprints build prints.npy ids.txt
+
+    # Add confirmed callers from recordings (embedded with the diarization model)
+    python -m app.voiceprints enroll CASE-0192 call_0192.wav --start 0 --end 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import uuid
+import numpy as np
+from app.config import SAMPLE_RATE, VOICEPRINT_CONFIG
+
+_CHUNK = 65536
+
+
+def _encode_ids(ids):
+    """Case ids -> fixed-width UTF-8 bytes sized to the longest id (Thai ids included, never truncated)"""
+    encoded = [str(case_id).encode("utf-8") for case_id in ids]
+    for case_id, raw in zip(ids, encoded):
+        # NumPy strips trailing NULs from bytes fields, which would change the id
+        if not raw or raw.endswith(b"\0"):
+            raise ValueError(f"invalid case id: {case_id!r}")
+    return np.array(encoded, dtype=f"S{max(len(raw) for raw in encoded)}")
+
+
+def _normalize(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    return rows / np.maximum(norms, 1e-12)
+
+
+def _assign(vectors, centroids):
+    """Index of the closest centroid per row (chunked, so memmaps stay out of RAM)"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for i in range(0, len(vectors), _CHUNK):
+        labels[i:i + _CHUNK] = np.argmax(_normalize(vectors[i:i + _CHUNK]) @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(sample, n_lists, iterations=10, seed=0):
+    """Spherical k-means on unit-norm rows"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        used, starts = np.unique(labels[order], return_index=True)
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        centroids[used] = _normalize(sums)
+        # Empty lists restart from random prints
+        empty = np.setdiff1d(np.arange(n_lists), used)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+def build_index(directory, vectors, ids, n_lists=None, iterations=10, seed=0):
+    """
+    Write an index for `vectors` (n, dim; may be a memmap) and `ids` (n,).
+    It is written next to `directory` and swapped in when complete.
+    """
+    n = len(vectors)
+    if n == 0 or len(ids) != n:
+        raise ValueError(f"need one id per print ({n} prints, {len(ids)} ids)")
+    n_lists = n_lists or VOICEPRINT_CONFIG["N_LISTS"] or max(1, int(np.sqrt(n)))
+    n_lists = min(n_lists, n)
+    encoded_ids = _encode_ids(ids)
+
+    rng = np.random.default_rng(seed)
+    sample_size = min(n, max(n_lists * 40, 10000))
+    sample_rows = np.sort(rng.choice(n, sample_size, replace=False))
+    centroids = train_centroids(_normalize(vectors[sample_rows]), n_lists, iterations, seed)
+
+    labels = _assign(vectors, centroids)
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(labels, minlength=n_lists))
+
+    tmp_dir = f"{directory.rstrip(os.sep)}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_dir)
+    out = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                    dtype=np.float32, shape=(n, vectors.shape[1]))
+    for i in range(0, n, _CHUNK):
+        rows = order[i:i + _CHUNK]
+        out[i:i + len(rows)] = _normalize(vectors[rows])
+    out.flush()
+    del out
+    np.save(os.path.join(tmp_dir, "ids.npy"), encoded_ids[order])
+    np.save(os.path.join(tmp_dir, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+
+    old_dir = f"{directory.rstrip(os.sep)}.{uuid.uuid4().hex}.old"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return directory
+
+
+class VoiceprintIndex:
+    """Read side of an index directory (see module docstring)"""
+    def __init__(self, directory, n_probe=None):
+        self.directory = directory
+        self.n_probe = n_probe or VOICEPRINT_CONFIG["N_PROBE"]
+        self.centroids = np.load(os.path.join(directory, "centroids.npy"))
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode="r")
+
+    @classmethod
+    def load(cls, directory=None, n_probe=None):
+        """The index in `directory`, or None when none has been built"""
+        directory = directory or VOICEPRINT_CONFIG["DIR"]
+        if not os.path.exists(os.path.join(directory, "offsets.npy")):
+            return None
+        return cls(directory, n_probe)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def search(self, query, k=1, n_probe=None):
+        """[(case id, cosine similarity)] of the k closest prints in the n_probe nearest lists"""
+        query = _normalize(query).reshape(-1)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+
+        rows, sims = [], []
+        for lst in lists:
+            lo, hi = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if hi == lo:
+                continue
+            list_sims = self.vectors[lo:hi] @ query
+            top = np.argpartition(-list_sims, min(k, hi - lo) - 1)[:k]
+            rows.append(top + lo)
+            sims.append(list_sims[top])
+        if not rows:
+            return []
+
+        rows, sims = np.concatenate(rows), np.concatenate(sims)
+        best = np.argsort(-sims)[:k]
+        return [(self.ids[rows[i]].decode("utf-8"), float(sims[i])) for i in best]
+
+    def exact_search(self, query, k=1):
+        """Brute force over every print (the recall reference for search)"""
+        query = _normalize(query).reshape(-1)
+        best_rows, best_sims = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for i in range(0, len(self.vectors), _CHUNK):
+            sims = self.vectors[i:i + _CHUNK] @ query
+            top = np.argpartition(-sims, min(k, len(sims)) - 1)[:k]
+            best_rows = np.concatenate([best_rows, top + i])
+            best_sims = np.concatenate([best_sims, sims[top]])
+        best = np.argsort(-best_sims)[:k]
+        return [(self.ids[best_rows[i]].decode("utf-8"), float(best_sims[i])) for i in best]
+
+
+class VoiceprintMatcher:
+    """Speaker embedding of a turn -> closest known scammer above THRESHOLD (or None)"""
+    def __init__(self, embed_fn, index, threshold=None, check_seconds=None):
+        self.embed_fn = embed_fn
+        self.index = index
+        self.threshold = VOICEPRINT_CONFIG["THRESHOLD"] if threshold is None else threshold
+        self.check_seconds = check_seconds or VOICEPRINT_CONFIG["CHECK_SECONDS"]
+
+    def match(self, audio):
+        embedding = np.asarray(self.embed_fn(audio[:int(SAMPLE_RATE * self.check_seconds)]), dtype=np.float32)
+        if not np.all(np.isfinite(embedding)) or not embedding.any():
+            return None
+        hits = self.index.search(embedding, k=1)
+        if not hits or hits[0][1] < self.threshold:
+            return None
+        case_id, similarity = hits[0]
+        return {"id": case_id, "similarity": similarity}
+
+
+# ---------- CLI ----------
+
+def _existing(directory):
+    index = VoiceprintIndex.load(directory)
+    if index is None:
+        return np.zeros((0, 0), dtype=np.float32), []
+    return np.asarray(index.vectors), [i.decode("utf-8") for i in index.ids]
+
+
+def _enroll(args):
+    from app.model_registry import get_registry
+    from app.online_diarization import make_embed_fn
+    from app.pipeline_hybrid import get_hybrid_pipeline
+
+    embed = make_embed_fn(get_registry().get("diarization"))
+    y = get_hybrid_pipeline().load_audio(args.audio)
+    lo = int(args.start * SAMPLE_RATE)
+    hi = int(args.end * SAMPLE_RATE) if args.end else len(y)
+    embedding = _normalize(embed(y[lo:hi]))[None, :]
+
+    vectors, ids = _existing(args.dir)
+    vectors = embedding if not len(vectors) else np.concatenate([vectors, embedding])
+    build_index(args.dir, vectors, ids + [args.id])
+    print(f"Enrolled {args.id}: {len(vectors)} voiceprints in {args.dir}")
+
+
+def _build(args):
+    vectors = np.load(args.vectors, mmap_mode="r")
+    with open(args.ids, encoding="utf-8") as f:
+        ids = [line.strip() for line in f if line.strip()]
+    build_index(args.dir, vectors, ids, n_lists=args.lists)
+    print(f"Indexed {len(ids)} voiceprints in {args.dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=VOICEPRINT_CONFIG["DIR"], help="index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index embeddings from a .npy file")
+    build.add_argument("vectors", help=".npy of shape (n, dim)")
+    build.add_argument("ids", help="text file with one case id per row of vectors")
+    build.add_argument("--lists", type=int, help="IVF lists (default: VOICEPRINT_N_LISTS or sqrt(n))")
+    build.set_defaults(func=_build)
+
+    enroll = commands.add_parser("enroll", help="add a confirmed scam caller from a recording")
+    enroll.add_argument("id", help="case id reported on a match")
+    enroll.add_argument("audio", help="recording with the caller's voice")
+    enroll.add_argument("--start", type=float, default=0.0, help="caller speech start (seconds)")
+    enroll.add_argument("--end", type=float, help="caller speech end (seconds)")
+    enroll.set_defaults(func=_enroll)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+WebSocket output formats, negotiated in the client's "start" message:
+
+    {"action": "start", "format": "msgpack", "verbosity": "segment"}
+
+format:
+  json     text frames (default)
+  msgpack  binary MessagePack frames; log timestamps are dropped and times
+           are rounded to milliseconds. Falls back to json when the msgpack
+           package isn't installed (the client can tell by the frame type)
+
+verbosity:
+  full     every log line as its own frame, as it happens (default)
+  segment  the log lines of a segment are sent as one frame just before its
+           result: {"type": "logs", "entries": [[step, message], ...]}
+  results  no log lines and no SLM tokens: results, warnings and status only
+
+READY / WARMING_UP are always JSON (they are sent before negotiation).
+"""
+import asyncio
+import json
+from app import metrics
+
+FORMATS = ("json", "msgpack")
+VERBOSITY = ("full", "segment", "results")
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def negotiate(start_msg):
+    """Start message -> (format, verbosity); unknown values get the defaults"""
+    fmt = start_msg.get("format", "json")
+    verbosity = start_msg.get("verbosity", "full")
+    if fmt not in FORMATS:
+        fmt = "json"
+    if fmt == "msgpack" and msgpack is None:
+        print("   msgpack is not installed, sending JSON")
+        fmt = "json"
+    if verbosity not in VERBOSITY:
+        verbosity = "full"
+    return fmt, verbosity
+
+
+def compact(message):
+    """Smaller copy of a message for the binary format"""
+    message = {key: value for key, value in message.items() if key != "timestamp"}
+    for key in ("start", "end"):
+        if isinstance(message.get(key), float):
+            message[key] = round(message[key], 3)
+    if isinstance(message.get("confidence"), float):
+        message["confidence"] = round(message["confidence"], 4)
+    return message
+
+
+class MessageWriter:
+    """
+    Send side of one connection: applies the negotiated format and verbosity.
+    Safe to call from the stream loop and background SLM tasks at once.
+    """
+    def __init__(self, websocket, fmt="json", verbosity="full"):
+        self.websocket = websocket
+        self.fmt = fmt
+        self.verbosity = verbosity
+        self._logs = []
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, message):
+        kind = message.get("type")
+        if kind == "log":
+            if self.verbosity == "full":
+                await self._send(message)
+            elif self.verbosity == "segment":
+                # A new segment starts: logs of a segment without a result go out now
+                if message.get("step") == "PROCESS" and self._logs:
+                    await self.flush()
+                self._logs.append([message.get("step"), message.get("message")])
+            return
+        if kind == "slm_token" and self.verbosity == "results":
+            return
+        await self.flush()
+        await self._send(message)
+
+    async def flush(self):
+        """Send the buffered log lines of the current segment (segment verbosity)"""
+        if self._logs:
+            logs, self._logs = self._logs, []
+            await self._send({"type": "logs", "entries": logs})
+
+    async def _send(self, message):
+        async with self._lock:
+            with metrics.stage("ws_send"):
+                if self.fmt == "msgpack":
+                    await self.websocket.send_bytes(msgpack.packb(compact(message), use_bin_type=True))
+                else:
+                    await self.websocket.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
@@ -0,0 +1 @@
+# Scam Guard - Benchmarks (run from repo root: python -m benchmarks.<name>)
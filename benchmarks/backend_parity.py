@@ -0,0 +1,121 @@
+"""
+Accuracy / latency parity: PyTorch vs ONNX Runtime (int8) backends.
+
+Classifiers (scam detector, caller identifier): label agreement, max score
+difference and per-text latency on the sample texts (or --texts file, one
+text per line).
+Whisper: character similarity of transcripts and per-segment latency on
+fixed-length chunks of the bundled recordings.
+
+    python -m benchmarks.backend_parity [--texts texts.txt] [--json parity.json]
+"""
+import argparse
+import difflib
+import glob
+import json
+import time
+
+import numpy as np
+
+from app.config import INFERENCE_CONFIG, MODEL_PATHS, SAMPLE_RATE
+from benchmarks.classifier_batching import SAMPLE_TEXTS
+
+
+def timed(fn, items):
+    outputs, latencies = [], []
+    for item in items:
+        t0 = time.perf_counter()
+        outputs.append(fn(item))
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    return outputs, latencies
+
+
+def summary(latencies):
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def classifier_parity(model_path, texts):
+    from app import backends
+    from app.classifier import BatchedTextClassifier
+    
+    results = {}
+    outputs = {}
+    for backend in ("torch", "onnx"):
+        INFERENCE_CONFIG["BACKEND"] = backend
+        tokenizer, model = backends.load_sequence_classifier(model_path, use_fast=False)
+        clf = BatchedTextClassifier(model, tokenizer, max_batch_size=1, max_wait_ms=0, name=f"parity-{backend}")
+        clf.classify(texts[0])  # warm-up
+        outputs[backend], latencies = timed(clf.classify, texts)
+        results[backend] = summary(latencies)
+    
+    agree = [a["label"] == b["label"] for a, b in zip(outputs["torch"], outputs["onnx"])]
+    diffs = [abs(a["score"] - b["score"]) for a, b in zip(outputs["torch"], outputs["onnx"])]
+    results["label_agreement"] = float(np.mean(agree))
+    results["max_score_diff"] = float(np.max(diffs))
+    return results
+
+
+def whisper_parity(files, chunk_seconds=5.0, max_chunks=20):
+    import librosa
+    from app import backends
+    from app.asr_engine import GENERATE_KWARGS
+    
+    chunks = []
+    for path in files:
+        y, _ = librosa.load(path, sr=SAMPLE_RATE)
+        step = int(chunk_seconds * SAMPLE_RATE)
+        chunks += [y[i:i + step] for i in range(0, len(y) - step, step)]
+    chunks = chunks[:max_chunks]
+    
+    results = {}
+    outputs = {}
+    for backend in ("torch", "onnx"):
+        INFERENCE_CONFIG["BACKEND"] = backend
+        asr = backends.load_asr()
+        asr.model.config.forced_decoder_ids = asr.tokenizer.get_decoder_prompt_ids(language="th", task="transcribe")
+        
+        def run(chunk):
+            return asr({"raw": chunk, "sampling_rate": SAMPLE_RATE},
+                       return_timestamps=False, generate_kwargs=GENERATE_KWARGS)["text"].strip()
+        
+        run(chunks[0])  # warm-up
+        outputs[backend], latencies = timed(run, chunks)
+        results[backend] = summary(latencies)
+    
+    similarity = [
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(outputs["torch"], outputs["onnx"])
+    ]
+    results["mean_char_similarity"] = float(np.mean(similarity))
+    results["min_char_similarity"] = float(np.min(similarity))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", help="Text file, one sample per line")
+    parser.add_argument("--audio", nargs="*", default=sorted(glob.glob("static/audio/*.wav")))
+    parser.add_argument("--skip-whisper", action="store_true")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    
+    report = {
+        "scam_detector": classifier_parity(MODEL_PATHS["SCAM_DETECTOR"], texts),
+        "caller_identifier": classifier_parity(MODEL_PATHS["CALLER_IDENTIFIER"], texts),
+    }
+    if not args.skip_whisper:
+        report["whisper"] = whisper_parity(args.audio)
+    
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
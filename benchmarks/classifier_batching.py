@@ -0,0 +1,120 @@
+"""
+Classifier micro-batching sweep: throughput and p50/p99 latency
+for different CLASSIFIER_MAX_BATCH / CLASSIFIER_MAX_WAIT_MS settings.
+
+    # Stub model (no GPU / weights needed): cost = base + per_item * batch
+    python -m benchmarks.classifier_batching --stub --clients 64
+
+    # Real scam detector
+    python -m benchmarks.classifier_batching --model $SCAM_DETECTOR_PATH --clients 32
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from app.batching import MicroBatcher
+
+SAMPLE_TEXTS = [
+    "สวัสดีครับ ผมโทรจากสถานีตำรวจไซเบอร์ บัญชีของคุณถูกใช้ในการฟอกเงิน",
+    "คุณต้องโอนเงินไปยังบัญชีตรวจสอบภายในวันนี้ ไม่อย่างนั้นบัญชีจะถูกอายัด",
+    "วันนี้กินข้าวหรือยัง เดี๋ยวเย็นนี้ไปรับที่โรงเรียนนะ",
+    "พัสดุของคุณติดอยู่ที่ศุลกากร กรุณาชำระค่าธรรมเนียม",
+    "ประชุมเลื่อนไปบ่ายสามโมงนะครับ",
+]
+
+
+def make_stub_forward(base_ms, per_item_ms):
+    """Fake padded forward pass: fixed launch cost + small per-item cost"""
+    def forward(texts):
+        time.sleep((base_ms + per_item_ms * len(texts)) / 1000.0)
+        return [{"label": "LABEL_1" if "โอน" in t else "LABEL_0", "score": 0.9} for t in texts]
+    return forward
+
+
+def make_real_forward(model_path):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    from app.classifier import BatchedTextClassifier
+    from app.config import DEVICE
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path).to(DEVICE).eval()
+    # Use the classifier's own forward; the sweep wraps it in its own batcher
+    clf = BatchedTextClassifier(model, tokenizer, max_batch_size=1, max_wait_ms=0, name="bench-unused")
+    return clf._forward
+
+
+def run_setting(forward, max_batch, max_wait_ms, clients, requests_per_client):
+    batcher = MicroBatcher(forward, max_batch_size=max_batch, max_wait_ms=max_wait_ms, name="bench", model="bench")
+    latencies = []
+    lock = threading.Lock()
+    
+    def client(idx):
+        local = []
+        for i in range(requests_per_client):
+            text = SAMPLE_TEXTS[(idx + i) % len(SAMPLE_TEXTS)]
+            t0 = time.perf_counter()
+            batcher.run(text)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    
+    lat_ms = np.array(latencies) * 1000.0
+    stats = batcher.stats()
+    return {
+        "max_batch": max_batch,
+        "max_wait_ms": max_wait_ms,
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "mean_batch_size": stats["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Path to the scam detector checkpoint")
+    parser.add_argument("--stub", action="store_true", help="Use a stub model instead of real weights")
+    parser.add_argument("--stub-base-ms", type=float, default=8.0)
+    parser.add_argument("--stub-per-item-ms", type=float, default=0.5)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32")
+    parser.add_argument("--waits-ms", default="0,2,5,10")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    
+    if args.stub or not args.model:
+        forward = make_stub_forward(args.stub_base_ms, args.stub_per_item_ms)
+    else:
+        forward = make_real_forward(args.model)
+    
+    results = []
+    print(f"{'batch':>5} {'wait':>6} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} {'avg bs':>7}")
+    for max_batch in [int(x) for x in args.batch_sizes.split(",")]:
+        for wait in [float(x) for x in args.waits_ms.split(",")]:
+            r = run_setting(forward, max_batch, wait, args.clients, args.requests)
+            results.append(r)
+            print(f"{max_batch:>5} {wait:>6.1f} {r['throughput_rps']:>9.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_batch_size']:>7.1f}")
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
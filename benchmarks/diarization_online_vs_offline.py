@@ -0,0 +1,113 @@
+"""
+Online (sliding-window) vs offline (whole-file pyannote) diarization
+on the bundled recordings.
+
+Reports, per file:
+  - speaker accuracy: share of offline speech frames (10 ms) that the online
+    pass gives the same speaker, after the best label mapping
+  - missed speech / false alarm vs the offline pass
+  - emission delay: how long after a segment ends the online pass emits it
+    (bound = ONLINE_WINDOW_S + ONLINE_STABLE_WINDOWS * ONLINE_STEP_S)
+
+    python -m benchmarks.diarization_online_vs_offline [files.wav ...]
+"""
+import argparse
+import glob
+import itertools
+import json
+import time
+
+import numpy as np
+
+FRAME = 0.01
+
+
+def to_frames(segments, n_frames, labels):
+    """Segments -> int array of speaker index per frame (-1 = no speech)"""
+    frames = np.full(n_frames, -1, dtype=np.int32)
+    for seg in segments:
+        lo = int(seg["start"] / FRAME)
+        hi = min(n_frames, int(seg["end"] / FRAME))
+        frames[lo:hi] = labels.index(seg["speaker"])
+    return frames
+
+
+def compare(offline, online, duration):
+    n = int(duration / FRAME) + 1
+    off_labels = sorted({s["speaker"] for s in offline})
+    on_labels = sorted({s["speaker"] for s in online})
+    ref = to_frames(offline, n, off_labels)
+    hyp = to_frames(online, n, on_labels)
+    
+    ref_speech = ref >= 0
+    hyp_speech = hyp >= 0
+    both = ref_speech & hyp_speech
+    
+    # Best one-to-one mapping of online labels onto offline labels
+    best = 0
+    k = max(len(off_labels), len(on_labels))
+    for perm in itertools.permutations(range(k), len(on_labels)):
+        mapped = np.where(hyp >= 0, np.array(perm)[np.clip(hyp, 0, None)], -1)
+        best = max(best, int(np.sum(both & (mapped == ref))))
+    
+    delays = [s["available_at"] - s["end"] for s in online]
+    return {
+        "speaker_accuracy": best / max(1, int(ref_speech.sum())),
+        "missed_speech": float(np.sum(ref_speech & ~hyp_speech) / max(1, ref_speech.sum())),
+        "false_alarm": float(np.sum(hyp_speech & ~ref_speech) / max(1, ref_speech.sum())),
+        "offline_speakers": len(off_labels),
+        "online_speakers": len(on_labels),
+        "emit_delay_mean_s": float(np.mean(delays)) if delays else 0.0,
+        "emit_delay_max_s": float(np.max(delays)) if delays else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", default=sorted(glob.glob("static/audio/*.wav")))
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    
+    import librosa
+    import torch
+    from pyannote.audio import Pipeline
+    from app.config import DIARIZATION_CONFIG, HF_TOKEN, DEVICE, SAMPLE_RATE
+    from app.online_diarization import OnlineDiarizer, make_embed_fn
+    from app.pipeline_hybrid import diarization_segments
+    
+    pipeline = Pipeline.from_pretrained(DIARIZATION_CONFIG["MODEL"], token=HF_TOKEN).to(torch.device(DEVICE))
+    online = OnlineDiarizer(make_embed_fn(pipeline))
+    bound = DIARIZATION_CONFIG["ONLINE_WINDOW_S"] + DIARIZATION_CONFIG["ONLINE_STABLE_WINDOWS"] * DIARIZATION_CONFIG["ONLINE_STEP_S"]
+    print(f"Online latency bound: {bound:.2f}s of audio (+ embedding time)")
+    
+    results = []
+    for path in args.files:
+        y, _ = librosa.load(path, sr=SAMPLE_RATE)
+        duration = len(y) / SAMPLE_RATE
+        
+        t0 = time.perf_counter()
+        offline_segments = diarization_segments(pipeline(
+            {"waveform": torch.from_numpy(y[np.newaxis, :]), "sample_rate": SAMPLE_RATE},
+            num_speakers=DIARIZATION_CONFIG["NUM_SPEAKERS"],
+        )) or []
+        offline_s = time.perf_counter() - t0
+        
+        t0 = time.perf_counter()
+        online_segments = list(online.stream(y))
+        online_s = time.perf_counter() - t0
+        
+        r = compare(offline_segments, online_segments, duration)
+        r.update({"file": path, "duration_s": duration, "offline_time_s": offline_s, "online_time_s": online_s})
+        results.append(r)
+        print(f"{path}: accuracy {r['speaker_accuracy']:.1%}, missed {r['missed_speech']:.1%}, "
+              f"false alarm {r['false_alarm']:.1%}, emit delay mean {r['emit_delay_mean_s']:.2f}s "
+              f"max {r['emit_delay_max_s']:.2f}s (offline {offline_s:.1f}s, online {online_s:.1f}s)")
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
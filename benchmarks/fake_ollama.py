@@ -0,0 +1,60 @@
+"""
+Fake Ollama server for tests and benchmarks (no model, no GPU).
+
+Implements POST /api/chat (streaming NDJSON and non-streaming) with a
+configurable first-token delay and per-token delay.
+
+    python -m benchmarks.fake_ollama --port 11435 --first-token-ms 300 --token-ms 20
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+REPLY = "⚠️ นี่คือสายมิจฉาชีพ อย่าโอนเงิน และวางสายทันที แล้วติดต่อธนาคารด้วยตนเอง"
+
+
+def create_app(first_token_ms=300.0, token_ms=20.0, reply=REPLY):
+    app = FastAPI()
+    app.state.requests = 0
+    
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "fake")
+        tokens = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+        
+        if not body.get("stream", True):
+            await asyncio.sleep((first_token_ms + token_ms * len(tokens)) / 1000.0)
+            return {"model": model, "message": {"role": "assistant", "content": reply}, "done": True}
+        
+        async def generate():
+            await asyncio.sleep(first_token_ms / 1000.0)
+            for token in tokens:
+                yield json.dumps({"model": model, "message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+                await asyncio.sleep(token_ms / 1000.0)
+            yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+        
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    
+    import uvicorn
+    uvicorn.run(create_app(args.first_token_ms, args.token_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
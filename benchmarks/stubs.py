@@ -0,0 +1,308 @@
+"""
+Deterministic stub models for benchmarks (no GPU, weights, HF token or Ollama).
+
+Each stub sleeps for a configurable latency and returns the same output for
+the same input. They are registered in place of the real models in the
+shared model registry, so HybridPipeline, AIModels, the agent graph and the
+FastAPI routes run unchanged on top of them.
+
+Latencies (milliseconds) are StubLatency fields. All of them are multiplied
+by `scale` (benchmarks: --stub-scale).
+"""
+import os
+import threading
+import time
+import wave
+import zlib
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+from app.config import SAMPLE_RATE
+from benchmarks.classifier_batching import SAMPLE_TEXTS
+
+
+@dataclass
+class StubLatency:
+    diarization_per_audio_s: float = 25.0   # whole-file pyannote pass (GPU)
+    embed: float = 6.0                      # one online-diarization window
+    vad_per_audio_s: float = 1.5
+    asr_base: float = 60.0                  # one Whisper generate call ...
+    asr_per_item: float = 12.0              # ... plus this per segment in the batch
+    classifier_base: float = 8.0
+    classifier_per_item: float = 0.5
+    slm_first_token: float = 300.0          # fake Ollama
+    slm_token: float = 20.0
+    scale: float = 1.0
+
+    def sleep(self, ms):
+        if ms > 0 and self.scale > 0:
+            time.sleep(ms * self.scale / 1000.0)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _pick(seed, options):
+    return options[zlib.crc32(str(seed).encode()) % len(options)]
+
+
+class _Turn:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class _Annotation:
+    def __init__(self, tracks):
+        self._tracks = tracks
+
+    def itertracks(self, yield_label=False):
+        for start, end, speaker in self._tracks:
+            yield (_Turn(start, end), None, speaker) if yield_label else (_Turn(start, end), None)
+
+
+def _alternating_turns(duration, turn_s=4.0, num_speakers=2):
+    """[(start, end, speaker)]: speakers taking turns of turn_s .. turn_s + 1.5 s"""
+    tracks, start, index = [], 0.0, 0
+    while start < duration - 0.5:
+        end = min(duration, start + turn_s + (index % 3) * 0.75)
+        tracks.append((start, end, f"SPEAKER_{index % num_speakers:02d}"))
+        start, index = end + 0.2, index + 1
+    return tracks
+
+
+class StubDiarization:
+    """pyannote Pipeline stand-in: two speakers taking turns of 4-5.5 s"""
+    def __init__(self, latency, turn_s=4.0):
+        self.latency = latency
+        self.turn_s = turn_s
+
+    def __call__(self, audio_input, num_speakers=None):
+        waveform = audio_input["waveform"]
+        samples = waveform.shape[-1]
+        duration = samples / audio_input["sample_rate"]
+        self.latency.sleep(self.latency.diarization_per_audio_s * duration)
+        return _Annotation(_alternating_turns(duration, self.turn_s, num_speakers or 2))
+
+
+class StubOnlineDiarizer:
+    """
+    OnlineDiarizer stand-in: the same turns as StubDiarization, each emitted
+    with the online emission delay and the embedding cost of its windows
+    """
+    def __init__(self, latency, turn_s=4.0):
+        from app.config import DIARIZATION_CONFIG
+        self.latency = latency
+        self.turn_s = turn_s
+        self.step_s = DIARIZATION_CONFIG["ONLINE_STEP_S"]
+        self.delay_s = DIARIZATION_CONFIG["ONLINE_WINDOW_S"] + \
+            DIARIZATION_CONFIG["ONLINE_STABLE_WINDOWS"] * self.step_s
+
+    def new_speakers(self):
+        return {"utterances": 0}
+
+    def stream(self, y, speakers=None, block_seconds=None):
+        duration = len(y) / SAMPLE_RATE
+        for start, end, speaker in _alternating_turns(duration, self.turn_s):
+            self.latency.sleep(self.latency.embed * (end - start) / self.step_s)
+            yield {"start": start, "end": end, "speaker": speaker,
+                   "available_at": min(duration, end + self.delay_s)}
+
+    def segment_utterance(self, audio, offset, speakers):
+        # Live utterances: one turn each, speakers alternate
+        duration = len(audio) / SAMPLE_RATE
+        self.latency.sleep(self.latency.embed * duration / self.step_s)
+        speaker = f"SPEAKER_{speakers['utterances'] % 2:02d}"
+        speakers["utterances"] += 1
+        return [{"start": offset, "end": offset + duration, "speaker": speaker}]
+
+
+class StubSpeechGate:
+    """SpeechGate stand-in: keeps all audio"""
+    def __init__(self, latency):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.audio_seconds = 0.0
+
+    def trim(self, audio):
+        seconds = len(audio) / SAMPLE_RATE
+        self.latency.sleep(self.latency.vad_per_audio_s * seconds)
+        with self._lock:
+            self.audio_seconds += seconds
+        return audio, seconds
+
+    def stats(self):
+        with self._lock:
+            return {"audio_seconds": self.audio_seconds, "speech_seconds": self.audio_seconds,
+                    "asr_seconds_saved": 0.0}
+
+
+class StubASR:
+    """HF ASR pipeline stand-in: one sample sentence per segment (chosen by its length)"""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __call__(self, inputs, batch_size=None, return_timestamps=False, generate_kwargs=None):
+        self.latency.sleep(self.latency.asr_base + self.latency.asr_per_item * len(inputs))
+        return [{"text": _pick(len(item["raw"]) // 160, SAMPLE_TEXTS)} for item in inputs]
+
+
+class StubTokenizer:
+    """Tokenizer stand-in for the context builder: one token per 3 characters, <s> ... </s>"""
+    pad_token_id = 1
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None):
+        ids = [[2 + zlib.crc32(text[i:i + 3].encode()) % 30000 for i in range(0, len(text), 3)]
+               for text in texts]
+        if add_special_tokens:
+            ids = [self.build_inputs_with_special_tokens(item) for item in ids]
+        return {"input_ids": ids}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [0] + list(ids) + [2]
+
+
+def make_stub_classifier(latency):
+    """BatchedTextClassifier whose forward pass is a keyword rule"""
+    from app.batching import MicroBatcher
+    from app.classifier import BatchedTextClassifier
+    from app.config import BATCHING_CONFIG
+    from app.prefilter import KeywordPrefilter
+
+    rule = KeywordPrefilter()
+
+    class StubTextClassifier(BatchedTextClassifier):
+        def __init__(self):
+            self.id2label = {0: "LABEL_0", 1: "LABEL_1"}
+            self.tokenizer = StubTokenizer()
+            self.max_length = 512
+            self._context_builder = None
+            self.batcher = MicroBatcher(
+                self._forward,
+                max_batch_size=BATCHING_CONFIG["CLASSIFIER_MAX_BATCH"],
+                max_wait_ms=BATCHING_CONFIG["CLASSIFIER_MAX_WAIT_MS"],
+                name="scam-classifier",
+                model="scam-classifier",
+            )
+
+        def _forward(self, items):
+            latency.sleep(latency.classifier_base + latency.classifier_per_item * len(items))
+            outputs = []
+            for item in items:
+                text = item if isinstance(item, str) else item.text
+                hits = len(rule.scan(text))
+                label = "LABEL_1" if hits >= 2 else "LABEL_0"
+                outputs.append({"label": label, "score": min(0.99, 0.62 + 0.1 * hits)})
+            return outputs
+
+    return StubTextClassifier()
+
+
+def make_stub_caller_identifier(latency):
+    """CallerIdentifier whose P(caller) grows with the scam keywords in a turn"""
+    from app.batching import MicroBatcher
+    from app.caller_id import CallerIdentifier
+    from app.config import BATCHING_CONFIG
+    from app.prefilter import KeywordPrefilter
+
+    rule = KeywordPrefilter()
+
+    class StubCallerIdentifier(CallerIdentifier):
+        def __init__(self):
+            self.id2label = {0: "RECEIVER", 1: "CALLER"}
+            self.caller_index = 1
+            self.batcher = MicroBatcher(
+                self._forward,
+                max_batch_size=BATCHING_CONFIG["CLASSIFIER_MAX_BATCH"],
+                max_wait_ms=BATCHING_CONFIG["CLASSIFIER_MAX_WAIT_MS"],
+                name="caller-identifier",
+                model="caller-identifier",
+            )
+
+        def _forward(self, texts):
+            latency.sleep(latency.classifier_base + latency.classifier_per_item * len(texts))
+            return [min(0.95, 0.3 + 0.25 * len(rule.scan(text))) for text in texts]
+
+    return StubCallerIdentifier()
+
+
+def make_stub_chat_model(reply=None):
+    """ChatOllama stand-in for the blocking LangChain path (None without langchain_core)"""
+    try:
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+    except ImportError:
+        return None
+    from benchmarks.fake_ollama import REPLY
+    return RunnableLambda(lambda _: AIMessage(content=reply or REPLY))
+
+
+def install_stub_models(latency=None, registry=None):
+    """Register stubs in place of every real model; returns the StubLatency used"""
+    from app.model_registry import get_registry
+
+    latency = latency or StubLatency()
+    registry = registry or get_registry()
+
+    registry.register("diarization", lambda: StubDiarization(latency))
+    registry.register("online_diarizer", lambda: StubOnlineDiarizer(latency))
+    registry.register("vad", lambda: StubSpeechGate(latency))
+    registry.register("voiceprints", lambda: None)
+    registry.register("asr", lambda: StubASR(latency))
+    registry.register("asr_engine", lambda: _asr_engine(registry), requires=["asr"])
+    registry.register("caller_identifier", lambda: (None, None))
+    registry.register("caller_detector", lambda: make_stub_caller_identifier(latency),
+                      requires=["caller_identifier"])
+    registry.register("scam_classifier", lambda: None)
+    registry.register("scam_detector", lambda: make_stub_classifier(latency))
+    registry.register("explainer_slm", make_stub_chat_model)
+    return latency
+
+
+def _asr_engine(registry):
+    from app.asr_engine import ASREngine
+    return ASREngine(registry.get("asr"))
+
+
+def start_fake_ollama(latency, port=0):
+    """Fake Ollama on a background thread; points the app's explainer at it. Returns the base URL."""
+    import socket
+    import uvicorn
+    from app.config import AGENT_CONFIG
+    from benchmarks.fake_ollama import create_app
+
+    if not port:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+    app = create_app(latency.slm_first_token * latency.scale, latency.slm_token * latency.scale)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-ollama", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{port}"
+    AGENT_CONFIG["OLLAMA_BASE_URL"] = base_url
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    return base_url
+
+
+def read_wav(path):
+    """PCM WAV -> mono float32 at SAMPLE_RATE with the standard library (no librosa)"""
+    with wave.open(path) as f:
+        channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        frames = f.readframes(f.getnframes())
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    y = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+    y = (y - 128.0) / 128.0 if width == 1 else y / float(np.iinfo(dtype).max)
+    y = y.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Linear interpolation is enough for stub models
+        positions = np.arange(int(len(y) * SAMPLE_RATE / rate)) * (rate / SAMPLE_RATE)
+        y = np.interp(positions, np.arange(len(y)), y).astype(np.float32)
+    return y
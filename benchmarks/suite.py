@@ -0,0 +1,395 @@
+"""
+End-to-end benchmark suite: scenarios on stub or real models, results as JSON.
+
+    # Deterministic stub models (no GPU, weights, HF token or Ollama)
+    python -m benchmarks.suite --stub --out bench/$(git rev-parse --short HEAD).json
+
+    # Real models on whatever DEVICE / INFERENCE_BACKEND select (SLM is still faked)
+    DEVICE=cpu INFERENCE_BACKEND=onnx python -m benchmarks.suite --scenarios single_call,batch_text
+
+    # Compare two runs (exit code 1 if anything regressed by more than --threshold %)
+    python -m benchmarks.suite --compare bench/base.json bench/new.json
+
+Scenarios:
+  single_call    HybridPipeline.run_hybrid_streaming on one recording, no pacing,
+                 diarization caches cleared each repeat
+  ws_concurrent  --calls concurrent /ws/analyze calls on an in-process server
+                 (paced at real time; latency = worst result lag behind the audio per call)
+  batch_text     POST /api/check-text/batch with --texts texts
+  check_text     --clients concurrent clients calling /api/check-text
+  agent          agent_graph.agent_app on the sample texts
+
+Every scenario records throughput, p50/p95/p99 latency and the peak RSS
+of this process while it ran (server, models and clients share it).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app.model_registry import rss_bytes
+from benchmarks.classifier_batching import SAMPLE_TEXTS
+
+SCENARIOS = ["single_call", "ws_concurrent", "batch_text", "check_text", "agent"]
+DEMO_AUDIO = "static/audio/scam_bank.wav"
+
+
+def latency_stats(seconds):
+    if not len(seconds):
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {
+        "count": int(len(ms)),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+class RssSampler:
+    """Peak RSS of this process while the block runs"""
+    def __init__(self, interval_s=0.02):
+        self.interval_s = interval_s
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / 2**20, 1)
+
+
+# ---------- In-process server ----------
+
+_server = {}
+
+
+def server_url(timeout_s=600):
+    """Start app.main on a free port (once) and wait until /readyz says ready"""
+    if "url" in _server:
+        return _server["url"]
+
+    import httpx
+    import uvicorn
+    from app.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="bench-server", daemon=True).start()
+
+    url = f"127.0.0.1:{port}"
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if server.started and httpx.get(f"http://{url}/readyz").status_code == 200:
+                _server["url"] = url
+                return url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("server did not become ready")
+
+
+# ---------- Scenarios ----------
+
+def scenario_single_call(args):
+    from app.config import SAMPLE_RATE
+    from app.pipeline_hybrid import get_hybrid_pipeline
+    from benchmarks.stubs import read_wav
+
+    pipeline = get_hybrid_pipeline()
+    audio = read_wav(args.audio)
+    audio_s = len(audio) / SAMPLE_RATE
+    cache_dir = pipeline.diarization_disk_cache.cache_dir
+
+    call_s, first_result_s, results = [], [], 0
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        # Cold diarization every time (this process + disk)
+        pipeline.diarization_cache.clear()
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+
+        t0 = time.perf_counter()
+        first = None
+        for event in pipeline.run_hybrid_streaming(args.audio, simulate_realtime=False,
+                                                   defer_slm=True, audio=audio):
+            if event.get("type") == "result":
+                results += 1
+                first = first or time.perf_counter() - t0
+        call_s.append(time.perf_counter() - t0)
+        first_result_s.append(first or 0.0)
+    wall = time.perf_counter() - start
+
+    return {
+        "audio_seconds": round(audio_s, 2),
+        "calls": args.repeats,
+        "results": results,
+        "throughput_calls_per_s": round(args.repeats / wall, 3),
+        "realtime_factor": round(audio_s * args.repeats / wall, 2),
+        "latency": latency_stats(call_s),
+        "first_result": latency_stats(first_result_s),
+    }
+
+
+def scenario_ws_concurrent(args):
+    import websockets  # noqa: F401 (skip the scenario early if missing)
+    from benchmarks.ws_load import run_load, summarize
+
+    url = f"ws://{server_url()}/ws/analyze"
+    start = time.perf_counter()
+    records, stats = asyncio.run(run_load(url, args.calls, 1000.0 / args.stagger_ms if args.stagger_ms else 0))
+    summary = summarize(records, stats, time.perf_counter() - start)
+
+    # Result lag behind the audio is the latency of this scenario
+    summary["latency"] = summary.pop("max_lag")
+    return summary
+
+
+def _texts(n):
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(n)]
+
+
+def scenario_batch_text(args):
+    import httpx
+
+    url = server_url()
+    texts = _texts(args.texts)
+    request_s = []
+    with httpx.Client(timeout=600) as client:
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            response = client.post(f"http://{url}/api/check-text/batch", json={"texts": texts})
+            response.raise_for_status()
+            request_s.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - start
+
+    return {
+        "texts_per_request": len(texts),
+        "requests": args.repeats,
+        "throughput_texts_per_s": round(len(texts) * args.repeats / wall, 1),
+        "latency": latency_stats(request_s),
+    }
+
+
+def scenario_check_text(args):
+    import httpx
+
+    url = server_url()
+    texts = _texts(args.clients * args.requests)
+
+    async def client(http, offset):
+        latencies = []
+        for i in range(args.requests):
+            t0 = time.perf_counter()
+            response = await http.post(f"http://{url}/api/check-text", json={"text": texts[offset + i]})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+    async def run_all():
+        limits = httpx.Limits(max_connections=args.clients)
+        async with httpx.AsyncClient(timeout=600, limits=limits) as http:
+            return await asyncio.gather(*[client(http, c * args.requests) for c in range(args.clients)])
+
+    start = time.perf_counter()
+    latencies = [s for per_client in asyncio.run(run_all()) for s in per_client]
+    wall = time.perf_counter() - start
+    return {
+        "clients": args.clients,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "latency": latency_stats(latencies),
+    }
+
+
+def scenario_agent(args):
+    from app.agent_graph import get_agent_app
+
+    agent = get_agent_app()
+    latencies = []
+    start = time.perf_counter()
+    for text in _texts(args.texts):
+        t0 = time.perf_counter()
+        agent.invoke({"new_chunk": text, "recent_messages": [], "suspicious_history": []})
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    return {
+        "invocations": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "latency": latency_stats(latencies),
+    }
+
+
+# ---------- Runner ----------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup(args):
+    """Stub or real models, fake SLM, isolated diarization / audio caches and history; returns run config"""
+    from app import config
+
+    config.MODEL_CONFIG["PRELOAD"] = True
+    config.DIARIZATION_CONFIG["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-diarization-")
+    config.AUDIO_CACHE_CONFIG["DIR"] = tempfile.mkdtemp(prefix="bench-audio-")
+    # Results still go through the history writer, but not into the real database
+    config.HISTORY_CONFIG["PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench-history-"), "history.sqlite3")
+
+    latency = None
+    if args.stub:
+        from benchmarks.stubs import StubLatency, install_stub_models
+        latency = install_stub_models(StubLatency(scale=args.stub_scale))
+    if not args.real_slm:
+        from benchmarks.stubs import StubLatency, start_fake_ollama
+        start_fake_ollama(latency or StubLatency(scale=args.stub_scale))
+
+    return {
+        "models": "stub" if args.stub else "real",
+        "stub_latency_ms": latency.to_dict() if latency else None,
+        "slm": "real" if args.real_slm else "fake",
+        "inference": dict(config.INFERENCE_CONFIG),
+        "batching": dict(config.BATCHING_CONFIG),
+        "diarization_mode": config.DIARIZATION_CONFIG["MODE"],
+        "vad": config.VAD_CONFIG["ENABLED"],
+        "prefilter": config.PREFILTER_CONFIG["MODE"],
+        "device": config.DEVICE,
+    }
+
+
+def run(args):
+    config = setup(args)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "config": config,
+        "scenarios": {},
+    }
+
+    for name in args.scenarios.split(","):
+        print(f"== {name}")
+        with RssSampler() as rss:
+            try:
+                result = globals()[f"scenario_{name}"](args)
+            except ImportError as e:
+                result = {"skipped": f"missing dependency: {e.name or e}"}
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+        result["peak_rss_mb"] = rss.peak_mb
+        report["scenarios"][name] = result
+        print(json.dumps(result, ensure_ascii=False))
+
+    from app.config import DIARIZATION_CONFIG, AUDIO_CACHE_CONFIG
+    shutil.rmtree(DIARIZATION_CONFIG["CACHE_DIR"], ignore_errors=True)
+    shutil.rmtree(AUDIO_CACHE_CONFIG["DIR"], ignore_errors=True)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Saved: {args.out}")
+    return report
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(base_path, new_path, threshold_pct):
+    """Print metric deltas; return the number of regressions beyond threshold_pct"""
+    with open(base_path, encoding="utf-8") as f:
+        base = _flatten("", json.load(f)["scenarios"], {})
+    with open(new_path, encoding="utf-8") as f:
+        new = _flatten("", json.load(f)["scenarios"], {})
+
+    regressions = 0
+    print(f"{'metric':<48} {'base':>11} {'new':>11} {'delta':>8}")
+    for key in sorted(base.keys() & new.keys()):
+        higher_is_better = "throughput" in key or "realtime_factor" in key
+        lower_is_better = key.endswith("_ms") or key.endswith("rss_mb") or key.endswith("errors")
+        if not (higher_is_better or lower_is_better):
+            continue
+        old, cur = base[key], new[key]
+        delta = (cur - old) / old * 100.0 if old else 0.0
+        worse = -delta if higher_is_better else delta
+        flag = ""
+        if worse > threshold_pct:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key:<48} {old:>11.2f} {cur:>11.2f} {delta:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stub", action="store_true", help="deterministic stub models instead of real weights")
+    parser.add_argument("--stub-scale", type=float, default=1.0, help="multiply all stub latencies")
+    parser.add_argument("--real-slm", action="store_true", help="use the Ollama at OLLAMA_BASE_URL")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--audio", default=DEMO_AUDIO, help="PCM WAV for single_call")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=8, help="concurrent WebSocket calls")
+    parser.add_argument("--stagger-ms", type=float, default=250.0, help="delay between WebSocket call starts")
+    parser.add_argument("--texts", type=int, default=256, help="texts per batch request / agent run")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent /api/check-text clients")
+    parser.add_argument("--requests", type=int, default=10, help="requests per /api/check-text client")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two JSON reports")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold (%%) for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"{regressions} regression(s) beyond {args.threshold:.0f}%")
+        sys.exit(1 if regressions else 0)
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Voiceprint index lookup at scale (app/voiceprints.py).
+
+Builds an index of synthetic voiceprints: --voices speakers, each enrolled
+several times with noise (like real prints of one scammer from several
+calls). Queries are fresh noisy prints of enrolled voices, so the right
+answer is known. Reports build time, IVF lookup latency and recall@1
+against brute force for each --probe value, plus the brute-force latency.
+
+    python -m benchmarks.voiceprint_lookup                     # 1M prints, 256-d
+    python -m benchmarks.voiceprint_lookup --prints 100000 --probe 4 8 16 32
+
+The prints are generated straight into a memory-mapped .npy in --dir
+(1M x 256 float32 = 1 GB on disk, plus the index itself).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.model_registry import rss_bytes
+from app.voiceprints import VoiceprintIndex, build_index
+from benchmarks.suite import latency_stats
+
+
+def synthetic_prints(path, n, dim, voices, noise, seed=0):
+    """(memmap of prints, voice of each print, voice centres)"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((voices, dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    voice = rng.integers(0, voices, n)
+    prints = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dim))
+    for i in range(0, n, 65536):
+        rows = voice[i:i + 65536]
+        prints[i:i + len(rows)] = centres[rows] + noise / np.sqrt(dim) * rng.standard_normal((len(rows), dim))
+    prints.flush()
+    return prints, voice, centres
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prints", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256, help="embedding size (wespeaker ResNet34: 256)")
+    parser.add_argument("--voices", type=int, default=200_000, help="distinct speakers among the prints")
+    parser.add_argument("--noise", type=float, default=0.6, help="print-to-print variation of one voice")
+    parser.add_argument("--lists", type=int, help="IVF lists (default: sqrt(prints))")
+    parser.add_argument("--probe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--exact-queries", type=int, default=20, help="brute-force lookups timed")
+    parser.add_argument("--dir", help="working directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--out", help="write the report JSON here")
+    args = parser.parse_args()
+
+    work_dir = args.dir or tempfile.mkdtemp(prefix="voiceprints-")
+    os.makedirs(work_dir, exist_ok=True)
+    report = {"prints": args.prints, "dim": args.dim, "voices": args.voices}
+    try:
+        start = time.perf_counter()
+        prints, voice, centres = synthetic_prints(
+            os.path.join(work_dir, "prints.npy"), args.prints, args.dim, args.voices, args.noise
+        )
+        report["generate_seconds"] = round(time.perf_counter() - start, 1)
+
+        start = time.perf_counter()
+        index_dir = build_index(os.path.join(work_dir, "index"), prints,
+                                [f"V{v}" for v in voice], n_lists=args.lists)
+        report["build_seconds"] = round(time.perf_counter() - start, 1)
+        del prints
+
+        rss_before = rss_bytes()
+        index = VoiceprintIndex.load(index_dir)
+        report["lists"] = len(index.centroids)
+        report["index_mb"] = round(sum(
+            os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)
+        ) / 2**20, 1)
+
+        rng = np.random.default_rng(1)
+        targets = voice[rng.integers(0, len(voice), args.queries)]
+        queries = centres[targets] + args.noise / np.sqrt(args.dim) * rng.standard_normal((args.queries, args.dim))
+        queries = queries.astype(np.float32)
+
+        exact, timings = [], []
+        for query in queries[:args.exact_queries]:
+            t = time.perf_counter()
+            exact.append(index.exact_search(query)[0][0])
+            timings.append(time.perf_counter() - t)
+        report["exact"] = latency_stats(timings)
+        # Reference for the remaining queries: the enrolled voice (exact search agrees on the timed ones)
+        reference = exact + [f"V{v}" for v in targets[args.exact_queries:]]
+
+        report["ivf"] = {}
+        for n_probe in args.probe:
+            index.search(queries[0], n_probe=n_probe)
+            hits, timings = 0, []
+            for query, expected in zip(queries, reference):
+                t = time.perf_counter()
+                found = index.search(query, n_probe=n_probe)
+                timings.append(time.perf_counter() - t)
+                hits += bool(found) and found[0][0] == expected
+            report["ivf"][n_probe] = dict(latency_stats(timings), recall_at_1=round(hits / len(queries), 4))
+        report["lookup_rss_mb"] = round((rss_bytes() - rss_before) / 2**20, 1)
+    finally:
+        if not args.dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Load generator: many concurrent callers on /ws/analyze.
+
+Every session follows the demo protocol (READY -> {"action": "start"} ->
+results -> FINISHED). The server paces the audio in real time, so each
+session lasts about as long as the recording. Sessions arrive at --rate
+per second, either evenly spaced or as a Poisson process.
+
+    # Against a running server
+    python -m benchmarks.ws_load --url ws://127.0.0.1:8000/ws/analyze --sessions 300 --rate 5
+
+    # Self-contained: in-process server on stub models (no GPU / weights)
+    python -m benchmarks.ws_load --in-process --stub --sessions 200 --rate 10 --arrival poisson
+
+Recorded per session (--out, JSONL):
+  time_to_ready         connect -> READY (includes the TCP/WebSocket handshake)
+  time_to_first_result  "start" -> first result
+  time_to_scam_alert    "start" -> first SCAM result (None if no alert was raised)
+  scam_alert_lag        how long after the end of that turn's audio the alert arrived
+  max_lag               worst result delay behind the audio
+  frames, bytes         received after "start" (compare --format / --verbosity)
+  outcome               ok | rejected (WARMING_UP) | error (server ERROR) |
+                        dropped (closed before FINISHED) | timeout | connect_failed
+
+The summary shows percentiles over the sessions that finished, the
+outcome counts and the peak number of concurrent sessions.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.suite import latency_stats
+
+DEFAULT_URL = "ws://127.0.0.1:8000/ws/analyze"
+
+
+class LoadStats:
+    """Open sessions now and at peak"""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def opened(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def closed(self):
+        self.active -= 1
+
+
+def decode(raw):
+    """Text frames are JSON, binary frames MessagePack"""
+    if isinstance(raw, bytes):
+        import msgpack
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
+async def run_session(url, index, delay_s, timeout_s, stats=None, fmt="json", verbosity="full"):
+    """One caller; returns its record (never raises)"""
+    import websockets
+    from websockets.exceptions import ConnectionClosed
+
+    await asyncio.sleep(delay_s)
+    record = {
+        "session": index,
+        "arrival_s": round(delay_s, 3),
+        "outcome": None,
+        "error": None,
+        "time_to_ready": None,
+        "time_to_first_result": None,
+        "time_to_scam_alert": None,
+        "scam_alert_lag": None,
+        "max_lag": None,
+        "results": 0,
+        "scam_results": 0,
+        "frames": 0,
+        "bytes": 0,
+        "duration": None,
+    }
+    stats = stats or LoadStats()
+
+    connect_start = time.perf_counter()
+    try:
+        ws = await asyncio.wait_for(websockets.connect(url, max_size=None), timeout_s)
+    except Exception as e:
+        record.update(outcome="connect_failed", error=f"{type(e).__name__}: {e}")
+        return record
+
+    stats.opened()
+    start = None
+    try:
+        async with ws:
+            ready = json.loads(await asyncio.wait_for(ws.recv(), timeout_s))
+            record["time_to_ready"] = time.perf_counter() - connect_start
+            if ready.get("status") != "READY":
+                record.update(outcome="rejected" if ready.get("status") == "WARMING_UP" else "error",
+                              error=ready.get("error") or ready.get("text") or ready.get("status"))
+                return record
+
+            start = time.perf_counter()
+            await ws.send(json.dumps({"action": "start", "format": fmt, "verbosity": verbosity}))
+            deadline = start + timeout_s
+            while True:
+                raw = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.perf_counter()))
+                now = time.perf_counter() - start
+                record["frames"] += 1
+                record["bytes"] += len(raw) if isinstance(raw, bytes) else len(raw.encode("utf-8"))
+                data = decode(raw)
+                status = data.get("status")
+                if status == "FINISHED":
+                    record["outcome"] = "ok"
+                    break
+                if status == "ERROR":
+                    record.update(outcome="error", error=data.get("text"))
+                    break
+                if data.get("type") != "result" or data.get("is_warning"):
+                    continue
+
+                lag = max(0.0, now - data["end"])
+                record["results"] += 1
+                record["max_lag"] = max(record["max_lag"] or 0.0, lag)
+                if record["time_to_first_result"] is None:
+                    record["time_to_first_result"] = now
+                if status == "SCAM":
+                    record["scam_results"] += 1
+                    if record["time_to_scam_alert"] is None:
+                        record["time_to_scam_alert"] = now
+                        record["scam_alert_lag"] = lag
+    except asyncio.TimeoutError:
+        record.update(outcome="timeout", error=f"no FINISHED within {timeout_s:.0f}s")
+    except ConnectionClosed as e:
+        record.update(outcome="dropped", error=f"closed before FINISHED (code {e.code})")
+    except Exception as e:
+        record.update(outcome="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        stats.closed()
+        if start is not None:
+            record["duration"] = time.perf_counter() - start
+
+    for key in ("time_to_ready", "time_to_first_result", "time_to_scam_alert", "scam_alert_lag", "max_lag", "duration"):
+        if record[key] is not None:
+            record[key] = round(record[key], 4)
+    return record
+
+
+def arrival_times(sessions, rate, arrival="uniform", seed=0):
+    """Start offsets (seconds) of `sessions` callers arriving at `rate` per second"""
+    if rate <= 0:
+        return [0.0] * sessions
+    if arrival == "poisson":
+        rng = random.Random(seed)
+        offsets, t = [], 0.0
+        for _ in range(sessions):
+            offsets.append(t)
+            t += rng.expovariate(rate)
+        return offsets
+    return [i / rate for i in range(sessions)]
+
+
+async def run_load(url, sessions, rate, arrival="uniform", timeout_s=600.0, seed=0, on_record=None,
+                   fmt="json", verbosity="full"):
+    """All sessions; returns (records, LoadStats)"""
+    stats = LoadStats()
+
+    async def session(index, delay_s):
+        record = await run_session(url, index, delay_s, timeout_s, stats, fmt, verbosity)
+        if on_record:
+            on_record(record)
+        return record
+
+    offsets = arrival_times(sessions, rate, arrival, seed)
+    records = await asyncio.gather(*[session(i, delay) for i, delay in enumerate(offsets)])
+    return list(records), stats
+
+
+def summarize(records, stats, wall_s):
+    outcomes = {}
+    for record in records:
+        outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+    ok = [r for r in records if r["outcome"] == "ok"]
+
+    def values(key, rows=ok):
+        return [r[key] for r in rows if r[key] is not None]
+
+    results = sum(r["results"] for r in records)
+    return {
+        "sessions": len(records),
+        "outcomes": outcomes,
+        "errors": len(records) - len(ok),
+        "error_samples": list(dict.fromkeys(r["error"] for r in records if r["error"]))[:5],
+        "peak_concurrent": stats.peak,
+        "wall_seconds": round(wall_s, 2),
+        "results": results,
+        "frames_per_session": round(sum(r["frames"] for r in ok) / len(ok), 1) if ok else 0,
+        "bytes_per_session": round(sum(r["bytes"] for r in ok) / len(ok)) if ok else 0,
+        "throughput_results_per_s": round(results / wall_s, 2) if wall_s else 0.0,
+        "sessions_with_scam_alert": len(values("time_to_scam_alert")),
+        "time_to_ready": latency_stats(values("time_to_ready", records)),
+        "time_to_first_result": latency_stats(values("time_to_first_result")),
+        "time_to_scam_alert": latency_stats(values("time_to_scam_alert")),
+        "scam_alert_lag": latency_stats(values("scam_alert_lag")),
+        "max_lag": latency_stats(values("max_lag")),
+        "duration": latency_stats(values("duration")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=5.0, help="arrivals per second (0: all at once)")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="uniform")
+    parser.add_argument("--seed", type=int, default=0, help="Poisson arrival seed")
+    parser.add_argument("--format", choices=["json", "msgpack"], default="json", help="stream format to negotiate")
+    parser.add_argument("--verbosity", choices=["full", "segment", "results"], default="full")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-session limit (seconds)")
+    parser.add_argument("--in-process", action="store_true", help="start the server in this process")
+    parser.add_argument("--stub", action="store_true", help="with --in-process: stub models")
+    parser.add_argument("--stub-scale", type=float, default=1.0)
+    parser.add_argument("--out", help="per-session records (JSONL)")
+    parser.add_argument("--summary", help="write the summary JSON here")
+    args = parser.parse_args()
+
+    url = args.url
+    if args.in_process:
+        from benchmarks.stubs import StubLatency, install_stub_models, start_fake_ollama
+        from benchmarks.suite import server_url
+        latency = StubLatency(scale=args.stub_scale)
+        if args.stub:
+            install_stub_models(latency)
+        start_fake_ollama(latency)
+        url = f"ws://{server_url()}/ws/analyze"
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    done = [0]
+
+    def on_record(record):
+        done[0] += 1
+        if out:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        if record["outcome"] != "ok":
+            print(f"   session {record['session']}: {record['outcome']} ({record['error']})")
+        elif done[0] % 25 == 0:
+            print(f"   {done[0]}/{args.sessions} sessions done")
+
+    print(f"{args.sessions} sessions -> {url} ({args.arrival} arrivals, {args.rate}/s, "
+          f"{args.format}/{args.verbosity})")
+    start = time.perf_counter()
+    try:
+        records, stats = asyncio.run(run_load(
+            url, args.sessions, args.rate, args.arrival, args.timeout, args.seed, on_record,
+            args.format, args.verbosity
+        ))
+    finally:
+        if out:
+            out.close()
+    summary = summarize(records, stats, time.perf_counter() - start)
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
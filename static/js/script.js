@@ -29,6 +29,12 @@ let isUserWaiting = false;
 let segmentsProcessed = 0;
 let scamCount = 0;
 let callerIdentified = false;
+let slmStreamEntry = null;
+
+// Stream format negotiated in the "start" message (see app/ws_protocol.py):
+// binary MessagePack frames, log lines batched per segment
+const WS_FORMAT = 'msgpack';
+const WS_VERBOSITY = 'segment';
 
 // ==========================================
 // Initialization
@@ -49,6 +55,7 @@ function connectWebSocket() {
     updateConnectionStatus('connecting', 'Connecting...');
 
     socket = new WebSocket(wsUrl);
+    socket.binaryType = 'arraybuffer';
 
     socket.onopen = () => {
         console.log("WebSocket connected! Waiting for AI to be ready...");
@@ -56,7 +63,8 @@ function connectWebSocket() {
     };
 
     socket.onmessage = (event) => {
-        const data = JSON.parse(event.data);
+        // Binary frames are MessagePack; READY/WARMING_UP/ERROR (and the JSON fallback) are text
+        const data = event.data instanceof ArrayBuffer ? MsgPack.decode(event.data) : JSON.parse(event.data);
 
         // AI Ready - Wait for Play
         if (data.status === 'READY') {
@@ -67,9 +75,18 @@ function connectWebSocket() {
             return;
         }
 
+        // Server still loading models - it closes the socket, we reconnect
+        if (data.status === 'WARMING_UP') {
+            updateConnectionStatus('processing', 'AI models warming up...');
+            return;
+        }
+
         if (data.status === 'FINISHED') {
             updateConnectionStatus('connected', 'Analysis Complete');
             addLogEntry('SYSTEM', 'Streaming finished.');
+            if (data.vad) {
+                addLogEntry('ASR', `VAD saved ${data.vad.asr_seconds_saved}s of ASR (${data.vad.speech_seconds}s speech / ${data.vad.audio_seconds}s audio)`);
+            }
             return;
         }
 
@@ -79,8 +96,28 @@ function connectWebSocket() {
             return;
         }
 
+        // Log lines of one segment in a single frame: [[step, message], ...]
+        if (data.type === 'logs') {
+            data.entries.forEach(([step, message]) => addLogEntry(step, message));
+            return;
+        }
+
+        // SLM advice streamed token by token
+        if (data.type === 'slm_token') {
+            appendSlmToken(data.token);
+            return;
+        }
+
+        // Caller's voice matches a known scammer (sent before ASR of that turn)
+        if (data.type === 'voiceprint') {
+            identifyCaller(data.speaker);
+            updateStatus('danger', `🚩 Known scammer voice (${Math.round(data.similarity * 100)}%)`);
+            return;
+        }
+
         // Handle result data - push to buffer
         if (data.type === 'result' || data.text) {
+            if (data.is_warning) slmStreamEntry = null;
             data._id = transcriptBuffer.length;
             transcriptBuffer.push(data);
         }
@@ -91,8 +128,13 @@ function connectWebSocket() {
         updateConnectionStatus('error', 'Connection Error');
     };
 
-    socket.onclose = () => {
+    socket.onclose = (event) => {
         console.log("WebSocket Closed");
+        if (event.code === 1013) {
+            // Try Again Later (models warming up)
+            setTimeout(connectWebSocket, 3000);
+            return;
+        }
         if (!isAIReady) {
             updateConnectionStatus('error', 'Disconnected');
         }
@@ -166,7 +208,7 @@ playBtn.addEventListener('click', () => {
 function startPlayback() {
     // Send "start" signal to backend first!
     if (socket && socket.readyState === WebSocket.OPEN) {
-        socket.send(JSON.stringify({ action: "start" }));
+        socket.send(JSON.stringify({ action: "start", format: WS_FORMAT, verbosity: WS_VERBOSITY }));
         console.log("Sent start signal to backend");
         addLogEntry('SYSTEM', '▶️ Play pressed! Starting stream...');
     }
@@ -214,7 +256,7 @@ function syncTranscriptions(currentTime) {
             segmentsCount.textContent = segmentsProcessed;
 
             // Caller identification
-            if (!callerIdentified && segmentsProcessed >= 2 && item.role === 'CALLER') {
+            if (!callerIdentified && item.role === 'CALLER' && (item.role_locked || segmentsProcessed >= 2)) {
                 identifyCaller(item.speaker);
             }
 
@@ -365,13 +407,14 @@ function addLogEntry(step, message) {
 
     const stepUpper = step.toUpperCase();
 
-    if (stepUpper === 'ASR' || stepUpper === 'PROCESS') {
+    if (stepUpper === 'ASR' || stepUpper === 'PROCESS' || stepUpper === 'VAD') {
         targetId = 'log-asr';
         if (message.includes('✅')) logClass = 'success';
         else if (message.includes('❌')) logClass = 'error';
-    } else if (stepUpper === 'CALLER') {
+    } else if (stepUpper === 'CALLER' || stepUpper === 'VOICE') {
         targetId = 'log-caller';
         if (message.includes('✅')) logClass = 'success';
+        else if (message.includes('🚩')) logClass = 'warning';
     } else if (stepUpper === 'BERT' || stepUpper === 'ALERT' || stepUpper === 'SCAM') {
         targetId = 'log-scam';
         if (message.includes('SCAM') || message.includes('🚨')) logClass = 'warning';
@@ -410,6 +453,22 @@ function addLogEntry(step, message) {
     logContainer.scrollTop = logContainer.scrollHeight;
 }
 
+function appendSlmToken(token) {
+    const logContainer = document.getElementById('log-slm');
+    if (!logContainer) return;
+
+    if (!slmStreamEntry) {
+        const placeholder = logContainer.querySelector('.log-placeholder');
+        if (placeholder) placeholder.remove();
+
+        slmStreamEntry = document.createElement('div');
+        slmStreamEntry.className = 'log-item info';
+        logContainer.appendChild(slmStreamEntry);
+    }
+    slmStreamEntry.textContent += token;
+    logContainer.scrollTop = logContainer.scrollHeight;
+}
+
 // ==========================================
 // Text Mode - Manual Scam Detection
 // ==========================================